@@ -1,12 +1,17 @@
+import threading
+
 from .gemini_client import GeminiClient
 from .schemas import Ticket, Classification, Troubleshooting, Communication
 
 client = None
+_client_lock = threading.Lock()
 
 def get_client():
     global client
     if client is None:
-        client = GeminiClient()
+        with _client_lock:
+            if client is None:
+                client = GeminiClient()
     return client
 
 def classifier_agent(ticket: Ticket) -> Classification:
@@ -1,126 +1,192 @@
-from .schemas import Ticket, Classification, Troubleshooting, Communication
+import threading
+from functools import partial
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional
+
+from .schemas import Ticket, Classification, ClassificationBatch, Troubleshooting, Communication, fused_schema
+from .config import LLM_BACKEND
 from .gemini_client import GeminiClient
+from .request_policy import policy
+from .tracing import span
+from .prompts import (
+    classify_prompt,
+    classify_batch_prompt,
+    troubleshoot_prompt,
+    compose_prompt,
+    fused_prompt,
+    response_schema,
+)
 
 _client = None
+_client_lock = threading.Lock()
+
+def _new_client():
+    if LLM_BACKEND == "fake":
+        from .fake_llm import FakeGeminiClient
+
+        return FakeGeminiClient()
+    if LLM_BACKEND == "replay":
+        from .cassette import ReplayClient
+
+        return ReplayClient()
+    if LLM_BACKEND == "record":
+        from .cassette import RecordingClient
+
+        # no response cache while recording: every call must reach the API to be captured
+        return RecordingClient(GeminiClient(cache=None))
+    if LLM_BACKEND != "gemini":
+        raise RuntimeError(f"unknown LLM_BACKEND {LLM_BACKEND!r} (gemini | fake | record | replay)")
+    return GeminiClient()
+
 
 def client() -> GeminiClient:
     global _client
     if _client is None:
-        _client = GeminiClient()
+        # double-checked locking: concurrent tickets must share ONE client (and its HTTP pool)
+        with _client_lock:
+            if _client is None:
+                _client = _new_client()
     return _client
 
 
-def classify_ticket(ticket: Ticket) -> Classification:
-    system = (
-        "You are an ITSM Ticket Classification Agent for Cognizant CIS. "
-        "You must return ONLY valid JSON and follow the schema strictly."
+# -------------------------
+# Progressive output: while a listener is installed (see `stream_fields`), the agents
+# use the streaming API and report each top-level JSON field as soon as it is complete.
+# -------------------------
+FieldListener = Callable[[str, str, Any], None]  # (stage, key, value)
+
+_field_listener: ContextVar[Optional[FieldListener]] = ContextVar("field_listener", default=None)
+
+
+@contextmanager
+def stream_fields(listener: Optional[FieldListener]):
+    """Install `listener` for model calls in this context (None: no streaming)."""
+    token = _field_listener.set(listener)
+    try:
+        yield
+    finally:
+        _field_listener.reset(token)
+
+
+def _generate(stage: str, system: str, user: str, schema=None) -> dict:
+    # every call goes through the stage's request policy (deadline, retries, hedging)
+    listener = _field_listener.get()
+    if listener is None:
+        return policy(stage).call(partial(client().generate_json, schema=schema, stage=stage), system, user)
+    # each attempt streams into its own listener; only the attempt holding the stream
+    # is forwarded, so a retried or abandoned attempt stops reaching the UI.
+    # No hedging while streaming: a duplicate would double the streamed tokens.
+    return policy(stage).call(
+        partial(client().generate_json_stream, schema=schema, stage=stage),
+        system, user,
+        hedge=False, on_field=lambda k, v: listener(stage, k, v),
     )
 
-    user = f"""
-TASK:
-Classify the ticket and return ONLY valid JSON (no markdown, no ``` fences, no extra text).
-
-OUTPUT JSON SCHEMA (MUST follow exactly):
-{{
-  "category": "VPN | Email/Outlook | Access/AD | Network | Laptop/Device | Storage/Disk | Application | Other",
-  "priority": "P1 | P2 | P3 | P4",
-  "assignment_group": "string",
-  "confidence": 0.0,
-  "reason": "short text"
-}}
-
-STRICT RULES:
-1) category MUST be exactly ONE of these values (case-sensitive):
-   "VPN","Email/Outlook","Access/AD","Network","Laptop/Device","Storage/Disk","Application","Other"
-   Do NOT shorten (example: do NOT output "Laptop"). Do NOT invent new values.
-2) priority MUST be exactly one of: "P1","P2","P3","P4"
-3) confidence MUST be a NUMBER between 0 and 1 (example: 0.72).
-4) assignment_group should be a CIS-style group name. Use one of these patterns:
-   - "CIS-VPN-Support"
-   - "CIS-EUC-Support"
-   - "CIS-Network-Ops"
-   - "CIS-Access-Management"
-   - "CIS-App-Support"
-   If unsure, choose the closest one.
-5) If not sure: set category="Other", priority="P3", confidence <= 0.6 and explain in reason.
-6) Return ONLY JSON. No trailing commas.
-
-TICKET:
-{ticket.model_dump()}
-""".strip()
-
-    data = client().generate_json(system, user)
-    return Classification(**data)
 
+def _agent(stage: str, build: Callable[[], tuple], model):
+    # one span per agent, split into prompt building, the model call and validation
+    with span(f"agent.{stage}"):
+        with span("prompt.build") as sp:
+            system, user = build()
+            sp.set(chars=len(system) + len(user))
+        data = _generate(stage, system, user, response_schema(model))
+        with span("validate", model=model.__name__):
+            return model(**data)
 
-def troubleshoot_ticket(ticket: Ticket, cls: Classification) -> Troubleshooting:
-    system = (
-        "You are a CIS Troubleshooting Agent (L1/L2). "
-        "You must return ONLY valid JSON and follow the schema strictly."
-    )
-
-    user = f"""
-TASK:
-Create a troubleshooting plan that a service desk engineer can follow.
 
-OUTPUT JSON SCHEMA (MUST follow exactly):
-{{
-  "probable_cause": "short text",
-  "steps": ["step 1", "step 2", "step 3", "step 4"],
-  "data_needed": ["optional question 1", "optional question 2"],
-  "risk_level": "Low | Medium | High"
-}}
+async def _agent_async(stage: str, build: Callable[[], tuple], model):
+    with span(f"agent.{stage}"):
+        with span("prompt.build") as sp:
+            system, user = build()
+            sp.set(chars=len(system) + len(user))
+        data = await policy(stage).call_async(
+            partial(client().generate_json_async, schema=response_schema(model), stage=stage), system, user
+        )
+        with span("validate", model=model.__name__):
+            return model(**data)
 
-STRICT RULES:
-1) steps MUST be a list of 4 to 5 short, clear steps (no more than 1-2 lines each).
-2) data_needed MUST be a list (can be empty []).
-3) risk_level MUST be exactly one of: "Low", "Medium", "High".
-4) Return ONLY JSON. No markdown. No ``` fences. No trailing commas.
 
-TICKET:
-{ticket.model_dump()}
+def classify_ticket(ticket: Ticket) -> Classification:
+    return _agent("classification", lambda: classify_prompt(ticket), Classification)
+
+
+def classify_tickets(tickets: List[Ticket], stats: Optional[dict] = None) -> Dict[str, Classification]:
+    """
+    Classify many tickets with as few model calls as possible.
+
+    All tickets go into one prompt that returns {"results": [...]} keyed by ticket_id.
+    Every element is validated against Classification on its own; only the tickets
+    that are missing or invalid are retried, split in halves, down to a single-ticket
+    `classify_ticket` call. `stats["calls"]` (if given) counts model round trips.
+    """
+    if stats is None:
+        stats = {}
+    if not tickets:
+        return {}
+    if len(tickets) == 1:
+        stats["calls"] = stats.get("calls", 0) + 1
+        return {tickets[0].ticket_id: classify_ticket(tickets[0])}
+
+    stats["calls"] = stats.get("calls", 0) + 1
+    with span("agent.classification_batch", tickets=len(tickets)):
+        data = policy("classification_batch").call(
+            partial(client().generate_json, schema=response_schema(ClassificationBatch), stage="classification_batch"),
+            *classify_batch_prompt(tickets),
+        )
+    items = data.get("results") if isinstance(data, dict) else None
+
+    wanted = {t.ticket_id for t in tickets}
+    out: Dict[str, Classification] = {}
+    for item in items if isinstance(items, list) else []:
+        if not isinstance(item, dict):
+            continue
+        tid = str(item.get("ticket_id", ""))
+        if tid not in wanted or tid in out:
+            continue
+        try:
+            out[tid] = Classification(**item)
+        except Exception:
+            pass
+
+    failed = [t for t in tickets if t.ticket_id not in out]
+    if failed:
+        mid = (len(failed) + 1) // 2
+        for part in (failed[:mid], failed[mid:]):
+            out.update(classify_tickets(part, stats))
+    return out
 
-CLASSIFICATION:
-{cls.model_dump()}
-""".strip()
 
-    data = client().generate_json(system, user)
-    return Troubleshooting(**data)
+def troubleshoot_ticket(ticket: Ticket, cls: Classification) -> Troubleshooting:
+    return _agent("troubleshooting", lambda: troubleshoot_prompt(ticket, cls), Troubleshooting)
 
 
 def compose_response(ticket: Ticket, cls: Classification, ts: Troubleshooting) -> Communication:
-    system = (
-        "You are a Service Desk Communication Agent. "
-        "Your response should be professional, short, and action-oriented. "
-        "You must return ONLY valid JSON and follow the schema strictly."
-    )
+    return _agent("communication", lambda: compose_prompt(ticket, cls, ts), Communication)
+
 
-    user = f"""
-TASK:
-Write (1) a message to the user and (2) a work-notes update for the ticket.
+def fused_sections(ticket: Ticket, sections: List[str], known: Optional[Dict[str, Any]] = None) -> dict:
+    """
+    One model call answering several pipeline stages at once (see orchestrator_fused).
+    Returns the raw {section: dict} answer; validating each section is up to the caller.
+    """
+    with span("agent.fused", sections=",".join(sections)):
+        with span("prompt.build") as sp:
+            system, user = fused_prompt(ticket, sections, known)
+            sp.set(chars=len(system) + len(user))
+        return _generate("fused", system, user, response_schema(fused_schema(tuple(sections))))
 
-OUTPUT JSON SCHEMA (MUST follow exactly):
-{{
-  "user_message": "short professional message",
-  "ticket_update": "work notes text",
-  "close_recommendation": false
-}}
 
-STRICT RULES:
-1) user_message: short and polite; include next steps and questions from data_needed (if any).
-2) ticket_update: include classification + probable cause + steps summary in service desk tone.
-3) close_recommendation MUST be true/false (boolean, not string).
-4) Return ONLY JSON. No markdown. No ``` fences. No trailing commas.
+# -------------------------
+# Async variants (share one event loop + the client's pooled async HTTP connections)
+# -------------------------
+async def classify_ticket_async(ticket: Ticket) -> Classification:
+    return await _agent_async("classification", lambda: classify_prompt(ticket), Classification)
 
-TICKET:
-{ticket.model_dump()}
 
-CLASSIFICATION:
-{cls.model_dump()}
+async def troubleshoot_ticket_async(ticket: Ticket, cls: Classification) -> Troubleshooting:
+    return await _agent_async("troubleshooting", lambda: troubleshoot_prompt(ticket, cls), Troubleshooting)
 
-TROUBLESHOOTING:
-{ts.model_dump()}
-""".strip()
 
-    data = client().generate_json(system, user)
-    return Communication(**data)
\ No newline at end of file
+async def compose_response_async(ticket: Ticket, cls: Classification, ts: Troubleshooting) -> Communication:
+    return await _agent_async("communication", lambda: compose_prompt(ticket, cls, ts), Communication)
@@ -0,0 +1,288 @@
+import io
+import sys
+import csv
+import json
+import time
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Callable, Dict, IO, Iterable, Iterator, List, Optional
+
+from .metrics import percentile
+from .schemas import Ticket, Classification
+
+
+def iter_tickets(source: str) -> Iterator[dict]:
+    """
+    Yield raw ticket dicts lazily from:
+    - "-"          -> JSONL on stdin
+    - a directory  -> every *.json / *.jsonl / *.csv file inside (sorted by name)
+    - a .jsonl file -> one ticket per line
+    - a .json file -> a single ticket or a list of tickets
+    - a .csv file  -> one ticket per row, columns named like the Ticket fields
+    """
+    if source == "-":
+        yield from _iter_jsonl(sys.stdin)
+        return
+
+    path = Path(source)
+    if path.is_dir():
+        for p in sorted(path.iterdir()):
+            if p.suffix.lower() in (".json", ".jsonl", ".csv"):
+                yield from _iter_file(p)
+        return
+
+    yield from _iter_file(path)
+
+
+def _iter_file(path: Path) -> Iterator[dict]:
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        yield from _iter_stream(f, path.suffix.lower())
+
+
+def _iter_stream(f: IO[str], suffix: str) -> Iterator[dict]:
+    if suffix in (".jsonl", ".ndjson"):
+        yield from _iter_jsonl(f)
+        return
+    if suffix == ".csv":
+        yield from _iter_csv(f)
+        return
+    data = json.load(f)
+    if isinstance(data, list):
+        yield from data
+    else:
+        yield data
+
+
+def parse_upload(name: str, data: bytes) -> List:
+    """Raw tickets from an uploaded file (.csv, .jsonl/.ndjson or .json), by file extension."""
+    text = data.decode("utf-8-sig")
+    return list(_iter_stream(io.StringIO(text, newline=""), Path(name).suffix.lower()))
+
+
+def _iter_jsonl(stream: IO[str]) -> Iterator[dict]:
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError:
+            # keep going: the bad line becomes an error record instead of aborting the batch
+            yield line
+
+
+def _iter_csv(stream: IO[str]) -> Iterator[dict]:
+    # service desk exports: header row, extra columns kept (Ticket ignores them),
+    # empty cells dropped so the Ticket defaults apply
+    for row in csv.DictReader(stream):
+        yield {
+            k.strip(): v.strip()
+            for k, v in row.items()
+            if k is not None and isinstance(v, str) and v.strip()
+        }
+
+
+class BatchSummary:
+    """Throughput/latency counters for one batch run."""
+
+    def __init__(self, runner: str, concurrency: int):
+        self.runner = runner
+        self.concurrency = concurrency
+        self.ok = 0
+        self.failed = 0
+        self.latencies_ms: List[float] = []
+        self.started = time.perf_counter()
+        self.finished = self.started
+
+    def record(self, ok: bool, latency_ms: float) -> None:
+        if ok:
+            self.ok += 1
+        else:
+            self.failed += 1
+        self.latencies_ms.append(latency_ms)
+
+    def to_dict(self) -> dict:
+        wall_s = max(self.finished - self.started, 1e-9)
+        total = self.ok + self.failed
+        lat = sorted(self.latencies_ms)
+        return {
+            "runner": self.runner,
+            "concurrency": self.concurrency,
+            "tickets": total,
+            "ok": self.ok,
+            "failed": self.failed,
+            "wall_s": round(wall_s, 3),
+            "throughput_tps": round(total / wall_s, 3),
+            "latency_ms": {
+                "mean": round(sum(lat) / len(lat), 1) if lat else 0.0,
+                "p50": round(percentile(lat, 50) or 0.0, 1),
+                "p95": round(percentile(lat, 95) or 0.0, 1),
+                "p99": round(percentile(lat, 99) or 0.0, 1),
+                "max": round(lat[-1], 1) if lat else 0.0,
+            },
+        }
+
+
+def _process(raw: dict, run_fn: Callable[[Ticket], dict], runner: str) -> Dict:
+    t0 = time.perf_counter()
+    try:
+        if not isinstance(raw, dict):
+            raise ValueError(f"ticket is not a JSON object: {str(raw)[:200]}")
+        out = run_fn(Ticket(**raw))
+        out["status"] = "ok"
+    except Exception as e:
+        out = {
+            "ticket": raw,
+            "runner": runner,
+            "status": "error",
+            "error": f"{type(e).__name__}: {e}",
+        }
+    out["latency_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+    return out
+
+
+def run_batch(
+    tickets: Iterable[dict],
+    run_fn: Callable[[Ticket], dict],
+    out: Optional[IO[str]],
+    concurrency: int = 4,
+    runner: str = "direct",
+    on_result: Optional[Callable[[int, dict], None]] = None,
+    stop: Optional[threading.Event] = None,
+) -> dict:
+    """
+    Stream tickets through `run_fn` with at most `concurrency` tickets in flight.
+
+    Each result is written to `out` as one NDJSON line as soon as its ticket finishes
+    (completion order, not input order). Tickets are pulled from `tickets` only when a
+    slot frees up, so large inputs are never fully buffered. Returns the run summary.
+
+    `on_result(index, result)` is also called per finished ticket (index = input
+    position). Once `stop` is set no further tickets are started; those in flight finish.
+    """
+    concurrency = max(1, int(concurrency))
+    summary = BatchSummary(runner, concurrency)
+    source = enumerate(tickets)
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="itsm-batch") as pool:
+        in_flight = {}
+
+        def fill():
+            while len(in_flight) < concurrency and not (stop is not None and stop.is_set()):
+                try:
+                    i, raw = next(source)
+                except StopIteration:
+                    return
+                in_flight[pool.submit(_process, raw, run_fn, runner)] = i
+
+        fill()
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for fut in done:
+                i = in_flight.pop(fut)
+                result = fut.result()
+                summary.record(result["status"] == "ok", result["latency_ms"])
+                if out is not None:
+                    out.write(json.dumps(result) + "\n")
+                if on_result is not None:
+                    on_result(i, result)
+            if out is not None:
+                out.flush()
+            fill()
+
+    summary.finished = time.perf_counter()
+    return summary.to_dict()
+
+
+class _PendingClassification:
+    def __init__(self, ticket: Ticket):
+        self.ticket = ticket
+        self.result: Optional[Classification] = None
+        self.error: Optional[BaseException] = None
+        self.done = False
+
+
+class ClassifyBatcher:
+    """
+    Micro-batches classification across concurrently running tickets.
+
+    Worker threads call `classify(ticket)` as usual; calls are coalesced until
+    `batch_size` are waiting (or `max_wait_s` passes) and then sent as ONE
+    `classify_many` call (agents_direct.classify_tickets by default).
+    Plug it into the pipeline with `orchestrator_direct.run(ticket, classify=batcher.classify)`.
+    """
+
+    def __init__(
+        self,
+        batch_size: int,
+        max_wait_s: float = 0.25,
+        classify_many: Optional[Callable[[List[Ticket], dict], Dict[str, Classification]]] = None,
+    ):
+        if classify_many is None:
+            from .agents_direct import classify_tickets as classify_many
+        self.batch_size = max(1, int(batch_size))
+        self.max_wait_s = max_wait_s
+        self.classify_many = classify_many
+        self._pending: List[_PendingClassification] = []
+        self._cond = threading.Condition()
+        self._stats = {"tickets": 0, "batches": 0, "calls": 0}
+
+    def _take(self) -> List[_PendingClassification]:
+        group = self._pending[:self.batch_size]
+        del self._pending[:self.batch_size]
+        return group
+
+    def _run(self, group: List[_PendingClassification]) -> None:
+        calls = {}
+        try:
+            results = self.classify_many([p.ticket for p in group], calls)
+            for p in group:
+                p.result = results.get(p.ticket.ticket_id)
+                if p.result is None:
+                    p.error = RuntimeError(f"no classification returned for {p.ticket.ticket_id}")
+        except Exception as e:
+            for p in group:
+                p.error = e
+        with self._cond:
+            self._stats["tickets"] += len(group)
+            self._stats["batches"] += 1
+            self._stats["calls"] += calls.get("calls", 1)
+            for p in group:
+                p.done = True
+            self._cond.notify_all()
+
+    def classify(self, ticket: Ticket) -> Classification:
+        req = _PendingClassification(ticket)
+        group = None
+        with self._cond:
+            self._pending.append(req)
+            if len(self._pending) >= self.batch_size:
+                group = self._take()
+            else:
+                deadline = time.monotonic() + self.max_wait_s
+                while not req.done and req in self._pending:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        # waited long enough: lead a (partial) batch with whatever is queued
+                        group = self._take()
+                        break
+                    self._cond.wait(remaining)
+
+        if group:
+            self._run(group)
+
+        with self._cond:
+            while not req.done:
+                self._cond.wait()
+        if req.error is not None:
+            raise req.error
+        return req.result
+
+    def stats(self) -> dict:
+        with self._cond:
+            s = dict(self._stats)
+        s["avg_batch_size"] = round(s["tickets"] / s["batches"], 2) if s["batches"] else 0.0
+        # one model call per ticket without batching
+        s["calls_saved"] = s["tickets"] - s["calls"]
+        return s
@@ -0,0 +1,249 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import threading
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional, Type
+
+from pydantic import BaseModel
+
+from .config import CASSETTE_PATH, REPLAY_TIMING
+from .gemini_client import TokenUsage
+from .tracing import span
+
+# -------------------------
+# Record/replay of model calls (LLM_BACKEND=record | replay).
+#
+# A cassette is a JSONL file with one line per model call: prompt hash ("key"),
+# stage, schema name, observed latency, the parsed response (or the error) and token
+# usage. Recording wraps the real client (response cache off) and appends each call as
+# it finishes; the MCP server subprocess inherits the env and appends to the same file.
+# Replay loads the file into an index keyed by prompt hash and answers without network,
+# sleeping the recorded latency times REPLAY_TIMING (1 = original, 0.1 = 10x faster,
+# 0 = no delay). Prompts recorded more than once are served in recorded order, cycling,
+# so one recorded day can be replayed repeatedly as a load test.
+# -------------------------
+
+
+def prompt_key(system_prompt: str, user_prompt: str, schema: Optional[Type[BaseModel]] = None) -> str:
+    """Hash of what the model is asked (model/temperature excluded, so replays survive config changes)."""
+    payload = json.dumps([system_prompt, user_prompt, schema.__name__ if schema is not None else ""], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _usage_dict(usage_metadata) -> Optional[dict]:
+    if usage_metadata is None:
+        return None
+    return {
+        "prompt_token_count": usage_metadata.prompt_token_count or 0,
+        "candidates_token_count": usage_metadata.candidates_token_count or 0,
+        "thoughts_token_count": usage_metadata.thoughts_token_count or 0,
+    }
+
+
+class CassetteMiss(LookupError):
+    """Replay was asked for a prompt that is not on the cassette."""
+
+
+class ReplayedError(Exception):
+    """An error recorded on the cassette, raised again on replay (keeps its status code)."""
+
+    def __init__(self, message: str, code: Optional[int] = None):
+        super().__init__(message)
+        self.code = code
+
+
+class _UsageTap(TokenUsage):
+    """TokenUsage that also remembers the last record per thread (for the cassette line)."""
+
+    def __init__(self):
+        super().__init__()
+        self.last = threading.local()
+
+    def record(self, stage: str, usage_metadata):
+        self.last.value = _usage_dict(usage_metadata)
+        super().record(stage, usage_metadata)
+
+
+class RecordingClient:
+    """Wraps a GeminiClient (built with cache=None) and appends every call to a cassette."""
+
+    def __init__(self, inner, path: Optional[str] = None):
+        self.inner = inner
+        self.path = path or CASSETTE_PATH
+        folder = os.path.dirname(self.path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self.inner.usage = _UsageTap()
+        self.usage = self.inner.usage
+        self.model = inner.model
+        self.cache = None
+        self._lock = threading.Lock()
+        self.recorded = 0
+
+    def _append(self, entry: dict):
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        # one write per line on an O_APPEND file: safe next to the MCP servers' writers
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+            self.recorded += 1
+
+    def _entry(self, stage, system_prompt, user_prompt, schema, t0, data=None, error=None) -> dict:
+        entry = {
+            "key": prompt_key(system_prompt, user_prompt, schema),
+            "stage": stage,
+            "schema": schema.__name__ if schema is not None else "",
+            "latency_ms": round((time.perf_counter() - t0) * 1000, 1),
+            "recorded_at": round(time.time(), 3),
+            "pid": os.getpid(),
+        }
+        if error is not None:
+            entry["error"] = f"{type(error).__name__}: {error}"
+            entry["code"] = getattr(error, "code", None) or getattr(error, "status_code", None)
+        else:
+            entry["response"] = data
+            entry["usage"] = getattr(self.usage.last, "value", None)
+        return entry
+
+    def _record(self, call: Callable[[], Any], stage, system_prompt, user_prompt, schema):
+        self.usage.last.value = None
+        t0 = time.perf_counter()
+        try:
+            data = call()
+        except Exception as e:
+            self._append(self._entry(stage, system_prompt, user_prompt, schema, t0, error=e))
+            raise
+        self._append(self._entry(stage, system_prompt, user_prompt, schema, t0, data))
+        return data
+
+    def generate_json(self, system_prompt, user_prompt, schema=None, stage=""):
+        return self._record(
+            lambda: self.inner.generate_json(system_prompt, user_prompt, schema, stage),
+            stage, system_prompt, user_prompt, schema,
+        )
+
+    async def generate_json_async(self, system_prompt, user_prompt, schema=None, stage=""):
+        self.usage.last.value = None
+        t0 = time.perf_counter()
+        try:
+            data = await self.inner.generate_json_async(system_prompt, user_prompt, schema, stage)
+        except Exception as e:
+            self._append(self._entry(stage, system_prompt, user_prompt, schema, t0, error=e))
+            raise
+        self._append(self._entry(stage, system_prompt, user_prompt, schema, t0, data))
+        return data
+
+    def generate_json_stream(self, system_prompt, user_prompt, on_field=None, timing=None, schema=None, stage=""):
+        return self._record(
+            lambda: self.inner.generate_json_stream(system_prompt, user_prompt, on_field, timing, schema, stage),
+            stage, system_prompt, user_prompt, schema,
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return {"mode": "record", "path": self.path, "recorded": self.recorded}
+
+
+def load_cassette(path: str) -> Dict[str, List[dict]]:
+    """Index of a cassette file: prompt hash -> recorded calls in file order."""
+    index: Dict[str, List[dict]] = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # a line cut short by a crash while recording
+            if isinstance(entry, dict) and "key" in entry:
+                index.setdefault(entry["key"], []).append(entry)
+    return index
+
+
+class ReplayClient:
+    """
+    Answers model calls from a cassette, no network. `timing` scales the recorded
+    latencies (1 = original, 0 = none). Unknown prompts raise CassetteMiss.
+    """
+
+    def __init__(self, path: Optional[str] = None, timing: Optional[float] = None):
+        self.path = path or CASSETTE_PATH
+        self.timing = REPLAY_TIMING if timing is None else timing
+        self.index = load_cassette(self.path)
+        self.model = f"replay:{os.path.basename(self.path)}"
+        self.cache = None
+        self.usage = TokenUsage()
+        self._lock = threading.Lock()
+        self._next: Dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _take(self, system_prompt, user_prompt, schema, stage) -> dict:
+        key = prompt_key(system_prompt, user_prompt, schema)
+        with self._lock:
+            entries = self.index.get(key)
+            if not entries:
+                self.misses += 1
+                raise CassetteMiss(f"{stage or 'call'}: prompt {key[:12]} not on cassette {self.path}")
+            i = self._next.get(key, 0)
+            self._next[key] = i + 1
+            self.hits += 1
+            return entries[i % len(entries)]
+
+    def _result(self, entry: dict, stage: str) -> dict:
+        if "error" in entry:
+            raise ReplayedError(f"replayed: {entry['error']}", entry.get("code"))
+        if entry.get("usage"):
+            self.usage.record(stage, SimpleNamespace(**entry["usage"]))
+        return entry["response"]
+
+    def generate_json(self, system_prompt, user_prompt, schema=None, stage=""):
+        with span("gemini.generate", stage=stage, model=self.model):
+            entry = self._take(system_prompt, user_prompt, schema, stage)
+            with span("gemini.request"):
+                time.sleep(entry.get("latency_ms", 0) / 1000 * self.timing)
+            return self._result(entry, stage)
+
+    async def generate_json_async(self, system_prompt, user_prompt, schema=None, stage=""):
+        with span("gemini.generate", stage=stage, model=self.model):
+            entry = self._take(system_prompt, user_prompt, schema, stage)
+            with span("gemini.request"):
+                await asyncio.sleep(entry.get("latency_ms", 0) / 1000 * self.timing)
+            return self._result(entry, stage)
+
+    def generate_json_stream(self, system_prompt, user_prompt, on_field=None, timing=None, schema=None, stage=""):
+        t0 = time.perf_counter()
+        with span("gemini.generate", stage=stage, model=self.model, stream=True):
+            entry = self._take(system_prompt, user_prompt, schema, stage)
+            total_s = entry.get("latency_ms", 0) / 1000 * self.timing
+            if "error" in entry:
+                time.sleep(total_s)
+            data = self._result(entry, stage)
+            # fields are spread evenly over the recorded latency
+            fields = list(data.items()) or [(None, None)]
+            first = None
+            for key, value in fields:
+                time.sleep(total_s / len(fields))
+                if key is None:
+                    continue
+                if first is None:
+                    first = (time.perf_counter() - t0) * 1000
+                if on_field is not None:
+                    on_field(key, value)
+        if timing is not None:
+            timing["first_field_ms"] = round(first, 1) if first is not None else None
+            timing["total_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+        return data
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "mode": "replay",
+                "path": self.path,
+                "prompts": len(self.index),
+                "timing": self.timing,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
@@ -1,22 +1,137 @@
+import sys
 import json
 import argparse
+from functools import partial
+from .config import BATCH_CONCURRENCY, SPECULATIVE_TROUBLESHOOT
 from .schemas import Ticket
-from .orchestrator_direct import run as run_direct
-from .orchestrator_mcp import run as run_mcp
+
+# Orchestrators (and through them the mcp SDK, numpy, the Gemini SDK) are imported
+# only for the runner that was asked for, so startup stays cheap.
+
+def _runner(name: str, speculate):
+    if name == "mcp":
+        from .orchestrator_mcp import run
+        return run
+    if name == "fused":
+        from .orchestrator_fused import run
+        return run
+    from .orchestrator_direct import run
+    return partial(run, speculate=speculate)
+
+def _print_field(stage, key, value):
+    if key is None:
+        print(f"[{stage}] done", file=sys.stderr, flush=True)
+    else:
+        print(f"[{stage}] {key}: {json.dumps(value)}", file=sys.stderr, flush=True)
 
 def main():
     parser = argparse.ArgumentParser(description="CIS ITSM Multi-Agent Demo (Gemini 2.5 Flash + MCP)")
-    parser.add_argument("--ticket", required=True, help="Path to ticket JSON")
-    parser.add_argument("--runner", choices=["direct", "mcp"], default="direct", help="Choose execution mode")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--ticket", help="Path to ticket JSON")
+    source.add_argument(
+        "--batch",
+        metavar="SRC",
+        help="Batch mode: directory of ticket JSON files, a JSONL file, or '-' for JSONL on stdin",
+    )
+    parser.add_argument(
+        "--runner",
+        choices=["direct", "fused", "mcp"],
+        default="direct",
+        help="Choose execution mode (fused = all three stages in one model request)",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=BATCH_CONCURRENCY,
+        help="Batch mode: number of tickets in flight (default: BATCH_CONCURRENCY or 4)",
+    )
+    parser.add_argument("--output", default="-", help="Batch mode: NDJSON output path (default: stdout)")
+    parser.add_argument(
+        "--classify-batch",
+        type=int,
+        default=0,
+        metavar="K",
+        help="Batch mode, direct runner: classify up to K in-flight tickets per model call (use --concurrency >= K)",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Single ticket, direct/fused runner: print each output field to stderr as soon as it is generated",
+    )
+    parser.add_argument(
+        "--speculate",
+        action="store_true",
+        default=None,
+        help="Direct runner: start troubleshooting for the rule-predicted category while classifying "
+        "(default: SPECULATIVE_TROUBLESHOOT)",
+    )
     args = parser.parse_args()
 
+    run = _runner(args.runner, args.speculate)
+
+    if args.batch:
+        from .batch import iter_tickets, run_batch, ClassifyBatcher
+        from .rules import STATS as FAST_PATH_STATS, with_fast_path
+        from .speculation import STATS as SPECULATION_STATS
+
+        batcher = None
+        if args.classify_batch > 1 and args.runner == "direct":
+            direct = run
+            batcher = ClassifyBatcher(args.classify_batch)
+            classify = with_fast_path(batcher.classify)
+            run = lambda t: direct(t, classify=classify)
+        FAST_PATH_STATS.reset()
+        SPECULATION_STATS.reset()
+
+        out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+        try:
+            summary = run_batch(
+                iter_tickets(args.batch),
+                run,
+                out,
+                concurrency=args.concurrency,
+                runner=args.runner,
+            )
+        finally:
+            if out is not sys.stdout:
+                out.close()
+        if args.runner != "mcp":
+            from .plan_index import get_index
+            from .request_policy import policy_stats
+            from . import agents_direct
+
+            # mcp classifies inside the server process, so only direct can report this
+            summary["fast_path"] = FAST_PATH_STATS.snapshot()
+            summary["plan_reuse"] = get_index().stats()
+            summary["request_policy"] = policy_stats()
+            # only if a ticket reached the model: creating a client here needs GEMINI_API_KEY
+            if agents_direct._client is not None:
+                summary["tokens"] = agents_direct._client.usage.snapshot()
+        speculate = SPECULATIVE_TROUBLESHOOT if args.speculate is None else args.speculate
+        if args.runner == "direct" and speculate:
+            summary["speculation"] = SPECULATION_STATS.snapshot()
+        if batcher is not None:
+            summary["classifier_batching"] = batcher.stats()
+        from .rate_limiter import limiter_from_config
+
+        limiter = limiter_from_config()
+        if limiter is not None:
+            # host-wide (shared state file): covers the MCP servers' model calls too
+            summary["rate_limiter"] = limiter.stats()
+        # summary goes to stderr so stdout stays pure NDJSON
+        print(json.dumps(summary, indent=2), file=sys.stderr)
+        return
+
     with open(args.ticket, "r", encoding="utf-8") as f:
         ticket_data = json.load(f)
 
     ticket = Ticket(**ticket_data)
 
-    output = run_direct(ticket) if args.runner == "direct" else run_mcp(ticket)
+    if args.stream and args.runner != "mcp":
+        output = run(ticket, on_field=_print_field)
+    else:
+        output = run(ticket)
     print(json.dumps(output, indent=2))
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -10,4 +11,137 @@ GEMINI_API_KEY = env("GEMINI_API_KEY")
 GEMINI_MODEL = env("GEMINI_MODEL", "gemini-2.5-flash")
 
 TEMPERATURE = float(env("TEMPERATURE", "0.2"))
-MAX_OUTPUT_TOKENS = int(env("MAX_OUTPUT_TOKENS", "1200"))
\ No newline at end of file
+MAX_OUTPUT_TOKENS = int(env("MAX_OUTPUT_TOKENS", "1200"))
+
+# Batch mode (CLI --batch): number of tickets in flight at once
+BATCH_CONCURRENCY = int(env("BATCH_CONCURRENCY", "4"))
+
+# Shared keep-alive HTTP pool used by GeminiClient (sync + async)
+HTTP_MAX_CONNECTIONS = int(env("HTTP_MAX_CONNECTIONS", "32"))
+HTTP_KEEPALIVE_EXPIRY_S = float(env("HTTP_KEEPALIVE_EXPIRY_S", "60"))
+
+# LLM response cache: off | memory | sqlite (memory LRU + on-disk tier at LLM_CACHE_PATH)
+LLM_CACHE = env("LLM_CACHE", "memory")
+LLM_CACHE_PATH = env("LLM_CACHE_PATH", ".cache/llm_cache.sqlite")
+LLM_CACHE_MAX_ENTRIES = int(env("LLM_CACHE_MAX_ENTRIES", "1024"))
+LLM_CACHE_DISK_MAX_ENTRIES = int(env("LLM_CACHE_DISK_MAX_ENTRIES", "100000"))
+LLM_CACHE_TTL_S = float(env("LLM_CACHE_TTL_S", "3600"))
+
+# Warm MCP server pool (MCP runner + UI status check)
+MCP_POOL_SIZE = int(env("MCP_POOL_SIZE", "2"))
+MCP_POOL_HEALTH_INTERVAL_S = float(env("MCP_POOL_HEALTH_INTERVAL_S", "30"))
+MCP_POOL_LEASE_TIMEOUT_S = float(env("MCP_POOL_LEASE_TIMEOUT_S", "60"))
+
+# Shared MCP server over streamable HTTP (one long-lived server per node):
+# MCP_SERVER_URL set -> clients connect to it instead of spawning stdio servers, and
+# MCP_POOL_SIZE is the number of sessions (= calls in flight) each client process keeps.
+# The server side (`python -m itsm_agents.mcp_server --transport streamable-http`)
+# listens on MCP_HTTP_HOST:MCP_HTTP_PORT and runs at most MCP_SERVER_MAX_CONCURRENCY
+# tool calls at once across all clients.
+MCP_SERVER_URL = env("MCP_SERVER_URL", "")
+MCP_TRANSPORT = env("MCP_TRANSPORT", "stdio").lower()
+MCP_HTTP_HOST = env("MCP_HTTP_HOST", "127.0.0.1")
+MCP_HTTP_PORT = int(env("MCP_HTTP_PORT", "8765"))
+# DNS rebinding protection: Host / Origin header values the HTTP server accepts besides
+# localhost and its bind address (comma-separated; "node" allows any port, as "node:*")
+MCP_HTTP_ALLOWED_HOSTS = env("MCP_HTTP_ALLOWED_HOSTS", "")
+MCP_HTTP_ALLOWED_ORIGINS = env("MCP_HTTP_ALLOWED_ORIGINS", "")
+MCP_SERVER_MAX_CONCURRENCY = int(env("MCP_SERVER_MAX_CONCURRENCY", "16"))
+
+# mcp runner: "server" = one run_pipeline_tool round trip per ticket (stages chained
+# server-side); "tools" = the three granular tool calls, orchestrated by the client
+MCP_PIPELINE = env("MCP_PIPELINE", "server").lower()
+
+# "tools" pipeline: the first tool call returns a handle to the ticket stored server-side
+# (per session), later calls send the handle instead of ticket + stage outputs again
+MCP_CONTEXT_HANDLES = env("MCP_CONTEXT_HANDLES", "true").lower() in ("1", "true", "yes", "on")
+MCP_CONTEXT_MAX_ENTRIES = int(env("MCP_CONTEXT_MAX_ENTRIES", "1024"))
+MCP_CONTEXT_MAX_MB = float(env("MCP_CONTEXT_MAX_MB", "64"))
+MCP_CONTEXT_TTL_S = float(env("MCP_CONTEXT_TTL_S", "900"))  # idle time; <= 0 disables expiry
+
+# Rule-based fast-path classifier: rule matches whose calibrated precision (rules.CALIBRATION,
+# fitted on samples/labelled/tickets.jsonl) is at/above this skip the LLM (>1 disables)
+FAST_PATH_THRESHOLD = float(env("FAST_PATH_THRESHOLD", "0.85"))
+
+# Troubleshooting plan reuse for near-duplicate tickets (cosine >= threshold; >1 disables)
+PLAN_REUSE_THRESHOLD = float(env("PLAN_REUSE_THRESHOLD", "0.92"))
+PLAN_INDEX_PATH = env("PLAN_INDEX_PATH", ".cache/plan_index.npz")
+PLAN_INDEX_DIMS = int(env("PLAN_INDEX_DIMS", "256"))
+PLAN_INDEX_SAVE_EVERY = int(env("PLAN_INDEX_SAVE_EVERY", "50"))
+PLAN_INDEX_MAX_SEGMENTS = int(env("PLAN_INDEX_MAX_SEGMENTS", "16"))  # more: folded into PLAN_INDEX_PATH
+
+# Request policy around each model call (request_policy.py): per-stage deadlines,
+# retries with jittered exponential backoff on transient errors, p95 hedging
+LLM_DEADLINE_S = float(env("LLM_DEADLINE_S", "60"))
+LLM_STAGE_DEADLINES = {
+    "classification": float(env("LLM_DEADLINE_CLASSIFY_S", "20")),
+    "troubleshooting": float(env("LLM_DEADLINE_TROUBLESHOOT_S", "45")),
+    "communication": float(env("LLM_DEADLINE_COMPOSE_S", "30")),
+    "fused": float(env("LLM_DEADLINE_FUSED_S", "60")),
+}
+LLM_MAX_RETRIES = int(env("LLM_MAX_RETRIES", "2"))
+LLM_BACKOFF_BASE_S = float(env("LLM_BACKOFF_BASE_S", "0.5"))
+LLM_BACKOFF_MAX_S = float(env("LLM_BACKOFF_MAX_S", "8"))
+LLM_HEDGE = env("LLM_HEDGE", "true").lower() in ("1", "true", "yes", "on")
+LLM_HEDGE_MIN_SAMPLES = int(env("LLM_HEDGE_MIN_SAMPLES", "20"))
+LLM_LATENCY_WINDOW = int(env("LLM_LATENCY_WINDOW", "512"))
+
+# Quota-aware admission for model calls (rate_limiter.py): token buckets for requests and
+# estimated input tokens per minute, AIMD concurrency cut on 429/503. State is shared by
+# every process on the host through LLM_RATE_STATE_PATH (empty: this process only).
+# auto = on for the real API (gemini/record), off for fake/replay unless set to on.
+LLM_RATE_LIMIT = env("LLM_RATE_LIMIT", "auto").lower()
+LLM_RPM = float(env("LLM_RPM", "1000"))
+LLM_TPM = float(env("LLM_TPM", "1000000"))
+LLM_RATE_BURST_S = float(env("LLM_RATE_BURST_S", "10"))  # bucket size: this many seconds of quota
+LLM_MAX_CONCURRENCY = int(env("LLM_MAX_CONCURRENCY", "32"))
+LLM_MIN_CONCURRENCY = int(env("LLM_MIN_CONCURRENCY", "1"))
+LLM_AIMD_DECREASE = float(env("LLM_AIMD_DECREASE", "0.5"))
+LLM_AIMD_COOLDOWN_S = float(env("LLM_AIMD_COOLDOWN_S", "1"))  # at most one cut per window
+LLM_CHARS_PER_TOKEN = float(env("LLM_CHARS_PER_TOKEN", "4"))
+# one file per OS user (the quota is per API key, and another user's 0600 file is unreadable)
+_RATE_STATE_USER = os.getuid() if hasattr(os, "getuid") else "local"
+LLM_RATE_STATE_PATH = env(
+    "LLM_RATE_STATE_PATH",
+    os.path.join(tempfile.gettempdir(), f"itsm_agents_ratelimit_{_RATE_STATE_USER}_{GEMINI_MODEL}.json"),
+)
+
+# Structured output: request JSON constrained to the pydantic schemas (response_schema)
+# instead of describing the format in the prompt
+STRUCTURED_OUTPUT = env("STRUCTURED_OUTPUT", "true").lower() in ("1", "true", "yes", "on")
+
+# Fused runner: how many times sections that fail validation are re-requested
+FUSED_MAX_REASKS = int(env("FUSED_MAX_REASKS", "2"))
+
+# Speculative troubleshooting (direct runner): start troubleshooting for the rule-predicted
+# classification while the real classification runs; kept if the category matches
+SPECULATIVE_TROUBLESHOOT = env("SPECULATIVE_TROUBLESHOOT", "false").lower() in ("1", "true", "yes", "on")
+SPECULATE_MIN_CONFIDENCE = float(env("SPECULATE_MIN_CONFIDENCE", "0.3"))
+
+# Span tracing (tracing.py): per-ticket spans across agents, model calls, JSON parsing and
+# MCP tools; finished traces are appended as JSONL to TRACE_EXPORT_PATH (empty: no export)
+TRACING = env("TRACING", "true").lower() in ("1", "true", "yes", "on")
+TRACE_EXPORT_PATH = env("TRACE_EXPORT_PATH", "")
+
+# Model backend: gemini (real API) | fake (offline stand-in with simulated latency/errors,
+# see fake_llm.py) | record (real API, every call appended to CASSETTE_PATH) | replay
+# (answers from CASSETTE_PATH, no network; see cassette.py). Inherited by the MCP server
+# subprocess, so both runners switch together.
+LLM_BACKEND = env("LLM_BACKEND", "gemini").lower()
+FAKE_LLM_LATENCY = env("FAKE_LLM_LATENCY", "lognormal:800:0.4")
+FAKE_LLM_ERROR_RATE = float(env("FAKE_LLM_ERROR_RATE", "0"))
+FAKE_LLM_SEED = env("FAKE_LLM_SEED", "")
+# simulated server-side quota: calls above this many per minute fail with a 429 (0 = none)
+FAKE_LLM_RPM = float(env("FAKE_LLM_RPM", "0"))
+FAKE_LLM_QUOTA_PATH = env("FAKE_LLM_QUOTA_PATH", "")  # shared by processes using it; empty: per process
+
+# Record/replay cassette (LLM_BACKEND=record|replay); REPLAY_TIMING scales the recorded
+# latencies: 1 = original timing, 0.1 = ten times faster, 0 = no delay
+CASSETTE_PATH = env("CASSETTE_PATH", ".cache/cassette.jsonl")
+REPLAY_TIMING = float(env("REPLAY_TIMING", "1.0"))
+
+# Streamlit UI (ui_jobs.py): pipeline runs on UI_WORKERS background threads shared by all
+# sessions; finished results are memoized per ticket hash (UI_MEMO_SIZE entries, UI_MEMO_TTL_S)
+UI_WORKERS = int(env("UI_WORKERS", "4"))
+UI_MEMO_SIZE = int(env("UI_MEMO_SIZE", "256"))
+UI_MEMO_TTL_S = float(env("UI_MEMO_TTL_S", "3600"))
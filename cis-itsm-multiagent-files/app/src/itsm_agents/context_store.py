@@ -0,0 +1,146 @@
+import json
+import time
+import uuid
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from .config import MCP_CONTEXT_MAX_ENTRIES, MCP_CONTEXT_MAX_MB, MCP_CONTEXT_TTL_S
+
+# tools answer a lookup miss with this message, so clients know to resend the payloads
+HANDLE_MISS = "unknown or expired context handle"
+
+
+def nbytes(value: Any) -> int:
+    """UTF-8 size of `value` as JSON (pydantic models via model_dump)."""
+    if hasattr(value, "model_dump"):
+        value = value.model_dump()
+    return len(json.dumps(value, ensure_ascii=False, default=str).encode("utf-8"))
+
+
+class ContextStore:
+    """
+    Server-side per-ticket context for MCP sessions: the first tool call stores the
+    parsed ticket (and later the stage outputs) under a handle, later tools take the
+    handle instead of the payloads.
+
+    - handles are scoped to the session that created them (`session_key`)
+    - LRU (OrderedDict) bounded by `max_entries` and by `max_bytes` of stored values,
+      measured as UTF-8 JSON (`nbytes`) on put and again on every update
+    - entries idle for more than `ttl_s` are dropped (ttl_s <= 0 disables expiry)
+    Values are kept as parsed objects, so a hit costs no JSON parsing or validation.
+    Thread-safe.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 64 * 1024 * 1024, ttl_s: float = 900):
+        self.max_entries = max(1, int(max_entries))
+        self.max_bytes = max(1, int(max_bytes))
+        self.ttl_s = ttl_s
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expired = 0
+
+    def _drop(self, handle: str):
+        entry = self._entries.pop(handle)
+        self._bytes -= sum(entry["sizes"].values())
+
+    def _evict(self):
+        # least recently used first; the newest entry stays even if it alone is over max_bytes
+        while len(self._entries) > self.max_entries or (self._bytes > self.max_bytes and len(self._entries) > 1):
+            self._drop(next(iter(self._entries)))
+            self.evictions += 1
+
+    def put(self, session_key: str, values: Dict[str, Any]) -> str:
+        """Store `values` for one session (sized with `nbytes`); returns the new handle."""
+        handle = uuid.uuid4().hex
+        sizes = {k: nbytes(v) for k, v in values.items()}
+        with self._lock:
+            self._entries[handle] = {
+                "session": session_key, "values": dict(values), "sizes": sizes, "accessed": time.monotonic(),
+            }
+            self._bytes += sum(sizes.values())
+            self._evict()
+        return handle
+
+    def get(self, session_key: str, handle: str) -> Optional[Dict[str, Any]]:
+        """The values stored under `handle`, or None if unknown, expired or another session's."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(handle)
+            if entry is None or entry["session"] != session_key:
+                self.misses += 1
+                return None
+            if self.ttl_s > 0 and now - entry["accessed"] > self.ttl_s:
+                self._drop(handle)
+                self.expired += 1
+                self.misses += 1
+                return None
+            entry["accessed"] = now
+            self._entries.move_to_end(handle)
+            self.hits += 1
+            return entry["values"]
+
+    def update(self, session_key: str, handle: str, **values):
+        """Add stage outputs to an existing handle (no-op if it is gone); re-sizes it and evicts."""
+        sizes = {k: nbytes(v) for k, v in values.items()}
+        with self._lock:
+            entry = self._entries.get(handle)
+            if entry is None or entry["session"] != session_key:
+                return
+            for key, size in sizes.items():
+                self._bytes += size - entry["sizes"].get(key, 0)
+                entry["sizes"][key] = size
+            entry["values"].update(values)
+            entry["accessed"] = time.monotonic()
+            self._entries.move_to_end(handle)
+            self._evict()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl_s": self.ttl_s,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expired": self.expired,
+            }
+
+
+# one key per live MCP session object; a new session never sees an old session's handles
+_session_keys: "weakref.WeakKeyDictionary[Any, str]" = weakref.WeakKeyDictionary()
+_keys_lock = threading.Lock()
+
+
+def session_key(session: Any) -> str:
+    with _keys_lock:
+        key = _session_keys.get(session)
+        if key is None:
+            key = _session_keys[session] = uuid.uuid4().hex
+        return key
+
+
+_store: Optional[ContextStore] = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> ContextStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ContextStore(
+                    max_entries=MCP_CONTEXT_MAX_ENTRIES,
+                    max_bytes=int(MCP_CONTEXT_MAX_MB * 1024 * 1024),
+                    ttl_s=MCP_CONTEXT_TTL_S,
+                )
+    return _store
@@ -0,0 +1,300 @@
+import re
+import json
+import time
+import random
+import asyncio
+import threading
+from contextlib import nullcontext
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional, Type, Union
+
+from pydantic import BaseModel
+
+from .config import FAKE_LLM_LATENCY, FAKE_LLM_ERROR_RATE, FAKE_LLM_SEED, FAKE_LLM_RPM, FAKE_LLM_QUOTA_PATH
+from .gemini_client import TokenUsage
+from .rate_limiter import estimate_tokens, limiter_from_config, state_store
+from .rules import fast_classify
+from .schemas import Ticket
+from .tracing import span
+
+# -------------------------
+# Offline stand-in for GeminiClient (LLM_BACKEND=fake): same call surface, answers
+# that validate against the stage schemas, latency drawn from a configurable
+# distribution, an optional rate of transient (503) failures and an optional
+# requests-per-minute quota answered with 429s (FAKE_LLM_RPM). Used by the
+# benchmarks; the MCP server subprocess inherits LLM_BACKEND and uses it too.
+# -------------------------
+
+
+_DEFAULT = object()
+
+
+class FakeLLMError(Exception):
+    """Simulated transient API failure (request_policy retries it like a real 503)."""
+
+    code = 503
+
+
+class FakeQuotaError(FakeLLMError):
+    """Simulated 429 RESOURCE_EXHAUSTED: the fake quota (FAKE_LLM_RPM) is used up."""
+
+    code = 429
+
+
+class FakeQuota:
+    """
+    Server-side quota stand-in: token bucket of `rpm`/60 per second holding one second's
+    worth. With `path` the bucket is shared by every process using it (one API project
+    serving many clients), via the rate limiter's flock'd state file.
+    """
+
+    def __init__(self, rpm: float, path: Optional[str] = None):
+        self.rate = rpm / 60
+        self.capacity = max(1.0, self.rate)
+        self._state = state_store(path)
+
+    def take(self) -> bool:
+        now = time.time()
+        with self._state.transact() as s:
+            tokens = min(self.capacity, s.get("tokens", self.capacity) + (now - s.get("t", now)) * self.rate)
+            s["t"] = now
+            s["tokens"] = tokens - 1 if tokens >= 1 else tokens
+            return tokens >= 1
+
+
+class LatencyModel:
+    """
+    Latency distribution from a spec string (milliseconds):
+      const:MS | uniform:LO:HI | normal:MEAN:SD | lognormal:MEDIAN:SIGMA | exp:MEAN
+    or a callable(rng) -> ms for shapes no spec describes (e.g. a stall on every n-th call).
+    """
+
+    KINDS = {"const": 1, "uniform": 2, "normal": 2, "lognormal": 2, "exp": 1}
+
+    def __init__(self, spec: Union[str, Callable[[random.Random], float]]):
+        self._draw = None
+        if callable(spec):
+            self.spec, self.kind, self.params = getattr(spec, "__name__", "custom"), "custom", []
+            self._draw = spec
+            return
+        kind, *params = spec.strip().split(":")
+        if kind not in self.KINDS or len(params) != self.KINDS[kind]:
+            raise ValueError(f"bad latency spec {spec!r} (e.g. 'lognormal:800:0.4', 'const:500')")
+        self.spec = spec
+        self.kind = kind
+        self.params = [float(p) for p in params]
+
+    def sample_ms(self, rng: random.Random) -> float:
+        if self._draw is not None:
+            return self._draw(rng)
+        p = self.params
+        if self.kind == "const":
+            return p[0]
+        if self.kind == "uniform":
+            return rng.uniform(p[0], p[1])
+        if self.kind == "normal":
+            return max(0.0, rng.gauss(p[0], p[1]))
+        if self.kind == "lognormal":
+            return p[0] * rng.lognormvariate(0.0, p[1])
+        return rng.expovariate(1.0 / p[0])
+
+
+CANNED = {
+    "troubleshooting": {
+        "probable_cause": "Local client configuration or connectivity issue.",
+        "steps": [
+            "Confirm the issue and note the exact error message.",
+            "Restart the affected application and the device.",
+            "Check network connectivity and retry.",
+            "Reinstall or reset the client configuration if the error persists.",
+        ],
+        "data_needed": ["When did the issue start?"],
+        "risk_level": "Low",
+    },
+    "communication": {
+        "user_message": "Hi, we are looking into your issue. Please restart the application and let us know if it persists.",
+        "ticket_update": "Classified and triaged. Probable cause: client configuration. Steps shared with the user.",
+        "close_recommendation": False,
+    },
+}
+
+_SECTIONS_ASKED = re.compile(r"Answer with the (.+?) section\(s\)")
+
+
+def _context(user_prompt: str, title: str) -> Any:
+    """A context block of a prompts.build() prompt ("TITLE:\\n<compact json>")."""
+    m = re.search(rf"(?m)^{title}:\n(.*)$", user_prompt)
+    if m is None:
+        return None
+    try:
+        return json.loads(m.group(1))
+    except json.JSONDecodeError:
+        return None
+
+
+def _classification(raw: Optional[dict]) -> dict:
+    # the rule scorer keeps categories plausible (and varied) without a model
+    cls = None
+    if isinstance(raw, dict):
+        try:
+            cls = fast_classify(Ticket(**raw))
+        except Exception:
+            cls = None
+    if cls is None:
+        return {
+            "category": "Other", "priority": "P3", "assignment_group": "CIS-EUC-Support",
+            "confidence": 0.5, "reason": "No clear signal in the ticket text.",
+        }
+    return {**cls.model_dump(), "reason": f"Looks like a {cls.category} issue."}
+
+
+def fake_answer(stage: str, user_prompt: str, schema: Optional[Type[BaseModel]] = None) -> dict:
+    """A schema-valid answer for a stage prompt built by prompts.py."""
+    if stage == "classification":
+        return _classification(_context(user_prompt, "TICKET"))
+    if stage == "classification_batch":
+        tickets = _context(user_prompt, "TICKETS") or []
+        return {"results": [{**_classification(t), "ticket_id": t.get("ticket_id", "")} for t in tickets]}
+    if stage == "fused":
+        if schema is not None:
+            sections = list(schema.model_fields)
+        else:
+            m = _SECTIONS_ASKED.search(user_prompt)
+            sections = [s.strip() for s in m.group(1).split(",")] if m else ["classification", *CANNED]
+        ticket = _context(user_prompt, "TICKET")
+        return {s: _classification(ticket) if s == "classification" else CANNED[s] for s in sections}
+    return dict(CANNED.get(stage, {}))
+
+
+class FakeGeminiClient:
+    """
+    Drop-in for GeminiClient without network access. Every call sleeps for one latency
+    sample (streaming spreads it over the fields) and then either raises FakeLLMError
+    (with probability `error_rate`) or returns `fake_answer(...)`. No response cache.
+    With `rpm` (default FAKE_LLM_RPM) calls over the quota fail at once with
+    FakeQuotaError (429). Requests go through the rate limiter like GeminiClient's when
+    it is on (LLM_RATE_LIMIT=on; see rate_limiter).
+    """
+
+    def __init__(
+        self,
+        latency: Union[str, Callable[[random.Random], float], None] = None,
+        error_rate: Optional[float] = None,
+        seed: Optional[int] = None,
+        answer: Callable[[str, str, Optional[Type[BaseModel]]], dict] = fake_answer,
+        rpm: Optional[float] = None,
+        limiter=_DEFAULT,
+    ):
+        self.latency = LatencyModel(latency or FAKE_LLM_LATENCY)
+        self.error_rate = FAKE_LLM_ERROR_RATE if error_rate is None else error_rate
+        if seed is None and FAKE_LLM_SEED:
+            seed = int(FAKE_LLM_SEED)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._answer = answer
+        self.model = f"fake:{self.latency.spec}"
+        self.cache = None
+        self.usage = TokenUsage()
+        self.calls = 0
+        self.errors = 0
+        self.throttled = 0
+        rpm = FAKE_LLM_RPM if rpm is None else rpm
+        self.quota = FakeQuota(rpm, FAKE_LLM_QUOTA_PATH) if rpm > 0 else None
+        self.limiter = limiter_from_config(real_api=False) if limiter is _DEFAULT else limiter
+
+    def _admit(self, system_prompt: str, user_prompt: str):
+        if self.limiter is None:
+            return nullcontext()
+        return self.limiter.admit(estimate_tokens(system_prompt, user_prompt))
+
+    def _admit_async(self, system_prompt: str, user_prompt: str):
+        if self.limiter is None:
+            return nullcontext()
+        return self.limiter.admit_async(estimate_tokens(system_prompt, user_prompt))
+
+    def _draw(self, stage: str) -> tuple:
+        if self.quota is not None and not self.quota.take():
+            with self._lock:
+                self.calls += 1
+                self.throttled += 1
+            raise FakeQuotaError(f"simulated 429 RESOURCE_EXHAUSTED ({stage or 'call'})")
+        with self._lock:
+            self.calls += 1
+            fail = self._rng.random() < self.error_rate
+            if fail:
+                self.errors += 1
+            return self.latency.sample_ms(self._rng) / 1000, fail
+
+    def _finish(self, stage: str, system_prompt: str, user_prompt: str, schema, fail: bool) -> dict:
+        if fail:
+            raise FakeLLMError(f"simulated 503 ({stage or 'call'})")
+        data = self._answer(stage, user_prompt, schema)
+        self.usage.record(stage, SimpleNamespace(
+            prompt_token_count=(len(system_prompt) + len(user_prompt)) // 4,
+            candidates_token_count=len(json.dumps(data)) // 4,
+            thoughts_token_count=0,
+        ))
+        return data
+
+    def generate_json(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        schema: Optional[Type[BaseModel]] = None,
+        stage: str = "",
+    ) -> dict:
+        with span("gemini.generate", stage=stage, model=self.model), self._admit(system_prompt, user_prompt):
+            delay, fail = self._draw(stage)
+            with span("gemini.request"):
+                time.sleep(delay)
+            return self._finish(stage, system_prompt, user_prompt, schema, fail)
+
+    async def generate_json_async(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        schema: Optional[Type[BaseModel]] = None,
+        stage: str = "",
+    ) -> dict:
+        with span("gemini.generate", stage=stage, model=self.model):
+            async with self._admit_async(system_prompt, user_prompt):
+                delay, fail = self._draw(stage)
+                with span("gemini.request"):
+                    await asyncio.sleep(delay)
+                return self._finish(stage, system_prompt, user_prompt, schema, fail)
+
+    def generate_json_stream(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        on_field: Optional[Callable[[str, Any], None]] = None,
+        timing: Optional[dict] = None,
+        schema: Optional[Type[BaseModel]] = None,
+        stage: str = "",
+    ) -> dict:
+        t0 = time.perf_counter()
+        with span("gemini.generate", stage=stage, model=self.model, stream=True), \
+                self._admit(system_prompt, user_prompt):
+            delay, fail = self._draw(stage)
+            # ~30% of the latency before the first token, the rest spread over the fields
+            time.sleep(delay * 0.3)
+            data = self._finish(stage, system_prompt, user_prompt, schema, fail)
+            fields: List[tuple] = list(data.items())
+            first = None
+            for key, value in fields:
+                time.sleep(delay * 0.7 / len(fields))
+                if first is None:
+                    first = (time.perf_counter() - t0) * 1000
+                if on_field is not None:
+                    on_field(key, value)
+        if timing is not None:
+            timing["first_field_ms"] = round(first, 1) if first is not None else None
+            timing["total_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+        return data
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out = {"model": self.model, "calls": self.calls, "errors": self.errors, "error_rate": self.error_rate}
+            if self.quota is not None:
+                out.update(throttled=self.throttled, quota_rpm=self.quota.rate * 60)
+            return out
@@ -1,34 +1,297 @@
-from google import genai
-from google.genai import types
+import time
+import threading
+from contextlib import nullcontext
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional, Type
 
-from .config import GEMINI_API_KEY, GEMINI_MODEL, TEMPERATURE, MAX_OUTPUT_TOKENS
+from pydantic import BaseModel
+
+from .config import (
+    GEMINI_API_KEY,
+    GEMINI_MODEL,
+    TEMPERATURE,
+    MAX_OUTPUT_TOKENS,
+    HTTP_MAX_CONNECTIONS,
+    HTTP_KEEPALIVE_EXPIRY_S,
+)
 from .json_utils import load_json_strict
+from .json_stream import IncrementalJSONParser
+from .llm_cache import cache_key, cache_from_config
+from .rate_limiter import estimate_tokens, limiter_from_config
+from .tracing import span
+
+if TYPE_CHECKING:
+    import httpx
+    from google.genai import types
+
+# httpx and google.genai (~0.5 s of imports) load when the first GeminiClient is built,
+# not at import time: the fake/replay backends, the mcp runner's client process and
+# `--help` never pay for them.
+
+_DEFAULT = object()
+
+
+def _usage_attrs(usage_metadata) -> dict:
+    if usage_metadata is None:
+        return {}
+    return {
+        "input_tokens": usage_metadata.prompt_token_count or 0,
+        "output_tokens": usage_metadata.candidates_token_count or 0,
+    }
+
+
+def _settle(admission, usage_metadata):
+    # charge the quota with the real input token count instead of the estimate
+    if admission is not None and usage_metadata is not None and usage_metadata.prompt_token_count:
+        admission.tokens = usage_metadata.prompt_token_count
+
+
+def _pool_limits() -> "httpx.Limits":
+    import httpx
+
+    return httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_CONNECTIONS,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY_S,
+    )
+
+
+class TokenUsage:
+    """Per-stage token counts from the responses' usage_metadata (cache hits cost nothing)."""
 
-class GeminiClient:
     def __init__(self):
+        self._lock = threading.Lock()
+        self._stages: Dict[str, Dict[str, int]] = {}
+
+    def record(self, stage: str, usage_metadata):
+        if usage_metadata is None:
+            return
+        with self._lock:
+            row = self._stages.setdefault(
+                stage or "other", {"calls": 0, "input_tokens": 0, "output_tokens": 0, "thinking_tokens": 0}
+            )
+            row["calls"] += 1
+            row["input_tokens"] += usage_metadata.prompt_token_count or 0
+            row["output_tokens"] += usage_metadata.candidates_token_count or 0
+            row["thinking_tokens"] += usage_metadata.thoughts_token_count or 0
+
+    def snapshot(self) -> Dict[str, dict]:
+        with self._lock:
+            return {
+                stage: {
+                    **row,
+                    "mean_input_tokens": round(row["input_tokens"] / row["calls"], 1),
+                    "mean_output_tokens": round(row["output_tokens"] / row["calls"], 1),
+                }
+                for stage, row in self._stages.items()
+            }
+
+
+class GeminiClient:
+    """
+    Thin wrapper over google-genai that returns parsed JSON.
+
+    Sync and async calls each go through ONE pooled keep-alive httpx client, so
+    concurrent tickets reuse TLS connections instead of opening one per request.
+    The async pool belongs to the event loop that first uses it: share one loop
+    (e.g. `asyncio.gather` over tickets) rather than calling `asyncio.run` per call.
+    Custom httpx clients can be injected (tests use a fake transport).
+
+    Parsed responses are cached by content hash (see llm_cache); a hit skips both
+    the network call and JSON repair. Pass cache=None to disable.
+
+    Given `schema` (a pydantic model), a call uses structured output: the model is
+    constrained to JSON matching that schema (response_mime_type + response_schema).
+
+    `stage` labels the call in `usage` (per-stage input/output token counts).
+
+    Every request (cache misses only) is admitted by the host-wide rate limiter first
+    (see rate_limiter; RPM / TPM budget, AIMD concurrency). Pass limiter=None to skip it.
+    Under a request policy the wait for admission pauses the attempt's clock: it is not
+    recorded as latency and does not trigger a hedge.
+    """
+
+    def __init__(
+        self,
+        http_client: "httpx.Client" = None,
+        async_http_client: "httpx.AsyncClient" = None,
+        cache=_DEFAULT,
+        limiter=_DEFAULT,
+    ):
         if not GEMINI_API_KEY:
             raise RuntimeError("GEMINI_API_KEY missing in .env")
-        self.client = genai.Client(api_key=GEMINI_API_KEY)
-        self.model = GEMINI_MODEL
 
-    def generate_json(self, system_prompt: str, user_prompt: str) -> dict:
-        prompt = (
-            f"{system_prompt}\n\n"
-            "STRICT RULES:\n"
-            "1) Output ONLY JSON\n"
-            "2) No markdown, no ```\n"
-            "3) No trailing commas\n\n"
-            f"{user_prompt}"
+        import httpx
+        from google import genai
+        from google.genai import types
+
+        self.http_client = http_client or httpx.Client(limits=_pool_limits())
+        self.async_http_client = async_http_client or httpx.AsyncClient(limits=_pool_limits())
+
+        self.client = genai.Client(
+            api_key=GEMINI_API_KEY,
+            http_options=types.HttpOptions(
+                httpx_client=self.http_client,
+                httpx_async_client=self.async_http_client,
+            ),
         )
+        self.model = GEMINI_MODEL
+        self.cache = cache_from_config() if cache is _DEFAULT else cache
+        self.usage = TokenUsage()
+        self.limiter = limiter_from_config() if limiter is _DEFAULT else limiter
 
-        resp = self.client.models.generate_content(
-            model=self.model,
-            contents=prompt,
-            config=types.GenerateContentConfig(
+    def _admit(self, system_prompt: str, user_prompt: str):
+        if self.limiter is None:
+            return nullcontext()
+        return self.limiter.admit(estimate_tokens(system_prompt, user_prompt))
+
+    def _admit_async(self, system_prompt: str, user_prompt: str):
+        if self.limiter is None:
+            return nullcontext()
+        return self.limiter.admit_async(estimate_tokens(system_prompt, user_prompt))
+
+    @staticmethod
+    def _build_prompt(system_prompt: str, user_prompt: str) -> str:
+        # output-format rules live in the stage prompts (see prompts.py), not here
+        return f"{system_prompt}\n\n{user_prompt}"
+
+    def _config(self, schema: Optional[Type[BaseModel]] = None) -> "types.GenerateContentConfig":
+        from google.genai import types
+
+        if schema is None:
+            return types.GenerateContentConfig(
                 temperature=TEMPERATURE,
                 max_output_tokens=MAX_OUTPUT_TOKENS,
-            ),
+            )
+        return types.GenerateContentConfig(
+            temperature=TEMPERATURE,
+            max_output_tokens=MAX_OUTPUT_TOKENS,
+            response_mime_type="application/json",
+            response_schema=schema,
         )
 
-        text = (resp.text or "").strip()
-        return load_json_strict(text)
\ No newline at end of file
+    def _cache_key(self, system_prompt: str, user_prompt: str, schema: Optional[Type[BaseModel]] = None) -> str:
+        return cache_key(
+            self.model, system_prompt, user_prompt, TEMPERATURE, MAX_OUTPUT_TOKENS,
+            schema.__name__ if schema is not None else "",
+        )
+
+    def _store(self, key: str, data: dict) -> dict:
+        # never cache failed parses ({}), so a retry can still succeed
+        if self.cache is not None and data:
+            self.cache.put(key, data)
+        return data
+
+    def generate_json(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        schema: Optional[Type[BaseModel]] = None,
+        stage: str = "",
+    ) -> dict:
+        with span("gemini.generate", stage=stage, model=self.model) as sp:
+            key = self._cache_key(system_prompt, user_prompt, schema)
+            if self.cache is not None:
+                hit = self.cache.get(key)
+                if hit is not None:
+                    sp.set(cache="hit")
+                    return hit
+
+            with self._admit(system_prompt, user_prompt) as adm, span("gemini.request"):
+                resp = self.client.models.generate_content(
+                    model=self.model,
+                    contents=self._build_prompt(system_prompt, user_prompt),
+                    config=self._config(schema),
+                )
+                _settle(adm, resp.usage_metadata)
+
+            self.usage.record(stage, resp.usage_metadata)
+            sp.set(**_usage_attrs(resp.usage_metadata))
+            text = (resp.text or "").strip()
+            return self._store(key, load_json_strict(text))
+
+    async def generate_json_async(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        schema: Optional[Type[BaseModel]] = None,
+        stage: str = "",
+    ) -> dict:
+        with span("gemini.generate", stage=stage, model=self.model) as sp:
+            key = self._cache_key(system_prompt, user_prompt, schema)
+            if self.cache is not None:
+                hit = self.cache.get(key)
+                if hit is not None:
+                    sp.set(cache="hit")
+                    return hit
+
+            async with self._admit_async(system_prompt, user_prompt) as adm:
+                with span("gemini.request"):
+                    resp = await self.client.aio.models.generate_content(
+                        model=self.model,
+                        contents=self._build_prompt(system_prompt, user_prompt),
+                        config=self._config(schema),
+                    )
+                _settle(adm, resp.usage_metadata)
+
+            self.usage.record(stage, resp.usage_metadata)
+            sp.set(**_usage_attrs(resp.usage_metadata))
+            text = (resp.text or "").strip()
+            return self._store(key, load_json_strict(text))
+
+    def generate_json_stream(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        on_field: Optional[Callable[[str, Any], None]] = None,
+        timing: Optional[dict] = None,
+        schema: Optional[Type[BaseModel]] = None,
+        stage: str = "",
+    ) -> dict:
+        """
+        Streaming variant of `generate_json`: `on_field(key, value)` fires for each
+        top-level field as soon as it is complete in the token stream. The return value
+        is the full response parsed by `load_json_strict` (authoritative).
+        If given, `timing` receives first_field_ms and total_ms for this call.
+        """
+        t0 = time.perf_counter()
+        first = [None]
+
+        def emit(fields):
+            for key, value in fields:
+                if first[0] is None:
+                    first[0] = (time.perf_counter() - t0) * 1000
+                if on_field is not None:
+                    on_field(key, value)
+
+        with span("gemini.generate", stage=stage, model=self.model, stream=True) as sp:
+            key = self._cache_key(system_prompt, user_prompt, schema)
+            data = self.cache.get(key) if self.cache is not None else None
+            if data is not None:
+                sp.set(cache="hit")
+                emit(list(data.items()))
+            else:
+                parser = IncrementalJSONParser()
+                parts = []
+                usage = None
+                with self._admit(system_prompt, user_prompt) as adm, span("gemini.request"):
+                    for chunk in self.client.models.generate_content_stream(
+                        model=self.model,
+                        contents=self._build_prompt(system_prompt, user_prompt),
+                        config=self._config(schema),
+                    ):
+                        usage = chunk.usage_metadata or usage  # cumulative; the last chunk has the totals
+                        text = chunk.text or ""
+                        parts.append(text)
+                        emit(parser.feed(text))
+                    emit(parser.finish())
+                    _settle(adm, usage)
+                self.usage.record(stage, usage)
+                sp.set(**_usage_attrs(usage))
+                data = self._store(key, load_json_strict("".join(parts).strip()))
+
+            if first[0] is not None:
+                sp.set(first_field_ms=round(first[0], 1))
+            if timing is not None:
+                timing["first_field_ms"] = round(first[0], 1) if first[0] is not None else None
+                timing["total_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+            return data
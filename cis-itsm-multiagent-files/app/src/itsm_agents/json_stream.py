@@ -0,0 +1,106 @@
+import json
+from typing import Any, Dict, List, Tuple
+
+from .json_utils import repair_json
+
+
+class IncrementalJSONParser:
+    """
+    Feed model output chunk by chunk; get back each top-level field of the JSON object
+    as soon as its value is complete.
+
+    Single pass over the characters with string/escape tracking, so braces, brackets
+    and commas inside strings never end a value early. Text before the first "{"
+    (e.g. a ```json fence) is skipped. `finish()` flushes a value cut off by the end
+    of the stream (best-effort repair).
+    """
+
+    def __init__(self):
+        self.fields: Dict[str, Any] = {}
+        self._phase = "pre"  # pre -> key_wait -> key -> colon -> value -> ... -> done
+        self._depth = 0
+        self._in_str = False
+        self._esc = False
+        self._buf: List[str] = []
+        self._key = ""
+
+    def _emit(self, out: List[Tuple[str, Any]], truncated: bool = False):
+        text = "".join(self._buf).strip()
+        self._buf = []
+        if not text:
+            return
+        try:
+            value = json.loads(text)
+        except json.JSONDecodeError:
+            try:
+                value = json.loads(repair_json(text + ('"' if truncated and self._in_str else "")))
+            except json.JSONDecodeError:
+                return
+        self.fields[self._key] = value
+        out.append((self._key, value))
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        out: List[Tuple[str, Any]] = []
+        for c in chunk:
+            phase = self._phase
+            if phase == "done":
+                break
+            if phase == "pre":
+                if c == "{":
+                    self._depth = 1
+                    self._phase = "key_wait"
+                continue
+
+            if self._in_str:
+                if phase in ("key", "value"):
+                    self._buf.append(c)
+                if self._esc:
+                    self._esc = False
+                elif c == "\\":
+                    self._esc = True
+                elif c == '"':
+                    self._in_str = False
+                    if phase == "key":
+                        self._key = json.loads("".join(self._buf))
+                        self._buf = []
+                        self._phase = "colon"
+                continue
+
+            if c == '"':
+                self._in_str = True
+                if phase == "key_wait":
+                    self._phase = "key"
+                    self._buf = ['"']
+                elif phase == "value":
+                    self._buf.append(c)
+                continue
+
+            if phase == "key_wait":
+                if c == "}":
+                    self._phase = "done"
+            elif phase == "colon":
+                if c == ":":
+                    self._phase = "value"
+                    self._buf = []
+            elif phase == "value":
+                if c in "{[":
+                    self._depth += 1
+                elif c in "}]":
+                    if self._depth == 1:
+                        self._emit(out)
+                        self._phase = "done"
+                        continue
+                    self._depth -= 1
+                elif c == "," and self._depth == 1:
+                    self._emit(out)
+                    self._phase = "key_wait"
+                    continue
+                self._buf.append(c)
+        return out
+
+    def finish(self) -> List[Tuple[str, Any]]:
+        out: List[Tuple[str, Any]] = []
+        if self._phase == "value":
+            self._emit(out, truncated=True)
+            self._phase = "done"
+        return out
@@ -1,49 +1,186 @@
-import json
 import re
+import json
+from typing import Any, List, Optional, Tuple
+
+from .tracing import span
+
+# Structure of a JSON prefix, found with C-level regex passes and str.count instead of
+# a Python loop per character. Escapes (always two characters) are blanked first, so
+# every remaining quote delimits a string: a position is outside strings iff an even
+# number of quotes precede it.
+_ESCAPE = re.compile(r"\\.", re.DOTALL)
+_CLOSED_STRING = re.compile(r'"[^"]*"')
+_NOT_STRUCTURE = re.compile(r'[^{}\[\]"]+')
+# a comma right before "]" / "}", or a ``` fence; only those outside strings count
+_COMMA_CLOSE_OR_FENCE = re.compile(r",(?=\s*[\]}])|```")
+_CLOSER = {"{": "}", "[": "]"}
+_MAX_CUTS = 64  # cut-backs tried before giving up
+_decoder = json.JSONDecoder()
+
+
+def _object_start(text: str) -> int:
+    """Index of the first "{", looking inside a ``` fence first if there is one."""
+    fence = text.find("```")
+    if fence != -1:
+        start = text.find("{", fence)
+        if start != -1:
+            return start
+    return text.find("{")
+
+
+def _unescaped(s: str) -> str:
+    return _ESCAPE.sub("__", s) if "\\" in s else s
+
+
+def _open_brackets(prefix: str) -> Tuple[str, bool]:
+    """(closers for the brackets still open at the end of `prefix`, whether it ends inside a string)."""
+    u = _NOT_STRUCTURE.sub("", _CLOSED_STRING.sub("", _unescaped(prefix)))
+    stack: List[str] = []
+    for c in u.partition('"')[0]:
+        if c in _CLOSER:
+            stack.append(c)
+        elif stack and c == _CLOSER[stack[-1]]:
+            stack.pop()
+    return "".join(_CLOSER[b] for b in reversed(stack)), '"' in u
+
+
+def _scan(s: str) -> Tuple[str, List[int]]:
+    """
+    One linear pass over `s`, string-aware through a running quote parity: drops the
+    commas right before a "]" / "}" and stops at a ``` fence (the end of a fenced reply)
+    outside strings. Returns (cleaned text, positions in `s` of the dropped commas).
+    """
+    u = _unescaped(s)
+    parts: List[str] = []
+    dropped: List[int] = []
+    prev = counted = quotes = 0
+    for m in _COMMA_CLOSE_OR_FENCE.finditer(u):
+        i = m.start()
+        quotes += u.count('"', counted, i)
+        counted = i
+        if quotes % 2:
+            continue  # inside a string
+        parts.append(s[prev:i])
+        if u[i] == "`":
+            return "".join(parts), dropped
+        dropped.append(i)
+        prev = i + 1
+    parts.append(s[prev:])
+    return "".join(parts), dropped
+
+
+def _decode(text: str):
+    """(value, end), or the JSONDecodeError."""
+    try:
+        return _decoder.raw_decode(text)
+    except json.JSONDecodeError as e:
+        return e
+
+
+def _recover(s: str, failed: bool = False) -> Tuple[str, Any, Optional[int]]:
+    """
+    Repairs the JSON value at the start of `s` (`failed`: the caller already knows it
+    does not decode as is). The C decoder does the parsing and checks every fix:
+
+    1. commas right before "]" / "}" outside strings are removed, and a closing ```
+       fence ends the text (`_scan`)
+    2. if it still does not decode, the text is treated as cut off: an open string
+       value is closed, or a trailing comma dropped, and the open brackets are closed
+       in the right order
+    3. failing that (a key, a partial literal or junk at the error position), it is
+       cut back to the last comma or opening bracket before the error and closed again
+
+    Returns (repaired, value, end): `value` is None if nothing decodes; `end` is the
+    index in `s` just past the value if it was complete (step 1 at most).
+    """
+    scanned, dropped = _scan(s)
+    cut_at_fence = len(scanned) + len(dropped) < len(s)
+    s = scanned
+    if dropped or cut_at_fence or not failed:
+        got = _decode(s)
+        if not isinstance(got, json.JSONDecodeError):
+            value, end = got
+            return s[:end], value, end + sum(1 for k, i in enumerate(dropped) if i - k < end)
+
+    body = s.rstrip()
+    closers, in_string = _open_brackets(body)
+    if in_string:
+        # a dangling backslash cannot be completed; the rest of the string is kept
+        if (len(body) - len(body.rstrip("\\"))) % 2:
+            body = body[:-1]
+        candidate = body + '"' + closers
+    else:
+        candidate = (body[:-1] if body.endswith(",") else body) + closers
+
+    for _ in range(_MAX_CUTS):
+        got = _decode(candidate)
+        if not isinstance(got, json.JSONDecodeError):
+            value, end = got
+            return candidate[:end], value, None
+        p = min(got.pos, len(body))
+        while True:
+            cut = max(body.rfind(",", 0, p), body.rfind("{", 0, p), body.rfind("[", 0, p))
+            if cut < 0:
+                return candidate, None, None
+            body = body[:cut] if body[cut] == "," else body[:cut + 1]
+            closers, in_string = _open_brackets(body)
+            if not in_string:
+                break
+            p = cut  # that comma/bracket was inside a string: further back
+        candidate = body + closers
+    return candidate, None, None
+
 
 def extract_json(text: str) -> str:
+    """First balanced JSON object in `text` (fences and surrounding prose ignored)."""
     if not text:
         return ""
     text = text.strip()
+    start = _object_start(text)
+    if start == -1:
+        return text
+    try:
+        _, end = _decoder.raw_decode(text, start)
+    except json.JSONDecodeError:
+        end = _recover(text[start:], failed=True)[2]
+        end = len(text) if end is None else start + end
+    return text[start:end].strip()
 
-    fence = re.search(r"```(?:json)?\s*(\{.*?\})\s*```", text, flags=re.DOTALL | re.IGNORECASE)
-    if fence:
-        return fence.group(1).strip()
-
-    start, end = text.find("{"), text.rfind("}")
-    if start != -1 and end != -1 and end > start:
-        return text[start:end+1].strip()
-
-    return text
 
 def repair_json(s: str) -> str:
+    """Drop trailing commas and close truncated strings/arrays/objects (string-aware)."""
     if not s:
         return s
+    s = s.strip()
+    if s[:1] not in ("{", "[", '"'):
+        return s
+    return _recover(s)[0]
 
-    # remove trailing commas before closing braces/brackets
-    s = re.sub(r",\s*([\]}])", r"\1", s)
-    # remove trailing comma at end
-    s = re.sub(r",\s*$", "", s)
-
-    # balance brackets (for truncated output)
-    open_sq, close_sq = s.count("["), s.count("]")
-    open_cu, close_cu = s.count("{"), s.count("}")
-
-    if close_sq < open_sq:
-        s += "]" * (open_sq - close_sq)
-    if close_cu < open_cu:
-        s += "}" * (open_cu - close_cu)
-
-    return s.strip()
 
 def load_json_strict(text: str) -> dict:
-    extracted = extract_json(text)
-    try:
-        return json.loads(extracted)
-    except json.JSONDecodeError:
-        fixed = repair_json(extracted)
+    with span("json.parse", chars=len(text or "")) as sp:
+        if not text:
+            sp.set(path="empty")
+            return {}
+        text = text.strip()
+        start = _object_start(text)
+        if start == -1:
+            sp.set(path="empty")
+            return {}
+
+        # fast path (C decoder): well-formed object, possibly wrapped in a fence or prose
         try:
-            return json.loads(fixed)
+            data, _ = _decoder.raw_decode(text, start)
+            sp.set(path="fast")
+            return data if isinstance(data, dict) else {}
         except json.JSONDecodeError:
+            pass
+
+        # slow path: trailing commas dropped, truncated output closed (see _recover)
+        sp.set(path="repair")
+        _, data, _ = _recover(text[start:], failed=True)
+        if data is None:
             # Return empty dict if still invalid
+            sp.set(path="failed")
             return {}
+        return data if isinstance(data, dict) else {}
@@ -0,0 +1,149 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from .config import LLM_CACHE, LLM_CACHE_PATH, LLM_CACHE_MAX_ENTRIES, LLM_CACHE_DISK_MAX_ENTRIES, LLM_CACHE_TTL_S
+
+
+def cache_key(
+    model: str, system_prompt: str, user_prompt: str, temperature: float, max_tokens: int, schema: str = ""
+) -> str:
+    """Content address of one model request (same inputs -> same key)."""
+    parts = [model, system_prompt, user_prompt, temperature, max_tokens] + ([schema] if schema else [])
+    payload = json.dumps(parts, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Two-tier cache of parsed model responses.
+
+    - memory: LRU (OrderedDict) bounded by `max_entries`
+    - disk (optional): SQLite file bounded by `disk_max_entries`, survives restarts
+    Entries older than `ttl_s` are treated as misses and dropped (ttl_s <= 0 disables expiry).
+    Values are stored as JSON text so a hit never goes through JSON repair again.
+    Thread-safe; any object with get(key)/put(key, value) can be used in its place.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl_s: float = 3600,
+        disk_path: Optional[str] = None,
+        disk_max_entries: int = 100_000,
+    ):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_s = ttl_s
+        self.disk_max_entries = max(1, int(disk_max_entries))
+        self._mem: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if disk_path:
+            os.makedirs(os.path.dirname(os.path.abspath(disk_path)), exist_ok=True)
+            self._db = sqlite3.connect(disk_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses(accessed)")
+            self._db.commit()
+
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.evictions = 0
+
+    def _expired(self, created: float, now: float) -> bool:
+        return self.ttl_s > 0 and now - created > self.ttl_s
+
+    def get(self, key: str) -> Optional[dict]:
+        now = time.time()
+        with self._lock:
+            entry = self._mem.get(key)
+            if entry is not None:
+                value, created = entry
+                if not self._expired(created, now):
+                    self._mem.move_to_end(key)
+                    self.hits += 1
+                    return json.loads(value)
+                del self._mem[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, created FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    value, created = row
+                    if not self._expired(created, now):
+                        self._db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+                        self._db.commit()
+                        self._remember(key, value, created)
+                        self.hits += 1
+                        self.disk_hits += 1
+                        return json.loads(value)
+                    self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._db.commit()
+
+            self.misses += 1
+            return None
+
+    def put(self, key: str, value: dict) -> None:
+        now = time.time()
+        text = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self._remember(key, text, now)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                    (key, text, now, now),
+                )
+                (count,) = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()
+                if count > self.disk_max_entries:
+                    self._db.execute(
+                        "DELETE FROM responses WHERE key IN "
+                        "(SELECT key FROM responses ORDER BY accessed ASC LIMIT ?)",
+                        (count - self.disk_max_entries,),
+                    )
+                    self.evictions += count - self.disk_max_entries
+                self._db.commit()
+
+    def _remember(self, key: str, text: str, created: float) -> None:
+        self._mem[key] = (text, created)
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_entries:
+            self._mem.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            disk_size = 0
+            if self._db is not None:
+                (disk_size,) = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "disk_hits": self.disk_hits,
+                "evictions": self.evictions,
+                "memory_size": len(self._mem),
+                "disk_size": disk_size,
+            }
+
+
+def cache_from_config() -> Optional[ResponseCache]:
+    """Build the cache selected by LLM_CACHE (off | memory | sqlite)."""
+    mode = LLM_CACHE.lower()
+    if mode in ("", "off", "none", "0", "false"):
+        return None
+    return ResponseCache(
+        max_entries=LLM_CACHE_MAX_ENTRIES,
+        ttl_s=LLM_CACHE_TTL_S,
+        disk_path=LLM_CACHE_PATH if mode == "sqlite" else None,
+        disk_max_entries=LLM_CACHE_DISK_MAX_ENTRIES,
+    )
@@ -1,13 +1,25 @@
 import os
 import json
+import time
 import shlex
+import inspect
 from pathlib import Path
 from contextlib import AsyncExitStack
-from typing import Any, Dict, Optional, List, Tuple
+from typing import Any, Awaitable, Callable, Dict, Optional, List, Tuple
 
 from mcp import ClientSession, StdioServerParameters
 from mcp.client.stdio import stdio_client
 
+from .config import MCP_SERVER_URL
+from .tracing import SPANS_KEY, span, traceparent, merge_remote
+
+# request `_meta` on tool calls (carries the trace context to the server) needs a recent SDK
+_CALL_TOOL_META = "meta" in inspect.signature(ClientSession.call_tool).parameters
+
+
+class MCPToolError(RuntimeError):
+    """A tool call that failed on the server (isError) or did not answer with a JSON object."""
+
 
 class MCPToolClient:
     """
@@ -17,6 +29,11 @@ class MCPToolClient:
     - Spawns server as a module (python -m itsm_agents.mcp_server) to preserve package context.
     - Passes env (incl. GEMINI_API_KEY) to subprocess.
     - Ensures PYTHONPATH includes app/src for subprocess imports.
+
+    With `url` (default MCP_SERVER_URL), nothing is spawned: the client opens a session
+    to a shared server over streamable HTTP (mcp_server --transport streamable-http).
+    The session keeps its HTTP connections alive, so every call after the handshake
+    reuses them.
     """
 
     def __init__(
@@ -24,7 +41,9 @@ class MCPToolClient:
         command: Optional[str] = None,
         args: Optional[List[str]] = None,
         env: Optional[Dict[str, str]] = None,
+        url: Optional[str] = None,
     ):
+        self.url = url if url is not None else MCP_SERVER_URL
         self.command = command or os.getenv("MCP_SERVER_COMMAND", "python").strip()
 
         if args is None:
@@ -45,35 +64,104 @@ class MCPToolClient:
         self.session: Optional[ClientSession] = None
 
     async def __aenter__(self):
+        if self.url:
+            return await self._connect_http()
+
         params = StdioServerParameters(
             command=self.command,
             args=self.args,
             env=self.env,
         )
 
-        stdio_transport = await self.exit_stack.enter_async_context(stdio_client(params))
-        read, write = stdio_transport
+        with span("mcp.spawn", command=self.command):
+            stdio_transport = await self.exit_stack.enter_async_context(stdio_client(params))
+            read, write = stdio_transport
 
-        self.session = await self.exit_stack.enter_async_context(ClientSession(read, write))
-        await self.session.initialize()
+            self.session = await self.exit_stack.enter_async_context(ClientSession(read, write))
+            await self.session.initialize()
+        return self
+
+    async def _connect_http(self):
+        try:
+            from mcp.client.streamable_http import streamable_http_client
+        except ImportError:  # SDKs before 1.24
+            from mcp.client.streamable_http import streamablehttp_client as streamable_http_client
+
+        with span("mcp.connect", url=self.url):
+            read, write, _session_id = await self.exit_stack.enter_async_context(streamable_http_client(self.url))
+            self.session = await self.exit_stack.enter_async_context(ClientSession(read, write))
+            await self.session.initialize()
         return self
 
     async def __aexit__(self, exc_type, exc, tb):
         await self.exit_stack.aclose()
 
-    async def call_tool(self, tool_name: str, arguments: dict) -> dict:
+    async def ping(self) -> None:
+        """Liveness probe (MCP ping request); raises if the server is gone."""
+        if self.session is None:
+            raise RuntimeError("MCPToolClient is not initialized. Use 'async with MCPToolClient() as cli:'")
+        await self.session.send_ping()
+
+    async def list_tools(self) -> List[str]:
+        if self.session is None:
+            raise RuntimeError("MCPToolClient is not initialized. Use 'async with MCPToolClient() as cli:'")
+        resp = await self.session.list_tools()
+        return [t.name for t in resp.tools]
+
+    async def call_tool(
+        self,
+        tool_name: str,
+        arguments: dict,
+        on_progress: Optional[Callable[..., Awaitable[None]]] = None,
+        check: bool = False,
+    ) -> dict:
         """
         Call an MCP tool and return a decoded dict.
 
-        FastMCP with json_response=True typically returns JSON in a TextContent block.
-        We also support alternative shapes robustly.
+        `on_progress(progress, total, message)` receives the tool's progress
+        notifications while it runs (run_pipeline_tool / run_batch_tool send them).
+
+        FastMCP typically returns the tool's JSON in a TextContent block.
+        We also support alternative shapes robustly. A failed call comes back as
+        {"raw_text": <error message>}; with `check`, it raises MCPToolError instead
+        (as does an answer that is not a JSON object).
+
+        Inside a trace (see tracing.py), the W3C traceparent goes along in the request
+        `_meta`; the server returns its spans in the result, which are moved into the
+        current trace (the span's transport_ms = round trip minus server time).
         """
         if self.session is None:
             raise RuntimeError("MCPToolClient is not initialized. Use 'async with MCPToolClient() as cli:'")
 
-        # NOTE: some SDK versions use `arguments=...`, others may accept `tool_args` etc.
-        result = await self.session.call_tool(tool_name, arguments=arguments)
-
+        with span("mcp.call_tool", tool=tool_name) as sp:
+            parent = traceparent()
+            t0 = time.perf_counter()
+            kwargs = {"progress_callback": on_progress} if on_progress is not None else {}
+            if parent is not None and _CALL_TOOL_META:
+                kwargs["meta"] = {"traceparent": parent}
+            result = await self.session.call_tool(tool_name, arguments=arguments, **kwargs)
+
+            with span("mcp.decode"):
+                data = self._decode(result)
+            if check and (
+                getattr(result, "isError", False) or not isinstance(data, dict) or "raw_text" in data or "raw" in data
+            ):
+                sp.set(error=True)
+                detail = (data.get("raw_text") or data.get("raw")) if isinstance(data, dict) else None
+                raise MCPToolError(f"{tool_name}: {detail or data}")
+            remote = data.pop(SPANS_KEY, None) if isinstance(data, dict) else None
+            if remote is not None:
+                server = merge_remote(remote)
+                if server is not None:
+                    round_trip_ms = (time.perf_counter() - t0) * 1000
+                    sp.set(
+                        server_ms=round(server["duration_ms"], 1),
+                        transport_ms=round(max(0.0, round_trip_ms - server["duration_ms"]), 1),
+                    )
+            return data
+
+    @staticmethod
+    def _decode(result) -> dict:
         # 1) If result has `.content` list (typical), try to parse first item
         if hasattr(result, "content") and result.content:
             item = result.content[0]
@@ -0,0 +1,266 @@
+import atexit
+import asyncio
+import logging
+import threading
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from .config import MCP_POOL_SIZE, MCP_POOL_HEALTH_INTERVAL_S, MCP_POOL_LEASE_TIMEOUT_S, MCP_SERVER_URL
+from .mcp_client import MCPToolClient
+from .tracing import attach, current, span
+
+log = logging.getLogger(__name__)
+
+PING_TIMEOUT_S = 5.0
+MAX_RESPAWN_BACKOFF_S = 30.0
+
+
+class _Slot:
+    """One pooled MCP server process + initialized session."""
+
+    def __init__(self, index: int):
+        self.index = index
+        self.client: Optional[MCPToolClient] = None
+        self.stop: Optional[asyncio.Event] = None
+        self.task: Optional[asyncio.Task] = None
+        self.leased = False
+        # bumped on every (re)spawn so stale idle-queue entries can be recognized
+        self.generation = 0
+
+
+class MCPClientPool:
+    """
+    Long-lived pool of N pre-initialized MCP stdio sessions.
+
+    Each session pays the interpreter spawn, imports and `initialize` handshake once;
+    tickets then lease a warm session, call tools and return it.
+
+    With `url` (MCP_SERVER_URL for get_pool), the slots are streamable-HTTP sessions to
+    one shared server instead of spawned servers: same leasing, health checks and
+    reconnects, and N caps this process's calls in flight against that server.
+
+    The pool owns a background event loop thread: MCP stdio sessions are bound to the
+    loop (and task) that opened them, so they cannot live inside a per-call
+    `asyncio.run`. Sync callers use `call(fn)`, which runs `await fn(client)` on the
+    pool loop with a leased session.
+
+    - health checks: idle sessions are pinged every `health_interval_s`
+    - respawn: a session whose server crashed (failed ping, or a call that raised and
+      then failed a ping) is torn down and respawned with backoff
+    - metrics: `stats()`
+    """
+
+    def __init__(
+        self,
+        size: int = 2,
+        command: Optional[str] = None,
+        args: Optional[List[str]] = None,
+        env: Optional[Dict[str, str]] = None,
+        health_interval_s: float = 30.0,
+        lease_timeout_s: float = 60.0,
+        url: Optional[str] = None,
+    ):
+        self.size = max(1, int(size))
+        self.command = command
+        self.args = args
+        self.env = env
+        self.url = url
+        self.health_interval_s = health_interval_s
+        self.lease_timeout_s = lease_timeout_s
+
+        self._slots = [_Slot(i) for i in range(self.size)]
+        self._idle: Optional[asyncio.Queue] = None
+        self._closing = False
+        self._health_task: Optional[asyncio.Task] = None
+
+        self.spawned = 0
+        self.respawns = 0
+        self.spawn_failures = 0
+        self.leases = 0
+        self.health_checks = 0
+        self.unhealthy = 0
+        self.last_error: Optional[str] = None
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="mcp-pool", daemon=True)
+        self._thread.start()
+        self._submit(self._start()).result()
+
+    # -------------------------
+    # Lifecycle (runs on the pool loop)
+    # -------------------------
+    def _submit(self, coro: Awaitable):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    async def _start(self):
+        self._idle = asyncio.Queue()
+        for slot in self._slots:
+            slot.task = asyncio.create_task(self._slot_main(slot))
+        self._health_task = asyncio.create_task(self._health_main())
+
+    async def _slot_main(self, slot: _Slot):
+        """Keep one server alive: spawn, publish as idle, wait for a stop signal, repeat."""
+        backoff = 1.0
+        first = True
+        while not self._closing:
+            slot.stop = asyncio.Event()
+            try:
+                async with MCPToolClient(command=self.command, args=self.args, env=self.env, url=self.url) as cli:
+                    slot.client = cli
+                    self.spawned += 1
+                    if not first:
+                        self.respawns += 1
+                    first = False
+                    backoff = 1.0
+                    slot.generation += 1
+                    self._idle.put_nowait((slot, slot.generation))
+                    await slot.stop.wait()
+            except Exception as e:
+                self.spawn_failures += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+                log.warning("MCP pool slot %s failed: %s", slot.index, self.last_error)
+                first = False
+                if not self._closing:
+                    await asyncio.sleep(backoff)
+                    backoff = min(backoff * 2, MAX_RESPAWN_BACKOFF_S)
+            finally:
+                slot.client = None
+
+    def _respawn(self, slot: _Slot):
+        self.unhealthy += 1
+        # invalidate any idle-queue entry for this slot before the server goes away
+        slot.generation += 1
+        slot.client = None
+        if slot.stop is not None:
+            slot.stop.set()
+
+    async def _is_healthy(self, slot: _Slot) -> bool:
+        if slot.client is None:
+            return False
+        self.health_checks += 1
+        try:
+            await asyncio.wait_for(slot.client.ping(), timeout=PING_TIMEOUT_S)
+            return True
+        except Exception as e:
+            self.last_error = f"health check failed: {type(e).__name__}: {e}"
+            return False
+
+    async def _health_main(self):
+        while not self._closing:
+            await asyncio.sleep(self.health_interval_s)
+            # only check sessions sitting idle; leased ones are checked on failure
+            for _ in range(self._idle.qsize()):
+                slot, gen = self._idle.get_nowait()
+                if gen != slot.generation or slot.client is None:
+                    continue
+                if await self._is_healthy(slot):
+                    self._idle.put_nowait((slot, gen))
+                else:
+                    self._respawn(slot)
+
+    async def _close(self):
+        self._closing = True
+        if self._health_task is not None:
+            self._health_task.cancel()
+        for slot in self._slots:
+            if slot.stop is not None:
+                slot.stop.set()
+        await asyncio.gather(*(s.task for s in self._slots if s.task), return_exceptions=True)
+
+    # -------------------------
+    # Leasing
+    # -------------------------
+    @asynccontextmanager
+    async def lease(self):
+        """Lease a warm session (must be used on the pool loop, e.g. inside `call`)."""
+        deadline = self._loop.time() + self.lease_timeout_s
+        # waiting time shows up in traces (includes cold server spawns)
+        with span("mcp.lease") as sp:
+            while True:
+                try:
+                    slot, gen = await asyncio.wait_for(
+                        self._idle.get(), timeout=max(0.0, deadline - self._loop.time())
+                    )
+                except asyncio.TimeoutError:
+                    raise RuntimeError(
+                        f"No MCP session available within {self.lease_timeout_s}s "
+                        f"(last error: {self.last_error or 'none'})"
+                    )
+                # skip entries left behind by a server that died while idle
+                if gen == slot.generation and slot.client is not None:
+                    break
+            sp.set(slot=slot.index)
+        slot.leased = True
+        self.leases += 1
+        healthy = True
+        try:
+            yield slot.client
+        except Exception:
+            # tool errors keep the server; a dead transport gets respawned
+            healthy = await self._is_healthy(slot)
+            raise
+        finally:
+            slot.leased = False
+            if healthy and not self._closing:
+                self._idle.put_nowait((slot, slot.generation))
+            else:
+                self._respawn(slot)
+
+    def call(self, fn: Callable[[MCPToolClient], Awaitable[Any]]) -> Any:
+        """Run `await fn(client)` with a leased session; blocking, safe from any thread."""
+        # the pool loop runs in its own thread: carry the caller's trace context over
+        active = current()
+
+        async def _run():
+            with attach(active):
+                async with self.lease() as cli:
+                    return await fn(cli)
+
+        return self._submit(_run()).result()
+
+    def stats(self) -> dict:
+        idle = self._idle.qsize() if self._idle is not None else 0
+        leased = sum(1 for s in self._slots if s.leased)
+        return {
+            "size": self.size,
+            "transport": "streamable-http" if self.url else "stdio",
+            "idle": idle,
+            "leased": leased,
+            "starting": max(0, self.size - idle - leased),
+            "spawned": self.spawned,
+            "respawns": self.respawns,
+            "spawn_failures": self.spawn_failures,
+            "leases": self.leases,
+            "health_checks": self.health_checks,
+            "unhealthy": self.unhealthy,
+            "last_error": self.last_error,
+        }
+
+    def close(self):
+        if self._closing or not self._loop.is_running():
+            return
+        try:
+            self._submit(self._close()).result(timeout=30)
+        finally:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+
+
+_pool: Optional[MCPClientPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> MCPClientPool:
+    """Process-wide warm pool (created on first use, closed at exit); HTTP sessions if MCP_SERVER_URL."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = MCPClientPool(
+                    size=MCP_POOL_SIZE,
+                    health_interval_s=MCP_POOL_HEALTH_INTERVAL_S,
+                    lease_timeout_s=MCP_POOL_LEASE_TIMEOUT_S,
+                    url=MCP_SERVER_URL,
+                )
+                atexit.register(_pool.close)
+    return _pool
@@ -1,41 +1,301 @@
+import time
+import asyncio
 import logging
+import argparse
 import json
-from mcp.server.fastmcp import FastMCP
+from typing import Any, Awaitable, Callable, List, Optional
 
-from .schemas import Ticket
-from .agents_direct import classify_ticket, troubleshoot_ticket, compose_response
+import anyio
+from mcp.server.fastmcp import Context, FastMCP
+from mcp.server.transport_security import TransportSecuritySettings
+
+from .config import (
+    MCP_TRANSPORT,
+    MCP_HTTP_HOST,
+    MCP_HTTP_PORT,
+    MCP_HTTP_ALLOWED_HOSTS,
+    MCP_HTTP_ALLOWED_ORIGINS,
+    MCP_SERVER_MAX_CONCURRENCY,
+)
+from .schemas import Ticket, Classification, Troubleshooting
+from .context_store import HANDLE_MISS, get_store, session_key
+from .tracing import SPANS_KEY, span, trace
+from .agents_direct import classify_ticket_async, troubleshoot_ticket_async, compose_response_async
+from .rules import with_fast_path_async
+from .plan_index import with_plan_reuse_async
 
 logging.basicConfig(level=logging.INFO)  # writes to stderr via logging
 
-mcp = FastMCP("CIS-ITSM-MultiAgent", json_response=True)
+# streamable HTTP answers each request as an SSE stream (not one JSON body) so the
+# progress notifications of run_pipeline_tool / run_batch_tool reach the client
+mcp = FastMCP("CIS-ITSM-MultiAgent", json_response=False)
+
+# confident rule matches skip the model call (see rules.py)
+_classify = with_fast_path_async(classify_ticket_async)
+# near-duplicate tickets reuse a stored plan (see plan_index.py)
+_troubleshoot = with_plan_reuse_async(troubleshoot_ticket_async)
+
+# Tools are async end to end (the *_async agents await the model over the client's
+# pooled async HTTP connections), so one server process interleaves the tool calls of
+# every session on its event loop: N concurrent calls take about one call's latency.
+# The limiter caps how many run at once per server (MCP_SERVER_MAX_CONCURRENCY);
+# calls beyond it wait their turn (span "tool.queue").
+_limiter: Optional[anyio.CapacityLimiter] = None
+
+
+def _tool_limiter() -> anyio.CapacityLimiter:
+    global _limiter
+    if _limiter is None:  # created on the server loop
+        _limiter = anyio.CapacityLimiter(max(1, MCP_SERVER_MAX_CONCURRENCY))
+    return _limiter
+
+
+async def _limited(fn: Callable[[], Awaitable[dict]]) -> dict:
+    with span("tool.queue"):
+        await _tool_limiter().acquire()
+    try:
+        return await fn()
+    finally:
+        _tool_limiter().release()
+
+
+async def _traced(ctx: Context, tool: str, fn: Callable[[], Awaitable[dict]], limit: bool = True) -> dict:
+    """
+    Run a tool inside the caller's trace: the client sends its W3C traceparent in the
+    request _meta (see tracing.py); the server-side spans go back in the result under
+    SPANS_KEY and the client adds them to its trace. Untraced calls run as before.
+    `limit=False` for tools that take cap slots themselves (run_batch_tool, per ticket).
+    """
+    meta = ctx.request_context.meta
+    parent = getattr(meta, "traceparent", None) if meta is not None else None
+    run = (lambda: _limited(fn)) if limit else fn
+    if parent is None:
+        return await run()
+    with trace(tool, traceparent=parent, service="mcp-server", export=False) as tr:
+        out = await run()
+    if tr is not None:
+        out[SPANS_KEY] = tr.spans
+    return out
+
+
+def _context(ctx: Context, handle: str) -> dict:
+    """Ticket context stored under `handle` by this session (ValueError if gone)."""
+    values = get_store().get(session_key(ctx.session), handle)
+    if values is None:
+        raise ValueError(f"{HANDLE_MISS}: {handle}")
+    return values
+
+
+def _arg(name: str, value: Optional[dict], stored: dict, model):
+    """Payload `value` validated as `model`, else the stored object (clear tool error if neither)."""
+    if value is not None:
+        return model(**value)
+    if name in stored:
+        return stored[name]
+    raise ValueError(f"missing `{name}`: pass it, or a `handle` whose context already holds it")
+
+
+# Each tool takes either the payloads or a `handle`: classify_ticket_tool(ticket,
+# keep=True) stores the parsed ticket server-side for this session and returns
+# "handle"; later calls pass handle=... and the ticket plus the stage outputs stored
+# so far are used as-is (no re-send, no re-parse). Explicit payloads win over stored ones.
+@mcp.tool()
+async def classify_ticket_tool(
+    ctx: Context, ticket: Optional[dict] = None, handle: Optional[str] = None, keep: bool = False
+) -> dict:
+    async def run():
+        with span("tool.parse_args", handle=bool(handle)):
+            stored = _context(ctx, handle) if handle else {}
+            t = _arg("ticket", ticket, stored, Ticket)
+        cls = await _classify(t)
+        out = cls.model_dump()
+        if handle:
+            get_store().update(session_key(ctx.session), handle, classification=cls)
+        elif keep:
+            out["handle"] = get_store().put(session_key(ctx.session), {"ticket": t, "classification": cls})
+        return out
+
+    return await _traced(ctx, "classify_ticket_tool", run)
+
+@mcp.tool()
+async def troubleshoot_ticket_tool(
+    ctx: Context, ticket: Optional[dict] = None, classification: Optional[dict] = None, handle: Optional[str] = None
+) -> dict:
+    async def run():
+        with span("tool.parse_args", handle=bool(handle)):
+            stored = _context(ctx, handle) if handle else {}
+            t = _arg("ticket", ticket, stored, Ticket)
+            # reconstruct Classification using schema validation (reuse by dict)
+            cls = _arg("classification", classification, stored, Classification)
+        ts = await _troubleshoot(t, cls)
+        if handle:
+            get_store().update(session_key(ctx.session), handle, troubleshooting=ts)
+        return ts.model_dump()
+
+    return await _traced(ctx, "troubleshoot_ticket_tool", run)
 
 @mcp.tool()
-def classify_ticket_tool(ticket: dict) -> dict:
-    t = Ticket(**ticket)
-    cls = classify_ticket(t)
-    return cls.model_dump()
+async def compose_response_tool(
+    ctx: Context,
+    ticket: Optional[dict] = None,
+    classification: Optional[dict] = None,
+    troubleshooting: Optional[dict] = None,
+    handle: Optional[str] = None,
+) -> dict:
+    async def run():
+        with span("tool.parse_args", handle=bool(handle)):
+            stored = _context(ctx, handle) if handle else {}
+            t = _arg("ticket", ticket, stored, Ticket)
+            cls = _arg("classification", classification, stored, Classification)
+            ts = _arg("troubleshooting", troubleshooting, stored, Troubleshooting)
+        comm = await compose_response_async(t, cls, ts)
+        return comm.model_dump()
+
+    return await _traced(ctx, "compose_response_tool", run)
+
+
+# -------------------------
+# Whole-pipeline tools: one round trip per ticket (or per list of tickets) instead of
+# three, and the ticket and stage outputs never travel back and forth between stages.
+# The granular tools above stay for clients that compose the stages themselves.
+# -------------------------
+STAGES = ("classification", "troubleshooting", "communication")
+
+
+async def _pipeline(t: Ticket, on_stage: Optional[Callable[[str, dict], Awaitable[None]]] = None) -> dict:
+    cls = await _classify(t)
+    out = {"classification": cls.model_dump()}
+    if on_stage is not None:
+        await on_stage("classification", out["classification"])
+    ts = await _troubleshoot(t, cls)
+    out["troubleshooting"] = ts.model_dump()
+    if on_stage is not None:
+        await on_stage("troubleshooting", out["troubleshooting"])
+    comm = await compose_response_async(t, cls, ts)
+    out["communication"] = comm.model_dump()
+    if on_stage is not None:
+        await on_stage("communication", out["communication"])
+    return out
+
 
 @mcp.tool()
-def troubleshoot_ticket_tool(ticket: dict, classification: dict) -> dict:
-    t = Ticket(**ticket)
-    # reconstruct Classification using schema validation (reuse by dict)
-    from .schemas import Classification
-    cls = Classification(**classification)
-    ts = troubleshoot_ticket(t, cls)
-    return ts.model_dump()
+async def run_pipeline_tool(ticket: dict, ctx: Context) -> dict:
+    """
+    Classify, troubleshoot and compose a response for one ticket in a single call.
+    If the client asked for progress, each stage's output is also sent as soon as it is
+    ready: progress i/3 with message {"stage": ..., "data": {...}} (JSON).
+    """
+    async def report(stage: str, data: dict):
+        await ctx.report_progress(STAGES.index(stage) + 1, len(STAGES), json.dumps({"stage": stage, "data": data}))
+
+    async def run():
+        with span("tool.parse_args"):
+            t = Ticket(**ticket)
+        return await _pipeline(t, report)
+
+    return await _traced(ctx, "run_pipeline_tool", run)
+
 
 @mcp.tool()
-def compose_response_tool(ticket: dict, classification: dict, troubleshooting: dict) -> dict:
-    from .schemas import Classification, Troubleshooting
-    t = Ticket(**ticket)
-    cls = Classification(**classification)
-    ts = Troubleshooting(**troubleshooting)
-    comm = compose_response(t, cls, ts)
-    return comm.model_dump()
-
-def main():
-    # runs stdio server
-    mcp.run()
+async def run_batch_tool(tickets: List[Any], ctx: Context, concurrency: int = 4) -> dict:
+    """
+    Run the whole pipeline for a list of tickets, `concurrency` at a time (each ticket
+    also takes a server cap slot). Every finished ticket is reported as progress
+    done/total with message {"index", "ticket_id", "status", "category", "priority",
+    "latency_ms", "error"} (JSON). Returns {"results": [...] in input order, "summary"};
+    a ticket that fails (invalid or model error) is {"status": "error", "error"}.
+    """
+    gate = asyncio.Semaphore(max(1, int(concurrency)))
+    done = 0
+
+    async def one(i: int, raw: Any) -> dict:
+        nonlocal done
+        async with gate:
+            t0 = time.perf_counter()
+            tid = raw.get("ticket_id") if isinstance(raw, dict) else None
+            with span("ticket", index=i, ticket_id=tid) as sp:
+                try:
+                    if not isinstance(raw, dict):
+                        raise ValueError(f"ticket is not a JSON object: {str(raw)[:200]}")
+                    t = Ticket(**raw)
+                    out = {"ticket_id": t.ticket_id, "status": "ok", **await _limited(lambda: _pipeline(t))}
+                except Exception as e:
+                    out = {"ticket_id": tid, "status": "error", "error": f"{type(e).__name__}: {e}"}
+                    sp.set(status="error")
+            out["latency_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+        done += 1
+        cls = out.get("classification") or {}
+        await ctx.report_progress(done, len(tickets), json.dumps({
+            "index": i, "ticket_id": out["ticket_id"], "status": out["status"],
+            "category": cls.get("category"), "priority": cls.get("priority"),
+            "latency_ms": out["latency_ms"], "error": out.get("error"),
+        }))
+        return out
+
+    async def run():
+        t0 = time.perf_counter()
+        results = await asyncio.gather(*(one(i, raw) for i, raw in enumerate(tickets)))
+        ok = sum(1 for r in results if r["status"] == "ok")
+        return {
+            "results": results,
+            "summary": {
+                "tickets": len(results), "ok": ok, "failed": len(results) - ok,
+                "wall_ms": round((time.perf_counter() - t0) * 1000, 1),
+            },
+        }
+
+    return await _traced(ctx, "run_batch_tool", run, limit=False)
+
+
+_LOOPBACK = ["127.0.0.1", "localhost", "[::1]"]
+
+
+def transport_security(bind_host: str, allowed_hosts: str = "", allowed_origins: str = "") -> TransportSecuritySettings:
+    """
+    DNS rebinding protection for the HTTP server: Host headers must name localhost,
+    the bind address (unless it is a wildcard) or one of `allowed_hosts`; Origin headers,
+    when sent, must match `allowed_origins` (default: http:// on each allowed host).
+    Both lists are comma-separated; an entry without a port allows any port.
+    """
+    hosts = list(_LOOPBACK)
+    if bind_host not in ("0.0.0.0", "::", ""):
+        hosts.append(f"[{bind_host}]" if ":" in bind_host else bind_host)
+    hosts += [h.strip() for h in allowed_hosts.split(",") if h.strip()]
+    patterns = []
+    for h in dict.fromkeys(hosts):
+        patterns += [h] if h.endswith(":*") or (":" in h and not h.endswith("]")) else [h, f"{h}:*"]
+    origins = [o.strip() for o in allowed_origins.split(",") if o.strip()]
+    if not origins:
+        origins = [f"http://{p}" for p in patterns]
+    return TransportSecuritySettings(allowed_hosts=patterns, allowed_origins=origins)
+
+
+def main(argv=None):
+    """
+    stdio (default): one server per client, spawned by it (MCPToolClient / mcp_pool).
+    streamable-http: one long-lived server many clients connect to (MCP_SERVER_URL=
+    http://HOST:PORT/mcp on the client side). Clients must reach it under a name in
+    --allowed-hosts (or localhost / the bind address); other Host headers are refused.
+    """
+    ap = argparse.ArgumentParser(description="CIS ITSM multi-agent MCP server")
+    ap.add_argument("--transport", choices=["stdio", "streamable-http"], default=MCP_TRANSPORT)
+    ap.add_argument("--host", default=MCP_HTTP_HOST, help="streamable-http: bind address")
+    ap.add_argument("--port", type=int, default=MCP_HTTP_PORT, help="streamable-http: port")
+    ap.add_argument("--allowed-hosts", default=MCP_HTTP_ALLOWED_HOSTS,
+                    help="streamable-http: comma-separated Host names clients use, e.g. itsm-node,10.0.0.5")
+    ap.add_argument("--allowed-origins", default=MCP_HTTP_ALLOWED_ORIGINS,
+                    help="streamable-http: comma-separated Origin values (default: http:// on the allowed hosts)")
+    args = ap.parse_args(argv)
+
+    if args.transport == "streamable-http":
+        mcp.settings.host = args.host
+        mcp.settings.port = args.port
+        mcp.settings.transport_security = transport_security(args.host, args.allowed_hosts, args.allowed_origins)
+        if args.host in ("0.0.0.0", "::") and not args.allowed_hosts:
+            logging.warning("bound to %s without --allowed-hosts: only localhost Host headers are accepted", args.host)
+        logging.info("MCP server on http://%s:%s%s", args.host, args.port, mcp.settings.streamable_http_path)
+
+    mcp.run(transport=args.transport)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
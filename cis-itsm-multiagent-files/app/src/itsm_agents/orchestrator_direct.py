@@ -1,10 +1,132 @@
-from .schemas import Ticket
-from .agents_direct import classify_ticket, troubleshoot_ticket, compose_response
+import time
+from typing import Callable, Optional
 
-def run(ticket: Ticket) -> dict:
-    cls = classify_ticket(ticket)
-    ts = troubleshoot_ticket(ticket, cls)
-    comm = compose_response(ticket, cls, ts)
+from .schemas import Ticket, Classification, Troubleshooting
+from .rules import STATS as FAST_PATH_STATS, try_fast_path, with_fast_path
+from .plan_index import get_index, with_plan_reuse, with_plan_reuse_async
+from .config import PLAN_REUSE_THRESHOLD, SPECULATIVE_TROUBLESHOOT
+from .speculation import classify_and_troubleshoot
+from .tracing import traced_pipeline
+from .agents_direct import (
+    FieldListener,
+    stream_fields,
+    classify_ticket,
+    troubleshoot_ticket,
+    compose_response,
+    classify_ticket_async,
+    troubleshoot_ticket_async,
+    compose_response_async,
+)
+
+_troubleshoot_with_reuse = with_plan_reuse(troubleshoot_ticket)
+_troubleshoot_with_reuse_async = with_plan_reuse_async(troubleshoot_ticket_async)
+
+
+def _keep_plan(on_field: Optional[FieldListener], index: bool):
+    """on_hit for a confirmed speculative plan: stream it, and index it when plan reuse is on."""
+
+    def keep(ticket: Ticket, cls: Classification, ts: Troubleshooting):
+        if on_field is not None:
+            for key, value in ts.model_dump().items():
+                on_field("troubleshooting", key, value)
+        if index and PLAN_REUSE_THRESHOLD <= 1.0:
+            get_index().add(ticket, cls, ts)
+
+    return keep
+
+
+@traced_pipeline("direct")
+def run(
+    ticket: Ticket,
+    classify: Callable[[Ticket], Classification] = with_fast_path(classify_ticket),
+    troubleshoot: Callable[[Ticket, Classification], Troubleshooting] = _troubleshoot_with_reuse,
+    on_field: Optional[FieldListener] = None,
+    speculate: Optional[bool] = None,
+) -> dict:
+    """
+    `classify` can be swapped for another classifier with the same signature,
+    e.g. batch.ClassifyBatcher.classify to share one model call across tickets.
+    The default tries the rule fast-path (rules.py) before calling the model.
+    The default `troubleshoot` reuses the stored plan of a near-duplicate ticket (plan_index.py).
+
+    With `on_field(stage, key, value)`, model output is streamed: each top-level field
+    is reported as soon as it is complete, and every stage ends with
+    `on_field(stage, None, full_dict)` (also for stages answered without the model).
+    The output then carries `timings` (first_field_ms, total_ms).
+
+    With `speculate` (default SPECULATIVE_TROUBLESHOOT), troubleshooting starts for the
+    rule-predicted category while classification runs (see speculation.py). With the
+    default `troubleshoot`, the speculative call skips the plan index: the plan is only
+    indexed (and streamed) once the guess is confirmed.
+    """
+    if speculate is None:
+        speculate = SPECULATIVE_TROUBLESHOOT
+    # a custom troubleshooter is speculated as is (muted); the default one without its index side effects
+    raw = troubleshoot_ticket if troubleshoot is _troubleshoot_with_reuse else None
+
+    if on_field is None:
+        if speculate:
+            cls, ts = classify_and_troubleshoot(
+                ticket, classify, troubleshoot, speculative=raw, on_hit=_keep_plan(None, index=raw is not None)
+            )
+        else:
+            cls = classify(ticket)
+            ts = troubleshoot(ticket, cls)
+        comm = compose_response(ticket, cls, ts)
+        timings = None
+    else:
+        t0 = time.perf_counter()
+        first = []
+
+        def listener(stage, key, value):
+            if not first:
+                first.append((time.perf_counter() - t0) * 1000)
+            on_field(stage, key, value)
+
+        with stream_fields(listener):
+            if speculate:
+                def classified(t: Ticket) -> Classification:
+                    # reported before the plan: the speculative one is streamed only after this
+                    c = classify(t)
+                    listener("classification", None, c.model_dump())
+                    return c
+
+                cls, ts = classify_and_troubleshoot(
+                    ticket, classified, troubleshoot, speculative=raw, on_hit=_keep_plan(listener, index=raw is not None)
+                )
+            else:
+                cls = classify(ticket)
+                listener("classification", None, cls.model_dump())
+                ts = troubleshoot(ticket, cls)
+            listener("troubleshooting", None, ts.model_dump())
+            comm = compose_response(ticket, cls, ts)
+            listener("communication", None, comm.model_dump())
+        timings = {
+            "first_field_ms": round(first[0], 1),
+            "total_ms": round((time.perf_counter() - t0) * 1000, 1),
+        }
+
+    out = {
+        "ticket": ticket.model_dump(),
+        "classification": cls.model_dump(),
+        "troubleshooting": ts.model_dump(),
+        "communication": comm.model_dump(),
+        "runner": "direct"
+    }
+    if timings is not None:
+        out["timings"] = timings
+    return out
+
+@traced_pipeline("direct")
+async def run_async(ticket: Ticket) -> dict:
+    """Same pipeline as `run`, awaitable so many tickets can share one event loop."""
+    cls = try_fast_path(ticket)
+    if cls is None:
+        t0 = time.perf_counter()
+        cls = await classify_ticket_async(ticket)
+        FAST_PATH_STATS.record_llm((time.perf_counter() - t0) * 1000)
+    ts = await _troubleshoot_with_reuse_async(ticket, cls)
+    comm = await compose_response_async(ticket, cls, ts)
 
     return {
         "ticket": ticket.model_dump(),
@@ -0,0 +1,95 @@
+import time
+from typing import Dict, Optional
+
+from pydantic import BaseModel, ValidationError
+
+from .schemas import Ticket, SECTION_MODELS
+from .rules import try_fast_path
+from .plan_index import get_index
+from .prompts import SECTIONS
+from .config import FUSED_MAX_REASKS, PLAN_REUSE_THRESHOLD
+from .tracing import traced_pipeline
+from .agents_direct import FieldListener, stream_fields, fused_sections
+
+
+@traced_pipeline("fused")
+def run(ticket: Ticket, on_field: Optional[FieldListener] = None) -> dict:
+    """
+    Same output as orchestrator_direct.run, but classification, troubleshooting and
+    communication come back from ONE model request instead of three sequential ones.
+
+    Each section of the answer is validated against its own model; only the sections
+    that fail are asked for again (with the valid ones as context), up to
+    FUSED_MAX_REASKS times. A confident rule fast-path classification (and then a
+    reusable plan for a near-duplicate ticket) is settled before the call, so the
+    request only covers what is still missing.
+
+    With `on_field(stage, key, value)`, the answer is streamed and each section is
+    reported as `on_field(section, None, dict)` as soon as it is complete and valid.
+    The output carries `fused_calls` (model requests made) and, when streaming,
+    `timings` (first_field_ms, total_ms).
+    """
+    t0 = time.perf_counter()
+    first = []
+    known: Dict[str, BaseModel] = {}
+
+    def settle(section: str, value) -> bool:
+        if not isinstance(value, dict):
+            return False
+        try:
+            known[section] = SECTION_MODELS[section](**value)
+        except ValidationError:
+            return False
+        if on_field is not None:
+            if not first:
+                first.append((time.perf_counter() - t0) * 1000)
+            on_field(section, None, known[section].model_dump())
+        return True
+
+    cls = try_fast_path(ticket)
+    reuse = PLAN_REUSE_THRESHOLD <= 1.0
+    if cls is not None:
+        settle("classification", cls.model_dump())
+        ts = get_index().lookup(ticket, cls, PLAN_REUSE_THRESHOLD) if reuse else None
+        if ts is not None:
+            settle("troubleshooting", ts.model_dump())
+    plan_reused = "troubleshooting" in known
+
+    calls = 0
+    missing = [s for s in SECTIONS if s not in known]
+    while missing:
+        if calls > FUSED_MAX_REASKS:
+            raise ValueError(f"fused runner: invalid {', '.join(missing)} after {calls} requests")
+        calls += 1
+        if on_field is None:
+            data = fused_sections(ticket, missing, known)
+        else:
+            # sections are top-level fields of the answer: settle each as it completes
+            def listener(stage, key, value):
+                if key in missing and key not in known:
+                    settle(key, value)
+
+            with stream_fields(listener):
+                data = fused_sections(ticket, missing, known)
+        for section in missing:
+            if section not in known:
+                settle(section, data.get(section))
+        missing = [s for s in SECTIONS if s not in known]
+
+    if reuse and not plan_reused:
+        get_index().add(ticket, known["classification"], known["troubleshooting"])
+
+    out = {
+        "ticket": ticket.model_dump(),
+        "classification": known["classification"].model_dump(),
+        "troubleshooting": known["troubleshooting"].model_dump(),
+        "communication": known["communication"].model_dump(),
+        "runner": "fused",
+        "fused_calls": calls,
+    }
+    if on_field is not None:
+        out["timings"] = {
+            "first_field_ms": round(first[0], 1) if first else None,
+            "total_ms": round((time.perf_counter() - t0) * 1000, 1),
+        }
+    return out
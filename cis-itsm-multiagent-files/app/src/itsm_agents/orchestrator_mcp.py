@@ -1,74 +1,152 @@
-import os
-import asyncio
-import shlex
-from pathlib import Path
+import json
+from typing import Any, Callable, List, Optional
 
+from .config import MCP_CONTEXT_HANDLES, MCP_PIPELINE, BATCH_CONCURRENCY
+from .context_store import HANDLE_MISS
 from .schemas import Ticket
-from .mcp_client import MCPToolClient
+from .mcp_client import MCPToolClient, MCPToolError
+from .mcp_pool import get_pool
+from .tracing import trace, traced_pipeline
 
 
-def run(ticket: Ticket) -> dict:
+# (stage, key, value), as agents_direct.FieldListener; tools answer whole stages, so key is None
+StageListener = Callable[[str, Optional[str], Any], None]
+
+
+async def _call_with_handle(cli: MCPToolClient, tool: str, handle: Optional[str], payloads: dict) -> dict:
+    # the server may have evicted the context (LRU / idle expiry, restart): resend in full
+    if handle is not None:
+        try:
+            return await cli.call_tool(tool, {"handle": handle}, check=True)
+        except MCPToolError as e:
+            if HANDLE_MISS not in str(e):
+                raise
+    return await cli.call_tool(tool, payloads, check=True)
+
+
+async def _pipeline(
+    cli: MCPToolClient, ticket: Ticket, on_field: Optional[StageListener] = None, handles: Optional[bool] = None
+) -> dict:
+    report = on_field or (lambda stage, key, value: None)
+    keep = MCP_CONTEXT_HANDLES if handles is None else handles
+
+    # 1) Classification tool (with `keep`, the server stores the ticket and returns a handle)
+    cls = await cli.call_tool(
+        "classify_ticket_tool",
+        {"ticket": ticket.model_dump(), **({"keep": True} if keep else {})},
+        check=True,
+    )
+    handle = cls.pop("handle", None)
+    report("classification", None, cls)
+
+    # 2) Troubleshooting tool
+    ts = await _call_with_handle(
+        cli, "troubleshoot_ticket_tool", handle,
+        {
+            "ticket": ticket.model_dump(),
+            "classification": cls
+        }
+    )
+    report("troubleshooting", None, ts)
+
+    # 3) Communication tool
+    comm = await _call_with_handle(
+        cli, "compose_response_tool", handle,
+        {
+            "ticket": ticket.model_dump(),
+            "classification": cls,
+            "troubleshooting": ts
+        }
+    )
+    report("communication", None, comm)
+
+    return {
+        "ticket": ticket.model_dump(),
+        "classification": cls,
+        "troubleshooting": ts,
+        "communication": comm,
+        "runner": "mcp",
+    }
+
+
+async def _pipeline_server(cli: MCPToolClient, ticket: Ticket, on_field: Optional[StageListener] = None) -> dict:
+    # one round trip: run_pipeline_tool runs the three stages server-side and streams
+    # each stage back as a progress notification while the others are still running
+    async def progress(done, total, message):
+        if message:
+            msg = json.loads(message)
+            on_field(msg["stage"], None, msg["data"])
+
+    out = await cli.call_tool(
+        "run_pipeline_tool",
+        {"ticket": ticket.model_dump()},
+        on_progress=progress if on_field is not None else None,
+        check=True,
+    )
+    return {"ticket": ticket.model_dump(), **out, "runner": "mcp"}
+
+
+@traced_pipeline("mcp")
+def run(ticket: Ticket, on_field: Optional[StageListener] = None, pipeline: Optional[str] = None) -> dict:
     """
     Runs the pipeline using MCP over STDIO.
 
     Key points:
-    - Spawns server using module invocation (-m itsm_agents.mcp_server), not by file path,
-      so relative imports inside the package work correctly.
-    - Passes full environment to the MCP subprocess (GEMINI_API_KEY, etc.).
-    - Ensures app/src is present on PYTHONPATH for subprocess imports.
+    - Leases a warm, already-initialized MCP session from the process-wide pool
+      (see mcp_pool) instead of spawning a server per ticket.
+    - Pool servers are spawned as a module (-m itsm_agents.mcp_server) with the full
+      environment (GEMINI_API_KEY, etc.) and app/src on PYTHONPATH (see MCPToolClient).
+    - Safe to call from many threads: concurrency is bounded by MCP_POOL_SIZE.
+    - With MCP_SERVER_URL set, the pooled sessions go to one shared streamable-HTTP
+      server (see mcp_server.main) instead of per-process stdio servers.
+    - `pipeline` (default MCP_PIPELINE): "server" runs all three stages in one
+      run_pipeline_tool call; "tools" calls the three granular tools one by one
+      (after the first call, with a server-side context handle instead of the
+      ticket and stage outputs, unless MCP_CONTEXT_HANDLES is off).
+    - With `on_field`, each stage is reported as `on_field(stage, None, dict)` as soon
+      as it is done (same end-of-stage call as the direct runner).
+    - A stage that fails on the server raises MCPToolError (the direct runner raises
+      the stage's own error), so batch.run_batch records the ticket as failed.
 
     MCP STDIO transport expects the client to launch the server as a subprocess and
     communicate over stdin/stdout. [1](https://modelcontextprotocol.io/specification/2025-06-18/basic/transports)
     """
+    steps = _pipeline if (pipeline or MCP_PIPELINE) == "tools" else _pipeline_server
+    return get_pool().call(lambda cli: steps(cli, ticket, on_field))
+
+
+def run_many(
+    tickets: List[Any],
+    on_result: Optional[Callable[[int, dict], None]] = None,
+    concurrency: Optional[int] = None,
+) -> dict:
+    """
+    Many tickets (Ticket or raw dicts) in ONE run_batch_tool call on one leased session;
+    the server runs `concurrency` (default BATCH_CONCURRENCY) at a time. `on_result(index,
+    record)` fires per finished ticket from the progress notifications (record: ticket_id,
+    status, category, priority, latency_ms, error). Returns {"results": [...], "summary"}
+    with results in input order, shaped like batch.run_batch's NDJSON records.
+    Raises MCPToolError if the batch call itself fails.
+    """
+    raw = [t.model_dump() if isinstance(t, Ticket) else t for t in tickets]
+
+    async def progress(done, total, message):
+        if message:
+            record = json.loads(message)
+            on_result(record.pop("index"), record)
+
+    async def call(cli):
+        return await cli.call_tool(
+            "run_batch_tool",
+            {"tickets": raw, "concurrency": concurrency or BATCH_CONCURRENCY},
+            on_progress=progress if on_result is not None else None,
+            check=True,
+        )
 
-    async def _run():
-        # Read command/args from .env (or defaults)
-        cmd = os.getenv("MCP_SERVER_COMMAND", "python").strip()
-        args_str = os.getenv("MCP_SERVER_ARGS", "-m itsm_agents.mcp_server").strip()
-        args = shlex.split(args_str)
-
-        # Inherit current environment (ensures GEMINI_API_KEY etc. are available)
-        env = os.environ.copy()
-
-        # Ensure app/src is on PYTHONPATH for the MCP server subprocess.
-        # orchestrator_mcp.py lives in: app/src/itsm_agents/orchestrator_mcp.py
-        # parents[1] => app/src
-        app_src = Path(__file__).resolve().parents[1]
-        env["PYTHONPATH"] = str(app_src) + os.pathsep + env.get("PYTHONPATH", "")
-
-        async with MCPToolClient(command=cmd, args=args, env=env) as cli:
-            # 1) Classification tool
-            cls = await cli.call_tool(
-                "classify_ticket_tool",
-                {"ticket": ticket.model_dump()}
-            )
-
-            # 2) Troubleshooting tool
-            ts = await cli.call_tool(
-                "troubleshoot_ticket_tool",
-                {
-                    "ticket": ticket.model_dump(),
-                    "classification": cls
-                }
-            )
-
-            # 3) Communication tool
-            comm = await cli.call_tool(
-                "compose_response_tool",
-                {
-                    "ticket": ticket.model_dump(),
-                    "classification": cls,
-                    "troubleshooting": ts
-                }
-            )
-
-            return {
-                "ticket": ticket.model_dump(),
-                "classification": cls,
-                "troubleshooting": ts,
-                "communication": comm,
-                "runner": "mcp",
-            }
-
-    # Run async pipeline in sync context
-    return asyncio.run(_run())
\ No newline at end of file
+    with trace("batch", runner="mcp", tickets=len(raw)):
+        out = get_pool().call(call)
+    results = []
+    for ticket, r in zip(raw, out["results"]):
+        r.pop("ticket_id", None)
+        results.append({"ticket": ticket, **r, "runner": "mcp"})
+    return {"results": results, "summary": out["summary"]}
@@ -0,0 +1,357 @@
+import os
+import re
+import glob
+import json
+import uuid
+import zlib
+import atexit
+import asyncio
+import threading
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # no flock (Windows): segments are never compacted
+    fcntl = None
+
+from .config import (
+    PLAN_INDEX_DIMS,
+    PLAN_INDEX_PATH,
+    PLAN_INDEX_SAVE_EVERY,
+    PLAN_INDEX_MAX_SEGMENTS,
+    PLAN_REUSE_THRESHOLD,
+)
+from .schemas import Ticket, Classification, Troubleshooting
+from .tracing import span
+
+CATEGORIES = [
+    "VPN", "Email/Outlook", "Access/AD", "Network",
+    "Laptop/Device", "Storage/Disk", "Application", "Other",
+]
+_CAT_CODE = {c: i for i, c in enumerate(CATEGORIES)}
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def ticket_text(ticket: Ticket) -> str:
+    return f"{ticket.short_description}\n{ticket.description}"
+
+
+def vectorize(text: str, dims: int = 256) -> np.ndarray:
+    """
+    Hashed bag of word unigrams + character 3-grams, log-scaled and L2-normalized.
+    Uses crc32 (stable across processes) so persisted vectors stay comparable.
+    """
+    vec = np.zeros(dims, dtype=np.float32)
+    words = _WORD.findall(text.lower())
+    for w in words:
+        vec[zlib.crc32(w.encode()) % dims] += 1.0
+    joined = " ".join(words)
+    for i in range(len(joined) - 2):
+        vec[zlib.crc32(joined[i:i + 3].encode()) % dims] += 0.5
+    np.log1p(vec, out=vec)
+    norm = float(np.linalg.norm(vec))
+    if norm > 0:
+        vec /= norm
+    return vec
+
+
+class PlanIndex:
+    """
+    Similarity index over previously troubleshot tickets.
+
+    Vectors live in one growable float32 matrix; a lookup is a single matrix-vector
+    product (cosine, rows are unit length) plus argpartition for top-k. Payloads are
+    the stored Troubleshooting dicts. Rows are append-only, so a search only holds the
+    lock to snapshot the row count and runs the product on that snapshot.
+
+    Persistence at `path` is append-only too: `save()` writes the rows added since the
+    last save as a new segment file next to `path` (`<stem>.<token>.npz`) and never
+    rewrites an existing file, so several processes (e.g. pooled MCP servers) can share
+    one path. `load()` merges `path` itself plus every segment not loaded yet; `save()`
+    also picks up segments other processes wrote in the meantime. `save(other_path)`
+    writes a full snapshot of the index as one file.
+
+    Once there are more than `max_segments` segments, the index that notices (on
+    startup or after a save) folds them into `path` under an flock on `<stem>.lock`
+    and deletes them. Every file lists the parts it holds (segment token, rows), so
+    an index that already merged some of them only takes the rest from the new `path`.
+    """
+
+    def __init__(self, dims: int = 256, path: Optional[str] = None, save_every: int = 50, max_segments: int = 16):
+        self.dims = dims
+        self.path = path
+        self.save_every = save_every
+        self.max_segments = max_segments
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._vectors = np.zeros((1024, dims), dtype=np.float32)
+        self._cats = np.zeros(1024, dtype=np.int8)
+        self._payloads: List[dict] = []
+        self._pending: List[int] = []  # rows added here and not saved yet
+        self._loaded: set = set()  # parts already merged (or written) by this index
+        self._seen: dict = {}  # file -> (mtime, size, inode) when last merged
+        self.hits = 0
+        self.misses = 0
+        if path:
+            self.load(path)
+            self._compact(path)
+
+    def __len__(self) -> int:
+        return len(self._payloads)
+
+    def _grow(self, needed: int):
+        cap = self._vectors.shape[0]
+        if needed <= cap:
+            return
+        while cap < needed:
+            cap *= 2
+        vectors = np.zeros((cap, self.dims), dtype=np.float32)
+        vectors[:len(self)] = self._vectors[:len(self)]
+        cats = np.zeros(cap, dtype=np.int8)
+        cats[:len(self)] = self._cats[:len(self)]
+        self._vectors, self._cats = vectors, cats
+
+    def _append(self, vectors: np.ndarray, cats, payloads: List[dict]) -> int:
+        # caller holds the lock; returns the first new row
+        n = len(self)
+        self._grow(n + len(payloads))
+        self._vectors[n:n + len(payloads)] = vectors
+        self._cats[n:n + len(payloads)] = cats
+        self._payloads.extend(payloads)
+        return n
+
+    def add_vectors(self, vectors: np.ndarray, categories: List[str], payloads: List[dict]):
+        """Bulk insert of pre-computed unit vectors."""
+        with self._lock:
+            n = self._append(vectors, [_CAT_CODE.get(c, _CAT_CODE["Other"]) for c in categories], payloads)
+            self._pending.extend(range(n, n + len(payloads)))
+            flush = self.path and len(self._pending) >= self.save_every
+        if flush:
+            self.save()
+
+    def add(self, ticket: Ticket, cls: Classification, ts: Troubleshooting):
+        payload = {"ticket_id": ticket.ticket_id, "troubleshooting": ts.model_dump()}
+        self.add_vectors(vectorize(ticket_text(ticket), self.dims)[None, :], [cls.category], [payload])
+
+    def search(self, vec: np.ndarray, k: int = 1, category: Optional[str] = None) -> List[Tuple[float, dict]]:
+        """Top-k (cosine, payload), optionally restricted to one category."""
+        with self._lock:
+            # rows [:n] never change once written; _grow swaps in new arrays, the old ones stay valid
+            n = len(self)
+            vectors, cats, payloads = self._vectors, self._cats, self._payloads
+        if n == 0:
+            return []
+        scores = vectors[:n] @ vec
+        if category is not None:
+            scores[cats[:n] != _CAT_CODE.get(category, _CAT_CODE["Other"])] = -1.0
+        k = min(k, n)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(float(scores[i]), payloads[i]) for i in top if scores[i] > -1.0]
+
+    def lookup(self, ticket: Ticket, cls: Classification, threshold: float) -> Optional[Troubleshooting]:
+        """Stored plan of the most similar same-category ticket, if within `threshold`."""
+        best = self.search(vectorize(ticket_text(ticket), self.dims), k=1, category=cls.category)
+        hit = bool(best) and best[0][0] >= threshold
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return Troubleshooting(**best[0][1]["troubleshooting"]) if hit else None
+
+    @staticmethod
+    def _write(path: str, vectors: np.ndarray, cats: np.ndarray, payloads: List[dict], parts: List[list]):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+        with open(tmp, "wb") as f:
+            np.savez(
+                f, vectors=vectors, cats=cats,
+                payloads=np.array(json.dumps(payloads)), parts=np.array(json.dumps(parts)),
+            )
+        os.replace(tmp, path)
+
+    @staticmethod
+    def _read(name: str) -> Tuple[np.ndarray, np.ndarray, List[dict], List[list]]:
+        """(vectors, cats, payloads, parts); a file written before parts existed is one part."""
+        with np.load(name) as data:
+            vectors, cats = data["vectors"], data["cats"]
+            payloads = json.loads(str(data["payloads"]))
+            parts = json.loads(str(data["parts"])) if "parts" in data.files else [[os.path.basename(name), len(payloads)]]
+        return vectors, cats, payloads, parts
+
+    @staticmethod
+    def _stem(path: str) -> str:
+        return path[:-4] if path.endswith(".npz") else path
+
+    @classmethod
+    def _segments(cls, path: str) -> List[str]:
+        return sorted(glob.glob(glob.escape(cls._stem(path)) + ".*.npz"))
+
+    def save(self, path: Optional[str] = None):
+        path = path or self.path
+        if not path:
+            return
+        if path != self.path:
+            with self._lock:
+                n = len(self)
+                vectors, cats, payloads = self._vectors[:n].copy(), self._cats[:n].copy(), list(self._payloads)
+            self._write(path, vectors, cats, payloads, [[uuid.uuid4().hex[:16], len(payloads)]])
+            return
+        with self._save_lock:
+            with self._lock:
+                rows, self._pending = self._pending, []
+                vectors, cats = self._vectors[rows], self._cats[rows]
+                payloads = [self._payloads[i] for i in rows]
+            if rows:
+                segment = f"{self._stem(path)}.{uuid.uuid4().hex[:16]}.npz"
+                token = os.path.basename(segment)
+                try:
+                    self._write(segment, vectors, cats, payloads, [[token, len(rows)]])
+                except Exception:
+                    with self._lock:
+                        self._pending[:0] = rows
+                    raise
+                self._loaded.add(token)
+            self.load(path)
+            self._compact(path)
+
+    def flush(self):
+        """Save only if something was added since the last save."""
+        if self._pending:
+            self.save()
+
+    def _merge(self, name: str):
+        # the parts of `name` this index does not hold yet
+        try:
+            st = os.stat(name)
+            if self._seen.get(name) == (st.st_mtime_ns, st.st_size, st.st_ino):
+                return
+            vectors, cats, payloads, parts = self._read(name)
+        except FileNotFoundError:
+            return  # a segment folded into `path` meanwhile: merged from there
+        if vectors.shape[1] != self.dims:
+            raise ValueError(f"plan index {name} has dims={vectors.shape[1]}, expected {self.dims}")
+        offset = 0
+        for token, n in parts:
+            if token not in self._loaded:
+                with self._lock:
+                    self._append(vectors[offset:offset + n], cats[offset:offset + n], payloads[offset:offset + n])
+                self._loaded.add(token)
+            offset += n
+        self._seen[name] = (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def load(self, path: str):
+        """Merge `path` and its segments into the index (parts merged before are skipped)."""
+        # segments first: one folded into `path` while this runs is then found in `path`
+        for name in self._segments(path):
+            if os.path.basename(name) not in self._loaded:
+                self._merge(name)
+        self._merge(path)
+
+    def _compact(self, path: str):
+        """Fold the segments of `path` into `path` once there are more than `max_segments`."""
+        if fcntl is None or len(self._segments(path)) <= self.max_segments:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(self._stem(path) + ".lock", "ab") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)  # one compaction at a time across processes
+            segments = self._segments(path)
+            if len(segments) <= self.max_segments:
+                return  # another index just did it
+            files = ([path] if os.path.exists(path) else []) + segments
+            chunks = [self._read(name) for name in files]
+            self._write(
+                path,
+                np.concatenate([c[0] for c in chunks]),
+                np.concatenate([c[1] for c in chunks]),
+                [p for c in chunks for p in c[2]],
+                [part for c in chunks for part in c[3]],
+            )
+            for name in segments:
+                os.remove(name)
+        self.load(path)
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits, misses, size = self.hits, self.misses, len(self)
+        lookups = hits + misses
+        return {
+            "size": size,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+_index: Optional[PlanIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_index() -> PlanIndex:
+    """Process-wide index persisted at PLAN_INDEX_PATH (saved on exit too)."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = PlanIndex(
+                    PLAN_INDEX_DIMS, PLAN_INDEX_PATH or None, PLAN_INDEX_SAVE_EVERY, PLAN_INDEX_MAX_SEGMENTS
+                )
+                atexit.register(_index.flush)
+    return _index
+
+
+def with_plan_reuse(
+    fallback: Callable[[Ticket, Classification], Troubleshooting],
+    threshold: Optional[float] = None,
+) -> Callable[[Ticket, Classification], Troubleshooting]:
+    """
+    Wrap a troubleshooter so near-duplicates of an already troubleshot ticket (same
+    category, cosine >= threshold) reuse its stored plan instead of calling the model.
+    New plans are added to the index. PLAN_REUSE_THRESHOLD > 1 disables reuse.
+    """
+    if threshold is None:
+        threshold = PLAN_REUSE_THRESHOLD
+
+    def troubleshoot(ticket: Ticket, cls: Classification) -> Troubleshooting:
+        if threshold > 1.0:
+            return fallback(ticket, cls)
+        index = get_index()
+        with span("plan_index.lookup") as sp:
+            ts = index.lookup(ticket, cls, threshold)
+            sp.set(hit=ts is not None)
+        if ts is None:
+            ts = fallback(ticket, cls)
+            index.add(ticket, cls, ts)
+        return ts
+
+    return troubleshoot
+
+
+def with_plan_reuse_async(
+    fallback: Callable[[Ticket, Classification], Awaitable[Troubleshooting]],
+    threshold: Optional[float] = None,
+) -> Callable[[Ticket, Classification], Awaitable[Troubleshooting]]:
+    """
+    `with_plan_reuse` for an async troubleshooter. Lookup and add run on a worker
+    thread: they can block on the index lock or, for an add, on writing a segment.
+    """
+    if threshold is None:
+        threshold = PLAN_REUSE_THRESHOLD
+
+    async def troubleshoot(ticket: Ticket, cls: Classification) -> Troubleshooting:
+        if threshold > 1.0:
+            return await fallback(ticket, cls)
+        index = get_index()
+        with span("plan_index.lookup") as sp:
+            ts = await asyncio.to_thread(index.lookup, ticket, cls, threshold)
+            sp.set(hit=ts is not None)
+        if ts is None:
+            ts = await fallback(ticket, cls)
+            await asyncio.to_thread(index.add, ticket, cls, ts)
+        return ts
+
+    return troubleshoot
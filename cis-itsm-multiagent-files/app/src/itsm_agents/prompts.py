@@ -0,0 +1,230 @@
+import json
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from pydantic import BaseModel
+
+from .config import STRUCTURED_OUTPUT
+from .schemas import Ticket, Classification, Troubleshooting
+
+# (system, user)
+Prompt = Tuple[str, str]
+
+# -------------------------
+# Serialization: context goes into prompts as compact canonical JSON (sorted keys, no
+# whitespace) with null and default-valued fields dropped, so equal inputs always
+# produce byte-identical prompts (cache keys stay stable) and no tokens go to noise.
+# -------------------------
+def compact(obj, include: Optional[Set[str]] = None) -> str:
+    if isinstance(obj, BaseModel):
+        obj = obj.model_dump(include=include, exclude_none=True, exclude_defaults=True)
+    elif isinstance(obj, list):
+        obj = [
+            x.model_dump(include=include, exclude_none=True, exclude_defaults=True) if isinstance(x, BaseModel) else x
+            for x in obj
+        ]
+    return json.dumps(obj, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+
+
+def numbered(rules: Iterable[str]) -> str:
+    return "\n".join(f"{i}) {r}" for i, r in enumerate(rules, 1))
+
+
+def build(task: str, rules: List[str], context: List[Tuple[str, str]], output_schema: Optional[str] = None) -> str:
+    """TASK / OUTPUT JSON SCHEMA (prompt-only mode) / RULES / context sections."""
+    parts = [f"TASK:\n{task}"]
+    if output_schema is not None:
+        parts.append(f"OUTPUT JSON SCHEMA (MUST follow exactly):\n{output_schema}")
+    if rules:
+        parts.append(f"RULES:\n{numbered(rules)}")
+    parts.extend(f"{title}:\n{body}" for title, body in context)
+    return "\n\n".join(parts)
+
+
+def _structured(structured: Optional[bool]) -> bool:
+    return STRUCTURED_OUTPUT if structured is None else structured
+
+
+def response_schema(model, structured: Optional[bool] = None):
+    """Response schema for structured-output mode (None: prompt-only JSON)."""
+    return model if _structured(structured) else None
+
+
+# -------------------------
+# Rules. In structured-output mode the model is constrained to the pydantic schema,
+# so the JSON schema text and the rules the schema already enforces (enums, number
+# ranges, list/boolean types, "JSON only") are left out.
+# -------------------------
+JSON_ONLY = "Return ONLY JSON. No markdown, no ``` fences, no extra text, no trailing commas."
+
+CLASSIFY_FORMAT_RULES = [
+    "category MUST be exactly one of the schema values (case-sensitive). "
+    'Do NOT shorten (e.g. not "Laptop") or invent values.',
+    "priority MUST be exactly one of the schema values.",
+    "confidence MUST be a NUMBER between 0 and 1.",
+]
+
+CLASSIFY_GUIDANCE_RULES = [
+    "assignment_group: one of CIS-VPN-Support, CIS-EUC-Support, CIS-Network-Ops, "
+    "CIS-Access-Management, CIS-App-Support (closest if unsure).",
+    'If not sure: category="Other", priority="P3", confidence <= 0.6, explain in reason.',
+]
+
+CLASSIFY_SCHEMA = (
+    '{"category":"VPN|Email/Outlook|Access/AD|Network|Laptop/Device|Storage/Disk|Application|Other",'
+    '"priority":"P1|P2|P3|P4","assignment_group":"string","confidence":0.0,"reason":"short text"}'
+)
+CLASSIFY_BATCH_SCHEMA = '{"results":[{"ticket_id":"copied exactly from the ticket",' + CLASSIFY_SCHEMA[1:] + "]}"
+TROUBLESHOOT_SCHEMA = (
+    '{"probable_cause":"short text","steps":["step 1","step 2"],'
+    '"data_needed":["question"],"risk_level":"Low|Medium|High"}'
+)
+COMPOSE_SCHEMA = '{"user_message":"short professional message","ticket_update":"work notes text","close_recommendation":false}'
+
+TROUBLESHOOT_RULES = [
+    "steps: 4 to 5 short, clear steps (1-2 lines each).",
+    "data_needed: questions for the user, if any.",
+]
+TROUBLESHOOT_FORMAT_RULES = ['risk_level MUST be exactly "Low", "Medium" or "High".']
+
+COMPOSE_RULES = [
+    "user_message: short and polite; include next steps and the data_needed questions (if any).",
+    "ticket_update: classification + probable cause + steps summary in service desk tone.",
+]
+COMPOSE_FORMAT_RULES = ["close_recommendation MUST be a boolean (true/false), not a string."]
+
+# only the parts of earlier stages that later stages actually use
+_CLS_FOR_TROUBLESHOOT = {"category", "priority", "reason"}
+_CLS_FOR_COMPOSE = {"category", "priority", "assignment_group"}
+_TS_FOR_COMPOSE = {"probable_cause", "steps", "data_needed"}
+
+
+# -------------------------
+# Stage prompts
+# -------------------------
+def classify_prompt(ticket: Ticket, structured: Optional[bool] = None) -> Prompt:
+    structured = _structured(structured)
+    system = "You are an ITSM Ticket Classification Agent for Cognizant CIS."
+    rules = CLASSIFY_GUIDANCE_RULES if structured else CLASSIFY_FORMAT_RULES + CLASSIFY_GUIDANCE_RULES + [JSON_ONLY]
+    user = build(
+        "Classify the ticket.",
+        rules,
+        [("TICKET", compact(ticket))],
+        None if structured else CLASSIFY_SCHEMA,
+    )
+    return system, user
+
+
+def classify_batch_prompt(tickets: List[Ticket], structured: Optional[bool] = None) -> Prompt:
+    structured = _structured(structured)
+    system = (
+        "You are an ITSM Ticket Classification Agent for Cognizant CIS. "
+        "You classify several tickets at once."
+    )
+    one_each = "Return exactly one element per ticket, with its ticket_id."
+    rules = CLASSIFY_GUIDANCE_RULES + [one_each]
+    if not structured:
+        rules = CLASSIFY_FORMAT_RULES + rules + [JSON_ONLY]
+    user = build(
+        "Classify EACH ticket below independently (rules apply to every element).",
+        rules,
+        [("TICKETS", compact(tickets))],
+        None if structured else CLASSIFY_BATCH_SCHEMA,
+    )
+    return system, user
+
+
+def troubleshoot_prompt(ticket: Ticket, cls: Classification, structured: Optional[bool] = None) -> Prompt:
+    structured = _structured(structured)
+    system = "You are a CIS Troubleshooting Agent (L1/L2)."
+    rules = TROUBLESHOOT_RULES if structured else TROUBLESHOOT_RULES + TROUBLESHOOT_FORMAT_RULES + [JSON_ONLY]
+    user = build(
+        "Create a troubleshooting plan that a service desk engineer can follow.",
+        rules,
+        [("TICKET", compact(ticket)), ("CLASSIFICATION", compact(cls, _CLS_FOR_TROUBLESHOOT))],
+        None if structured else TROUBLESHOOT_SCHEMA,
+    )
+    return system, user
+
+
+def compose_prompt(
+    ticket: Ticket, cls: Classification, ts: Troubleshooting, structured: Optional[bool] = None
+) -> Prompt:
+    structured = _structured(structured)
+    system = (
+        "You are a Service Desk Communication Agent. "
+        "Your response should be professional, short, and action-oriented."
+    )
+    rules = COMPOSE_RULES if structured else COMPOSE_RULES + COMPOSE_FORMAT_RULES + [JSON_ONLY]
+    user = build(
+        "Write (1) a message to the user and (2) a work-notes update for the ticket.",
+        rules,
+        [
+            ("TICKET", compact(ticket)),
+            ("CLASSIFICATION", compact(cls, _CLS_FOR_COMPOSE)),
+            ("TROUBLESHOOTING", compact(ts, _TS_FOR_COMPOSE)),
+        ],
+        None if structured else COMPOSE_SCHEMA,
+    )
+    return system, user
+
+
+# -------------------------
+# Fused mode: several stages answered in one request (orchestrator_fused.py)
+# -------------------------
+SECTIONS = ("classification", "troubleshooting", "communication")
+
+_SECTION_SCHEMA = {
+    "classification": CLASSIFY_SCHEMA,
+    "troubleshooting": TROUBLESHOOT_SCHEMA,
+    "communication": COMPOSE_SCHEMA,
+}
+_SECTION_RULES = {
+    "classification": (CLASSIFY_GUIDANCE_RULES, CLASSIFY_FORMAT_RULES),
+    "troubleshooting": (TROUBLESHOOT_RULES, TROUBLESHOOT_FORMAT_RULES),
+    "communication": (COMPOSE_RULES, COMPOSE_FORMAT_RULES),
+}
+_SECTION_CONTEXT = {
+    "classification": _CLS_FOR_COMPOSE | _CLS_FOR_TROUBLESHOOT,
+    "troubleshooting": _TS_FOR_COMPOSE,
+}
+
+
+def fused_prompt(
+    ticket: Ticket,
+    sections: List[str],
+    known: Optional[Dict[str, BaseModel]] = None,
+    structured: Optional[bool] = None,
+) -> Prompt:
+    """
+    One request for the listed `sections` (in pipeline order). `known` holds sections
+    that are already settled (rule fast path, reused plan, or valid in an earlier
+    answer); they are given as context and not asked for again.
+    """
+    structured = _structured(structured)
+    known = known or {}
+    system = (
+        "You are the CIS service desk pipeline: classification agent, L1/L2 troubleshooting "
+        "agent and communication agent in one. Be professional, short and action-oriented."
+    )
+    rules: List[str] = []
+    for name in sections:
+        guidance, fmt = _SECTION_RULES[name]
+        rules += [f"[{name}] {r}" for r in (guidance if structured else fmt + guidance)]
+    if not structured:
+        rules.append(JSON_ONLY)
+    # settled sections that come before a requested one are its context
+    last = max(SECTIONS.index(name) for name in sections)
+    context = [("TICKET", compact(ticket))]
+    context += [
+        (name.upper(), compact(known[name], _SECTION_CONTEXT[name]))
+        for name in SECTIONS[:last]
+        if name in known
+    ]
+    user = build(
+        f"Answer with the {', '.join(sections)} section(s) for the ticket, in that order; "
+        "each later section builds on the earlier ones.",
+        rules,
+        context,
+        None if structured else "{" + ",".join(f'"{n}":{_SECTION_SCHEMA[n]}' for n in sections) + "}",
+    )
+    return system, user
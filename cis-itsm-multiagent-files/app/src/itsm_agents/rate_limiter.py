@@ -0,0 +1,386 @@
+import os
+import json
+import math
+import logging
+import time
+import asyncio
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from typing import Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:  # no flock (Windows): the limiter stays process-local
+    fcntl = None
+
+from .config import (
+    LLM_BACKEND,
+    LLM_RATE_LIMIT,
+    LLM_RPM,
+    LLM_TPM,
+    LLM_RATE_BURST_S,
+    LLM_MAX_CONCURRENCY,
+    LLM_MIN_CONCURRENCY,
+    LLM_AIMD_DECREASE,
+    LLM_AIMD_COOLDOWN_S,
+    LLM_CHARS_PER_TOKEN,
+    LLM_RATE_STATE_PATH,
+)
+from .request_policy import paused
+from .tracing import span
+
+log = logging.getLogger(__name__)
+
+# API answers that mean "slow down": rate limited / quota exhausted, model overloaded
+THROTTLE_STATUS = {429, 503}
+
+# while blocked on concurrency (not on a bucket) re-check this often for a free slot
+_POLL_S = 0.05
+
+
+def is_throttle(exc: BaseException) -> bool:
+    """429 / 503 (google-genai APIError has .code) or a RESOURCE_EXHAUSTED status."""
+    code = getattr(exc, "code", None) or getattr(exc, "status_code", None)
+    return code in THROTTLE_STATUS or "RESOURCE_EXHAUSTED" in str(exc)
+
+
+def estimate_tokens(*texts: str) -> int:
+    """Rough input token count for the TPM budget (corrected with the real count afterwards)."""
+    return max(1, math.ceil(sum(len(t) for t in texts) / LLM_CHARS_PER_TOKEN))
+
+
+class LocalState:
+    """Limiter state for this process only."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data: dict = {}
+
+    @contextmanager
+    def transact(self) -> Iterator[dict]:
+        with self._lock:
+            yield self._data
+
+
+class FileState:
+    """
+    Limiter state in a small JSON file under an exclusive flock, shared by every process
+    on the host that uses the same path. One read-modify-write per admission/release.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()  # flock is per open file, so threads also need this
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    @contextmanager
+    def transact(self) -> Iterator[dict]:
+        with self._lock:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            with os.fdopen(fd, "r+b") as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    data = json.loads(f.read() or b"{}")
+                except ValueError:
+                    data = {}  # torn or foreign file: start over
+                yield data
+                f.seek(0)
+                f.truncate()
+                f.write(json.dumps(data, separators=(",", ":")).encode("utf-8"))
+                f.flush()
+
+
+def state_store(path: Optional[str]):
+    """
+    FileState at `path` (host-wide) when given, flock is available and the file can be
+    opened for writing, else LocalState.
+    """
+    if not path or fcntl is None:
+        return LocalState()
+    try:
+        state = FileState(path)
+        os.close(os.open(path, os.O_RDWR | os.O_CREAT, 0o600))
+    except OSError as e:
+        log.warning("rate limiter state %s not usable (%s): limiting this process only", path, e)
+        return LocalState()
+    return state
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class Admission:
+    """One admitted call; set `tokens` to the real input token count once known."""
+
+    def __init__(self, estimate: int, waited_s: float):
+        self.estimate = estimate
+        self.waited_s = waited_s
+        self.tokens: Optional[int] = None
+
+
+class RateLimiter:
+    """
+    Admission control for model calls against the API quota.
+
+    - requests and estimated input tokens per minute are budgeted with two token
+      buckets (refilled at rpm/60 and tpm/60 per second, holding `burst_s` seconds of
+      quota); a call waits until both have room. The token charge is corrected with the
+      response's real prompt token count.
+    - calls in flight are capped by an AIMD limit: +1/limit per successful call (about
+      +1 per round of calls) up to max_concurrency, x`decrease` on a throttling answer
+      (429 / 503, see `is_throttle`; at most once per `cooldown_s`) down to
+      min_concurrency. A throttle also empties the request bucket.
+    - inside a request policy attempt, admission pauses the attempt's clock (see
+      request_policy.paused): queueing here is neither latency nor a reason to hedge.
+    - with a state `path` (and flock), buckets, limit and per-process in-flight / waiting
+      counts live in one file shared by all threads, asyncio tasks and processes on the
+      host (e.g. every MCP server); counts of processes that died are dropped.
+    """
+
+    def __init__(
+        self,
+        rpm: float = 1000,
+        tpm: float = 1_000_000,
+        burst_s: float = 10,
+        max_concurrency: int = 32,
+        min_concurrency: int = 1,
+        decrease: float = 0.5,
+        cooldown_s: float = 1.0,
+        path: Optional[str] = None,
+    ):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.req_capacity = max(1.0, rpm * burst_s / 60)
+        self.tok_capacity = max(1.0, tpm * burst_s / 60)
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.min_concurrency = max(1, min(int(min_concurrency), self.max_concurrency))
+        self.decrease = decrease
+        self.cooldown_s = cooldown_s
+        self._state = state_store(path)
+        self.shared = isinstance(self._state, FileState)
+        self.path = path if self.shared else None
+        self._pid = str(os.getpid())
+
+        self._lock = threading.Lock()
+        self._counts = {"admitted": 0, "waited": 0, "throttled": 0, "errors": 0, "limit_cuts": 0}
+        self._wait_ms_total = 0.0
+        self._wait_ms_max = 0.0
+
+    def _refresh(self, s: dict, now: float):
+        if "req" not in s:
+            s.update(req=self.req_capacity, tok=self.tok_capacity, t=now, limit=float(self.max_concurrency),
+                     cut=0.0, procs={}, win=[math.floor(now / 60) * 60, 0, 0, 0, 0])
+        elapsed = max(0.0, now - s["t"])
+        if elapsed > 60:
+            # idle for a minute: a throttle seen by an earlier run no longer says anything
+            s["limit"] = float(self.max_concurrency)
+        s["req"] = min(self.req_capacity, s["req"] + elapsed * self.rpm / 60)
+        s["tok"] = min(self.tok_capacity, s["tok"] + elapsed * self.tpm / 60)
+        s["t"] = now
+        start = math.floor(now / 60) * 60
+        win = s["win"]
+        if start != win[0]:
+            # sliding window counter: previous minute + current minute so far
+            prev = (win[1], win[3]) if start - win[0] == 60 else (0, 0)
+            s["win"] = [start, 0, prev[0], 0, prev[1]]
+        if self.shared:
+            for pid in [p for p in s["procs"] if p != self._pid]:
+                if not _alive(int(pid)):
+                    del s["procs"][pid]
+
+    def _try_admit(self, estimate: float, waiting: bool) -> Optional[float]:
+        """Admit now (returns None) or return how long to wait; registers as waiting."""
+        now = time.time()
+        need = min(estimate, self.tok_capacity)
+        with self._state.transact() as s:
+            self._refresh(s, now)
+            me = s["procs"].setdefault(self._pid, [0, 0])
+            in_flight = sum(p[0] for p in s["procs"].values())
+            if in_flight < int(s["limit"]) and s["req"] >= 1 and s["tok"] >= need:
+                s["req"] -= 1
+                s["tok"] -= estimate
+                s["win"][1] += 1
+                s["win"][3] += estimate
+                me[0] += 1
+                if waiting:
+                    me[1] -= 1
+                return None
+            if not waiting:
+                me[1] += 1
+            wait = 0.0
+            if s["req"] < 1:
+                wait = (1 - s["req"]) * 60 / self.rpm
+            if s["tok"] < need:
+                wait = max(wait, (need - s["tok"]) * 60 / self.tpm)
+            return max(wait, _POLL_S)
+
+    def _give_up(self):
+        # cancelled / abandoned while waiting
+        with self._state.transact() as s:
+            me = s.get("procs", {}).get(self._pid)
+            if me is not None:
+                me[1] = max(0, me[1] - 1)
+
+    def release(self, adm: Admission, error: Optional[BaseException] = None):
+        """End an `acquire`d call: frees its slot, settles tokens and adjusts the AIMD limit."""
+        throttled = error is not None and is_throttle(error)
+        now = time.time()
+        with self._state.transact() as s:
+            self._refresh(s, now)
+            me = s["procs"].setdefault(self._pid, [0, 0])
+            me[0] = max(0, me[0] - 1)
+            if adm.tokens is not None:
+                s["tok"] -= adm.tokens - adm.estimate  # refund or charge the difference
+                s["win"][3] += adm.tokens - adm.estimate
+            if throttled:
+                if now - s["cut"] >= self.cooldown_s:
+                    s["limit"] = max(float(self.min_concurrency), s["limit"] * self.decrease)
+                    s["cut"] = now
+                    self._count("limit_cuts")
+                s["req"] = min(s["req"], 0.0)
+            elif error is None:
+                s["limit"] = min(float(self.max_concurrency), s["limit"] + 1 / s["limit"])
+        if throttled:
+            self._count("throttled")
+        elif error is not None and not isinstance(error, asyncio.CancelledError):  # lost hedge: not an error
+            self._count("errors")
+
+    def _count(self, name: str, waited_s: float = 0.0):
+        with self._lock:
+            self._counts[name] += 1
+            if waited_s > 0:
+                self._counts["waited"] += 1
+                self._wait_ms_total += waited_s * 1000
+                self._wait_ms_max = max(self._wait_ms_max, waited_s * 1000)
+
+    def acquire(self, estimate: int = 1) -> Admission:
+        t0 = time.perf_counter()
+        waiting = False
+        try:
+            with paused():  # not model latency for the request policy, nothing to hedge
+                while True:
+                    wait = self._try_admit(estimate, waiting)
+                    if wait is None:
+                        break
+                    waiting = True
+                    time.sleep(wait)
+        except BaseException:
+            if waiting:
+                self._give_up()
+            raise
+        waited = time.perf_counter() - t0 if waiting else 0.0
+        self._count("admitted", waited)
+        return Admission(estimate, waited)
+
+    async def acquire_async(self, estimate: int = 1) -> Admission:
+        t0 = time.perf_counter()
+        waiting = False
+        try:
+            with paused():
+                while True:
+                    wait = self._try_admit(estimate, waiting)
+                    if wait is None:
+                        break
+                    waiting = True
+                    await asyncio.sleep(wait)
+        except BaseException:  # includes cancellation by the request policy
+            if waiting:
+                self._give_up()
+            raise
+        waited = time.perf_counter() - t0 if waiting else 0.0
+        self._count("admitted", waited)
+        return Admission(estimate, waited)
+
+    @contextmanager
+    def admit(self, estimate: int = 1) -> Iterator[Admission]:
+        """`with limiter.admit(n) as adm:` make the call; set adm.tokens to the real count."""
+        with span("llm.admit", estimate_tokens=estimate) as sp:
+            adm = self.acquire(estimate)
+            sp.set(wait_ms=round(adm.waited_s * 1000, 1))
+        try:
+            yield adm
+        except BaseException as e:
+            self.release(adm, e)
+            raise
+        self.release(adm, None)
+
+    @asynccontextmanager
+    async def admit_async(self, estimate: int = 1):
+        with span("llm.admit", estimate_tokens=estimate) as sp:
+            adm = await self.acquire_async(estimate)
+            sp.set(wait_ms=round(adm.waited_s * 1000, 1))
+        try:
+            yield adm
+        except BaseException as e:
+            self.release(adm, e)
+            raise
+        self.release(adm, None)
+
+    def stats(self) -> dict:
+        """Host-wide view (shared state) plus this process's counters."""
+        now = time.time()
+        with self._state.transact() as s:
+            self._refresh(s, now)
+            win = s["win"]
+            frac = (now - win[0]) / 60
+            procs = s["procs"].values()
+            shared = {
+                "concurrency_limit": round(s["limit"], 2),
+                "in_flight": sum(p[0] for p in procs),
+                "queue_depth": sum(p[1] for p in procs),
+                "processes": len(s["procs"]),
+                "rate_rpm": round(win[2] * (1 - frac) + win[1], 1),
+                "rate_tpm": round(win[4] * (1 - frac) + win[3], 1),
+                "request_tokens": round(s["req"], 2),
+                "input_tokens": round(s["tok"], 1),
+            }
+        with self._lock:
+            counts = dict(self._counts)
+            waited = counts["waited"]
+            local = {
+                **counts,
+                "mean_wait_ms": round(self._wait_ms_total / waited, 1) if waited else 0.0,
+                "max_wait_ms": round(self._wait_ms_max, 1),
+            }
+        return {
+            "rpm": self.rpm, "tpm": self.tpm, "max_concurrency": self.max_concurrency,
+            "shared_state": self.path, **shared, "process": local,
+        }
+
+
+_limiter: Optional[RateLimiter] = None
+_limiter_lock = threading.Lock()
+
+
+def limiter_from_config(real_api: bool = True) -> Optional[RateLimiter]:
+    """
+    The process-wide limiter per LLM_RATE_LIMIT (None when off). With "auto" it is on
+    for clients of the real API (`real_api`) when LLM_BACKEND is gemini or record.
+    """
+    enabled = LLM_RATE_LIMIT in ("1", "true", "yes", "on") or (
+        LLM_RATE_LIMIT == "auto" and real_api and LLM_BACKEND in ("gemini", "record")
+    )
+    if not enabled:
+        return None
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = RateLimiter(
+                    rpm=LLM_RPM,
+                    tpm=LLM_TPM,
+                    burst_s=LLM_RATE_BURST_S,
+                    max_concurrency=LLM_MAX_CONCURRENCY,
+                    min_concurrency=LLM_MIN_CONCURRENCY,
+                    decrease=LLM_AIMD_DECREASE,
+                    cooldown_s=LLM_AIMD_COOLDOWN_S,
+                    path=LLM_RATE_STATE_PATH,
+                )
+    return _limiter
@@ -0,0 +1,435 @@
+import sys
+import time
+import random
+import asyncio
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from .config import (
+    LLM_DEADLINE_S,
+    LLM_STAGE_DEADLINES,
+    LLM_MAX_RETRIES,
+    LLM_BACKOFF_BASE_S,
+    LLM_BACKOFF_MAX_S,
+    LLM_HEDGE,
+    LLM_HEDGE_MIN_SAMPLES,
+    LLM_LATENCY_WINDOW,
+)
+from .metrics import percentile
+from .tracing import span
+
+# HTTP statuses worth retrying: rate limited, server side / gateway trouble
+TRANSIENT_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+class DeadlineExceeded(TimeoutError):
+    """The stage deadline passed before any attempt returned."""
+
+
+def is_transient(exc: BaseException) -> bool:
+    """Timeouts, connection errors and retryable HTTP statuses (google-genai APIError has .code)."""
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return True
+    # no import just for the check: if httpx was never loaded, no httpx error can exist
+    httpx = sys.modules.get("httpx")
+    if httpx is not None and isinstance(exc, (httpx.TimeoutException, httpx.TransportError)):
+        return True
+    code = getattr(exc, "code", None) or getattr(exc, "status_code", None)
+    return code in TRANSIENT_STATUS
+
+
+class LatencyHistogram:
+    """Rolling window of the last `window` successful call latencies (ms)."""
+
+    def __init__(self, window: int = 512):
+        self._lock = threading.Lock()
+        self._samples: deque = deque(maxlen=window)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def record(self, ms: float):
+        with self._lock:
+            self._samples.append(ms)
+
+    def percentile(self, p: float) -> Optional[float]:
+        with self._lock:
+            xs = sorted(self._samples)
+        return percentile(xs, p)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            xs = sorted(self._samples)
+        out = {"samples": len(xs)}
+        for p in (50, 95, 99):
+            v = percentile(xs, p)
+            out[f"p{p}_ms"] = round(v, 1) if v is not None else None
+        return out
+
+
+# attempts run here (in the caller's context) so a stalled call can be abandoned;
+# it finishes in the background
+_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="llm-attempt")
+
+
+class _Attempt:
+    """
+    Clock of one attempt. It starts when the attempt begins running (time queued in
+    the pool is not model latency) and is paused while the attempt waits for something
+    else, e.g. rate-limiter admission (see `paused`). `started` is clear while queued
+    or paused and set again once the attempt ends; asyncio attempts use an asyncio.Event.
+    """
+
+    def __init__(self, aio: bool = False):
+        self.started = asyncio.Event() if aio else threading.Event()
+        self.started_at = 0.0
+
+    def begin(self):
+        self.started_at = time.monotonic()
+        self.started.set()
+
+    def pause(self):
+        self.started.clear()
+
+    def due(self, delay: float) -> bool:
+        """Running (not paused) for at least `delay` seconds."""
+        return self.started.is_set() and time.monotonic() >= self.started_at + delay
+
+
+_current_attempt: ContextVar[Optional[_Attempt]] = ContextVar("llm_attempt", default=None)
+
+
+@contextmanager
+def paused():
+    """
+    Pause the clock of the attempt running in this context (no-op outside a policy):
+    the wait is neither recorded as latency nor counted towards the hedge delay, and
+    no duplicate is fired while it lasts. The rate limiter wraps admission in this.
+    """
+    attempt = _current_attempt.get()
+    if attempt is None:
+        yield
+        return
+    attempt.pause()
+    try:
+        yield
+    finally:
+        attempt.begin()
+
+
+class _StreamGate:
+    """
+    Field forwarding for one streaming call. Every attempt streams into its own
+    listener; the first attempt to produce a field holds the stream and is forwarded
+    live, the others buffer. When the holder fails, the stream passes to the next
+    attempt that has fields (its buffer first). Once the call returns, the winner's
+    buffered fields are flushed if it was not the holder, and nothing else is forwarded:
+    retried, losing and abandoned attempts never reach `on_field` afterwards.
+    """
+
+    def __init__(self, on_field: Callable[[str, Any], None]):
+        self.on_field = on_field
+        self._lock = threading.Lock()
+        self._buffers: Dict[_Attempt, list] = {}
+        self._holder: Optional[_Attempt] = None
+        self._closed = False
+
+    def listener(self, attempt: _Attempt) -> Callable[[str, Any], None]:
+        self._buffers[attempt] = []
+
+        def on_field(key: str, value: Any):
+            with self._lock:
+                if self._closed or attempt not in self._buffers:
+                    return
+                if self._holder is None:
+                    self._hand_over(attempt)
+                if self._holder is attempt:
+                    self.on_field(key, value)
+                else:
+                    self._buffers[attempt].append((key, value))
+
+        return on_field
+
+    def _hand_over(self, attempt: _Attempt):
+        self._holder = attempt
+        for key, value in self._buffers[attempt]:
+            self.on_field(key, value)
+        self._buffers[attempt] = []
+
+    def drop(self, attempt: _Attempt):
+        """`attempt` failed: forget it and pass the stream on."""
+        with self._lock:
+            self._buffers.pop(attempt, None)
+            if self._holder is attempt:
+                self._holder = None
+                for other, fields in self._buffers.items():
+                    if fields:
+                        self._hand_over(other)
+                        break
+
+    def close(self, winner: Optional[_Attempt] = None):
+        with self._lock:
+            if winner is not None and self._holder is not winner and winner in self._buffers:
+                self._hand_over(winner)
+            self._closed = True
+
+
+class RequestPolicy:
+    """
+    Deadline, retries and hedging for one pipeline stage.
+
+    - deadline_s bounds the whole call from the moment it is made (time queued for a
+      worker, all attempts and backoff sleeps together); when it passes,
+      DeadlineExceeded is raised and attempts still queued are cancelled.
+    - transient errors (see `is_transient`) are retried up to max_retries times with
+      full-jitter exponential backoff: sleep ~ U(0, min(backoff_max_s, base * 2^n)).
+    - with hedging on, once an attempt has been running longer than the observed p95
+      (after hedge_min_samples successes), one duplicate is fired and whichever
+      answers first wins. Latency samples and the hedge timer leave out time spent
+      `paused` (rate-limiter admission), and an attempt that is waiting is never hedged.
+    - with `on_field`, attempts stream: each gets its own listener and only the
+      attempt holding the stream reaches `on_field` (see `_StreamGate`).
+    """
+
+    def __init__(
+        self,
+        stage: str = "default",
+        deadline_s: float = 60.0,
+        max_retries: int = 2,
+        backoff_base_s: float = 0.5,
+        backoff_max_s: float = 8.0,
+        hedge: bool = True,
+        hedge_min_samples: int = 20,
+        window: int = 512,
+    ):
+        self.stage = stage
+        self.deadline_s = deadline_s
+        self.max_retries = max_retries
+        self.backoff_base_s = backoff_base_s
+        self.backoff_max_s = backoff_max_s
+        self.hedge = hedge
+        self.hedge_min_samples = hedge_min_samples
+        self.histogram = LatencyHistogram(window)
+        self._lock = threading.Lock()
+        self._counts = {"calls": 0, "retries": 0, "hedges": 0, "hedge_wins": 0, "deadline_exceeded": 0, "errors": 0}
+
+    def _count(self, name: str):
+        with self._lock:
+            self._counts[name] += 1
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds after which a duplicate is fired (None: no hedging yet)."""
+        if not self.hedge or len(self.histogram) < self.hedge_min_samples:
+            return None
+        return self.histogram.percentile(95) / 1000
+
+    def backoff(self, retry: int) -> float:
+        return random.uniform(0, min(self.backoff_max_s, self.backoff_base_s * (2 ** retry)))
+
+    def _timed(self, attempt: str, handle: _Attempt, fn: Callable[..., Any], *args) -> Any:
+        token = _current_attempt.set(handle)
+        try:
+            with span("llm.attempt", stage=self.stage, attempt=attempt):
+                handle.begin()
+                result = fn(*args)
+                self.histogram.record((time.monotonic() - handle.started_at) * 1000)
+                return result
+        finally:
+            _current_attempt.reset(token)
+            handle.started.set()  # ended: nothing left to wait for
+
+    async def _timed_async(self, attempt: str, handle: _Attempt, fn: Callable[..., Awaitable[Any]], *args) -> Any:
+        token = _current_attempt.set(handle)
+        try:
+            with span("llm.attempt", stage=self.stage, attempt=attempt):
+                handle.begin()
+                result = await fn(*args)
+                self.histogram.record((time.monotonic() - handle.started_at) * 1000)
+                return result
+        finally:
+            _current_attempt.reset(token)
+            handle.started.set()
+
+    def _deadline_exceeded(self) -> DeadlineExceeded:
+        self._count("deadline_exceeded")
+        return DeadlineExceeded(f"{self.stage}: no answer within {self.deadline_s}s")
+
+    def _submit(self, attempt: str, fn: Callable[..., Any], args: tuple, gate: Optional[_StreamGate] = None):
+        handle = _Attempt()
+        if gate is not None:
+            args = (*args, gate.listener(handle))
+
+        fut = _executor.submit(contextvars.copy_context().run, self._timed, attempt, handle, fn, *args)
+        fut.attempt = handle
+        return fut
+
+    def call(
+        self,
+        fn: Callable[..., Any],
+        *args,
+        hedge: bool = True,
+        on_field: Optional[Callable[[str, Any], None]] = None,
+    ) -> Any:
+        """`fn(*args)` under the policy; with `on_field`, fn(*args, listener) streams."""
+        self._count("calls")
+        gate = _StreamGate(on_field) if on_field is not None else None
+        winner = None
+        futures = []
+        deadline = time.monotonic() + self.deadline_s
+        retry = 0
+        try:
+            while True:
+                futures = [self._submit("retry" if retry else "first", fn, args, gate)]
+                first = futures[0].attempt
+                hedge_delay = self.hedge_delay() if hedge else None
+                error = None
+                while futures:
+                    now = time.monotonic()
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        raise self._deadline_exceeded()
+                    timeout = remaining
+                    if hedge_delay is not None and len(futures) == 1:
+                        if not first.started.is_set():
+                            # queued for a worker or waiting for admission: a duplicate would
+                            # only queue behind it (the hedge timer counts running time only)
+                            first.started.wait(remaining)
+                            continue
+                        timeout = min(remaining, max(0.0, first.started_at + hedge_delay - now))
+                    done, _ = wait(futures, timeout=timeout, return_when=FIRST_COMPLETED)
+                    if not done:
+                        if hedge_delay is not None and len(futures) == 1 and first.due(hedge_delay):
+                            self._count("hedges")
+                            futures.append(self._submit("hedge", fn, args, gate))
+                            hedge_delay = None
+                        continue
+                    for fut in done:
+                        exc = fut.exception()
+                        if exc is None:
+                            if fut.attempt is not first:
+                                self._count("hedge_wins")
+                            winner = fut.attempt
+                            return fut.result()
+                        if gate is not None:
+                            gate.drop(fut.attempt)
+                        error = exc
+                        futures.remove(fut)
+
+                # every attempt in this round failed
+                self._count("errors")
+                if not is_transient(error) or retry >= self.max_retries:
+                    raise error
+                pause = self.backoff(retry)
+                if time.monotonic() + pause >= deadline:
+                    raise self._deadline_exceeded() from error
+                retry += 1
+                self._count("retries")
+                time.sleep(pause)
+        finally:
+            for fut in futures:
+                fut.cancel()  # still queued for a worker: never runs; running ones finish in the background
+            if gate is not None:
+                gate.close(winner)
+
+    async def call_async(self, fn: Callable[..., Awaitable[Any]], *args, hedge: bool = True) -> Any:
+        """Same policy for coroutines; losing attempts are cancelled."""
+        self._count("calls")
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.deadline_s
+
+        def start(attempt: str, handle: _Attempt) -> asyncio.Task:
+            return asyncio.ensure_future(self._timed_async(attempt, handle, fn, *args))
+
+        retry = 0
+        while True:
+            first = _Attempt(aio=True)
+            tasks = [start("retry" if retry else "first", first)]
+            hedge_delay = self.hedge_delay() if hedge else None
+            error = None
+            resumed = None
+            try:
+                while tasks:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        self._count("deadline_exceeded")
+                        raise DeadlineExceeded(f"{self.stage}: no answer within {self.deadline_s}s")
+                    timeout = remaining
+                    watched = tasks
+                    if hedge_delay is not None and len(tasks) == 1:
+                        if first.started.is_set():
+                            timeout = min(remaining, max(0.0, first.started_at + hedge_delay - time.monotonic()))
+                        else:
+                            # waiting for admission: wake up when it runs, not on the hedge timer
+                            if resumed is None or resumed.done():
+                                resumed = asyncio.ensure_future(first.started.wait())
+                            watched = [*tasks, resumed]
+                    done, _ = await asyncio.wait(watched, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                    done = [task for task in done if task is not resumed]
+                    if not done:
+                        if hedge_delay is not None and len(tasks) == 1 and first.due(hedge_delay):
+                            self._count("hedges")
+                            tasks.append(start("hedge", _Attempt(aio=True)))
+                            hedge_delay = None
+                        continue
+                    for task in done:
+                        exc = task.exception()
+                        if exc is None:
+                            if task is not tasks[0]:
+                                self._count("hedge_wins")
+                            return task.result()
+                        error = exc
+                        tasks.remove(task)
+            finally:
+                for task in tasks:
+                    task.cancel()
+                if resumed is not None:
+                    resumed.cancel()
+
+            self._count("errors")
+            if not is_transient(error) or retry >= self.max_retries:
+                raise error
+            pause = self.backoff(retry)
+            if loop.time() + pause >= deadline:
+                self._count("deadline_exceeded")
+                raise DeadlineExceeded(f"{self.stage}: no answer within {self.deadline_s}s") from error
+            retry += 1
+            self._count("retries")
+            await asyncio.sleep(pause)
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = dict(self._counts)
+        return {"stage": self.stage, "deadline_s": self.deadline_s, **counts, **self.histogram.snapshot()}
+
+
+_policies: Dict[str, RequestPolicy] = {}
+_policies_lock = threading.Lock()
+
+
+def policy(stage: str) -> RequestPolicy:
+    """Process-wide policy per stage, configured from LLM_* settings."""
+    p = _policies.get(stage)
+    if p is None:
+        with _policies_lock:
+            p = _policies.get(stage)
+            if p is None:
+                p = _policies[stage] = RequestPolicy(
+                    stage=stage,
+                    deadline_s=LLM_STAGE_DEADLINES.get(stage, LLM_DEADLINE_S),
+                    max_retries=LLM_MAX_RETRIES,
+                    backoff_base_s=LLM_BACKOFF_BASE_S,
+                    backoff_max_s=LLM_BACKOFF_MAX_S,
+                    hedge=LLM_HEDGE,
+                    hedge_min_samples=LLM_HEDGE_MIN_SAMPLES,
+                    window=LLM_LATENCY_WINDOW,
+                )
+    return p
+
+
+def policy_stats() -> Dict[str, dict]:
+    return {stage: p.stats() for stage, p in list(_policies.items())}
@@ -0,0 +1,299 @@
+import re
+import time
+import bisect
+import threading
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from .config import FAST_PATH_THRESHOLD
+from .schemas import Ticket, Classification
+from .tracing import span
+
+# -------------------------
+# Rule table
+# -------------------------
+# (category, pattern, weight). The weight is a hand-set guess of how specific the
+# pattern is to its category. Matches are combined per category with noisy-OR
+# (1 - prod(1 - w)), hits in short_description count fully and hits only in description
+# count at DESCRIPTION_FACTOR. That raw score only ranks guesses; CALIBRATION below maps
+# it to the precision measured on labelled tickets.
+RULES: List[Tuple[str, str, float]] = [
+    ("VPN", r"\bvpn\b", 0.85),
+    ("VPN", r"\b(?:error|err)\s*(?:code\s*)?(?:809|800|691|720|789)\b", 0.7),
+    ("VPN", r"\b(?:anyconnect|globalprotect|forticlient|pulse secure)\b", 0.8),
+
+    ("Email/Outlook", r"\boutlook\b", 0.85),
+    ("Email/Outlook", r"\b(?:e-?mail|mailbox|inbox)\b", 0.6),
+    ("Email/Outlook", r"\.(?:ost|pst)\b|\bexchange\b", 0.6),
+
+    ("Access/AD", r"\b(?:password|account)\b.*\b(?:reset|locked|expired|unlock)\b", 0.8),
+    ("Access/AD", r"\b(?:locked out|lockout|active directory|mfa|login|log in|sign[- ]in)\b", 0.6),
+
+    ("Network", r"\b(?:wi-?fi|wireless|lan|ethernet|dns|dhcp|proxy)\b", 0.7),
+    ("Network", r"\b(?:no internet|network (?:down|issue|slow)|packet loss)\b", 0.75),
+
+    ("Laptop/Device", r"\b(?:laptop|desktop|keyboard|monitor|docking station|battery)\b", 0.55),
+    ("Laptop/Device", r"\b(?:blue screen|bsod|won'?t boot|not booting|overheat\w*)\b", 0.75),
+
+    ("Storage/Disk", r"\b(?:low disk|disk space|disk full|drive (?:is )?full|out of space)\b", 0.9),
+    ("Storage/Disk", r"\b[a-z]:\s*drive\b|\b(?:storage|onedrive quota)\b", 0.6),
+
+    ("Application", r"\b(?:sap|teams|excel|word|chrome|citrix|servicenow)\b", 0.5),
+    ("Application", r"\b(?:application|app)\s+(?:crash\w*|error|not (?:opening|responding|loading))\b", 0.6),
+]
+
+DESCRIPTION_FACTOR = 0.7
+
+# Wide outages ("VPN down for entire site"): the impact/urgency matrix only reads the
+# structured fields, so these tickets go to the model, which can judge priority from the text.
+OUTAGE = re.compile(
+    r"\b(?:outage|site[- ]wide|(?:entire|whole) (?:site|office|building|floor|company|team)"
+    r"|(?:for|affecting) (?:everyone|everybody|all users|all staff)|(?:nobody|no one) can)\b",
+    re.IGNORECASE,
+)
+
+ASSIGNMENT_GROUPS: Dict[str, str] = {
+    "VPN": "CIS-VPN-Support",
+    "Email/Outlook": "CIS-EUC-Support",
+    "Laptop/Device": "CIS-EUC-Support",
+    "Storage/Disk": "CIS-EUC-Support",
+    "Network": "CIS-Network-Ops",
+    "Access/AD": "CIS-Access-Management",
+    "Application": "CIS-App-Support",
+    "Other": "CIS-EUC-Support",
+}
+
+_COMPILED = [(cat, re.compile(pat, re.IGNORECASE), w) for cat, pat, w in RULES]
+
+# (lowest raw score, precision): isotonic fit of "rule guess was right" against the raw
+# score on samples/labelled/tickets.jsonl. Regenerate with benchmarks/calibrate_rules.py
+# whenever RULES or the samples change (test_rules checks it is current).
+CALIBRATION: List[Tuple[float, float]] = [(0.385, 0.706), (0.5, 0.868), (0.796, 0.97)]
+
+
+def _level(value: Optional[str]) -> int:
+    """Map free-text impact/urgency to 1 (high) .. 3 (low)."""
+    x = (value or "").strip().lower()
+    if x[:1] in ("1", "2", "3"):  # ServiceNow style: "1 - High"
+        return int(x[0])
+    if any(k in x for k in ("high", "critical", "enterprise", "site", "multiple", "all users")):
+        return 1
+    if any(k in x for k in ("medium", "moderate", "department", "team")):
+        return 2
+    return 3
+
+
+def priority_for(ticket: Ticket) -> str:
+    """ServiceNow-style impact x urgency matrix (P3 when neither is given)."""
+    score = _level(ticket.impact) + _level(ticket.urgency)
+    return {2: "P1", 3: "P2", 4: "P3"}.get(score, "P4") if ticket.impact or ticket.urgency else "P3"
+
+
+def score_ticket(ticket: Ticket) -> Dict[str, Tuple[float, List[str]]]:
+    """Per-category (noisy-OR confidence, matched patterns)."""
+    short = ticket.short_description or ""
+    desc = ticket.description or ""
+    misses: Dict[str, float] = {}
+    matched: Dict[str, List[str]] = {}
+    for cat, rx, w in _COMPILED:
+        if rx.search(short):
+            weight = w
+        elif rx.search(desc):
+            weight = w * DESCRIPTION_FACTOR
+        else:
+            continue
+        misses[cat] = misses.get(cat, 1.0) * (1.0 - weight)
+        matched.setdefault(cat, []).append(rx.pattern)
+    return {cat: (1.0 - miss, matched[cat]) for cat, miss in misses.items()}
+
+
+def raw_score(scores: Dict[str, Tuple[float, List[str]]]) -> Tuple[str, float, List[str]]:
+    """
+    (category, raw score, patterns) of the best guess: the winning category's noisy-OR
+    score, discounted by the runner-up in proportion to the winner's own uncertainty
+    ("low disk space on laptop" stays high, two middling categories do not).
+    """
+    ranked = sorted(scores.items(), key=lambda kv: kv[1][0], reverse=True)
+    category, (best, patterns) = ranked[0]
+    runner_up = ranked[1][1][0] if len(ranked) > 1 else 0.0
+    return category, best * (1.0 - runner_up * (1.0 - best)), patterns
+
+
+def calibrated(raw: float, table: Optional[List[Tuple[float, float]]] = None) -> float:
+    """Precision for a raw score: the step of `table` (default CALIBRATION) it falls in."""
+    table = CALIBRATION if table is None else table
+    if not table:
+        return round(raw, 3)
+    i = bisect.bisect_right([lo for lo, _ in table], raw) - 1
+    return table[max(i, 0)][1]
+
+
+def _pool(blocks: List[List[float]], value: Callable[[List[float]], float]) -> List[List[float]]:
+    # pool adjacent violators: merge neighbours until `value` strictly increases
+    out: List[List[float]] = []
+    for block in blocks:
+        out.append(list(block))
+        while len(out) > 1 and value(out[-2]) >= value(out[-1]):
+            _, right, n = out.pop()
+            out[-1][1] += right
+            out[-1][2] += n
+    return out
+
+
+def fit_calibration(samples: List[Tuple[float, bool]]) -> List[Tuple[float, float]]:
+    """
+    Isotonic fit of "rule guess was right" against raw score: pool adjacent violators
+    on the observed precision, then each step reports (lowest raw score, (right + 1) /
+    (n + 2)); the add-one prior keeps small steps away from 0 and 1 (steps it would
+    make non-increasing are pooled too). Samples with equal scores share a step.
+    """
+    blocks: List[List[float]] = []  # [lowest raw, right, n]
+    for raw, right in sorted((round(r, 3), ok) for r, ok in samples):
+        if blocks and blocks[-1][0] == raw:
+            blocks[-1][1] += right
+            blocks[-1][2] += 1
+        else:
+            blocks.append([raw, float(right), 1.0])
+    blocks = _pool(blocks, lambda b: b[1] / b[2])
+    blocks = _pool(blocks, lambda b: (b[1] + 1) / (b[2] + 2))
+    return [(lo, round((right + 1) / (n + 2), 3)) for lo, right, n in blocks]
+
+
+def calibration_samples(labelled: Iterable[dict]) -> List[Tuple[float, bool]]:
+    """(raw score, rule guess == "category") for every labelled ticket some rule matches."""
+    samples = []
+    for row in labelled:
+        scores = score_ticket(Ticket(**row))
+        if scores:
+            category, raw, _ = raw_score(scores)
+            samples.append((raw, category == row["category"]))
+    return samples
+
+
+def fast_classify(ticket: Ticket) -> Optional[Classification]:
+    """
+    Rule-based classification, or None if no rule matches. Confidence is the calibrated
+    precision of the raw score (see `raw_score`, CALIBRATION).
+    """
+    scores = score_ticket(ticket)
+    if not scores:
+        return None
+    category, raw, patterns = raw_score(scores)
+    return Classification(
+        category=category,
+        priority=priority_for(ticket),
+        assignment_group=ASSIGNMENT_GROUPS[category],
+        confidence=calibrated(raw),
+        reason=f"Rule fast-path: matched {len(patterns)} {category} pattern(s)",
+    )
+
+
+# -------------------------
+# Fast path in front of the LLM classifier
+# -------------------------
+class FastPathStats:
+    """Hit rate and estimated latency saved (hits x mean LLM classify latency)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.rule_ms = 0.0
+        self.llm_ms = 0.0
+
+    def reset(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            self.rule_ms = 0.0
+            self.llm_ms = 0.0
+
+    def record(self, hit: bool, rule_ms: float):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+            self.rule_ms += rule_ms
+
+    def record_llm(self, llm_ms: float):
+        with self._lock:
+            self.llm_ms += llm_ms
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            mean_llm = self.llm_ms / self.misses if self.misses else 0.0
+            mean_rule = self.rule_ms / total if total else 0.0
+            return {
+                "threshold": FAST_PATH_THRESHOLD,
+                "tickets": total,
+                "hits": self.hits,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+                "mean_rule_ms": round(mean_rule, 3),
+                "mean_llm_classify_ms": round(mean_llm, 1),
+                "latency_saved_ms": round(self.hits * max(0.0, mean_llm - mean_rule), 1),
+            }
+
+
+STATS = FastPathStats()
+
+
+def try_fast_path(
+    ticket: Ticket,
+    threshold: Optional[float] = None,
+    stats: FastPathStats = STATS,
+) -> Optional[Classification]:
+    """Rule classification if confident enough (>= threshold) and not an OUTAGE ticket, else None."""
+    if threshold is None:
+        threshold = FAST_PATH_THRESHOLD
+    t0 = time.perf_counter()
+    text = f"{ticket.short_description or ''}\n{ticket.description or ''}"
+    guess = fast_classify(ticket) if threshold <= 1.0 and not OUTAGE.search(text) else None
+    hit = guess is not None and guess.confidence >= threshold
+    stats.record(hit, (time.perf_counter() - t0) * 1000)
+    return guess if hit else None
+
+
+def with_fast_path(
+    fallback: Callable[[Ticket], Classification],
+    threshold: Optional[float] = None,
+    stats: FastPathStats = STATS,
+) -> Callable[[Ticket], Classification]:
+    """
+    Wrap a classifier so confident rule matches skip it; everything else falls back.
+    FAST_PATH_THRESHOLD > 1 disables the fast path.
+    """
+
+    def classify(ticket: Ticket) -> Classification:
+        with span("rules.fast_path") as sp:
+            cls = try_fast_path(ticket, threshold, stats)
+            sp.set(hit=cls is not None)
+        if cls is not None:
+            return cls
+        t0 = time.perf_counter()
+        cls = fallback(ticket)
+        stats.record_llm((time.perf_counter() - t0) * 1000)
+        return cls
+
+    return classify
+
+
+def with_fast_path_async(
+    fallback: Callable[[Ticket], Awaitable[Classification]],
+    threshold: Optional[float] = None,
+    stats: FastPathStats = STATS,
+) -> Callable[[Ticket], Awaitable[Classification]]:
+    """`with_fast_path` for an async classifier (e.g. agents_direct.classify_ticket_async)."""
+
+    async def classify(ticket: Ticket) -> Classification:
+        with span("rules.fast_path") as sp:
+            cls = try_fast_path(ticket, threshold, stats)
+            sp.set(hit=cls is not None)
+        if cls is not None:
+            return cls
+        t0 = time.perf_counter()
+        cls = await fallback(ticket)
+        stats.record_llm((time.perf_counter() - t0) * 1000)
+        return cls
+
+    return classify
@@ -1,5 +1,6 @@
-from pydantic import BaseModel, Field, field_validator
-from typing import List, Optional, Literal
+from functools import lru_cache
+from pydantic import BaseModel, Field, create_model, field_validator
+from typing import List, Optional, Literal, Tuple, Type
 
 
 class Ticket(BaseModel):
@@ -85,6 +86,15 @@ class Classification(BaseModel):
         return "Other"
 
 
+class ClassifiedTicket(Classification):
+    ticket_id: str
+
+
+class ClassificationBatch(BaseModel):
+    """Response of one multi-ticket classify call (agents_direct.classify_tickets)."""
+    results: List[ClassifiedTicket]
+
+
 class Troubleshooting(BaseModel):
     probable_cause: str
     steps: List[str]
@@ -95,4 +105,17 @@ class Troubleshooting(BaseModel):
 class Communication(BaseModel):
     user_message: str
     ticket_update: str
-    close_recommendation: bool
\ No newline at end of file
+    close_recommendation: bool
+
+SECTION_MODELS = {
+    "classification": Classification,
+    "troubleshooting": Troubleshooting,
+    "communication": Communication,
+}
+
+
+@lru_cache(maxsize=None)
+def fused_schema(sections: Tuple[str, ...]) -> Type[BaseModel]:
+    """Response model of one fused request covering `sections` (orchestrator_fused)."""
+    name = "Fused" + "".join(s.title() for s in sections)
+    return create_model(name, **{s: (SECTION_MODELS[s], ...) for s in sections})
@@ -0,0 +1,137 @@
+import time
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, Tuple
+
+from .agents_direct import stream_fields
+from .config import SPECULATE_MIN_CONFIDENCE
+from .rules import fast_classify
+from .schemas import Ticket, Classification, Troubleshooting
+
+# speculative troubleshoot calls run here while the caller's thread classifies
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="speculative")
+
+
+class SpeculationStats:
+    """
+    Speculation hit rate and wall-clock effect.
+
+    saved_ms: on a hit, sequential time (classify + troubleshoot) minus the observed
+    wall time of running them side by side. wasted_ms: model time spent on discarded
+    speculative plans (misses).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            self.skipped = 0
+            self.saved_ms = 0.0
+            self.wasted_ms = 0.0
+
+    def record_hit(self, saved_ms: float):
+        with self._lock:
+            self.hits += 1
+            self.saved_ms += saved_ms
+
+    def record_miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def record_wasted(self, ms: float):
+        with self._lock:
+            self.wasted_ms += ms
+
+    def record_skip(self):
+        with self._lock:
+            self.skipped += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            attempts = self.hits + self.misses
+            return {
+                "min_confidence": SPECULATE_MIN_CONFIDENCE,
+                "attempts": attempts,
+                "hits": self.hits,
+                "misses": self.misses,
+                "skipped": self.skipped,
+                "hit_rate": round(self.hits / attempts, 3) if attempts else 0.0,
+                "wall_clock_saved_ms": round(self.saved_ms, 1),
+                "wasted_model_ms": round(self.wasted_ms, 1),
+            }
+
+
+STATS = SpeculationStats()
+
+
+def _timed(fn, *args) -> Tuple[object, float]:
+    t0 = time.perf_counter()
+    result = fn(*args)
+    return result, (time.perf_counter() - t0) * 1000
+
+
+def _muted(fn, *args) -> Tuple[object, float]:
+    # a speculative plan may be discarded: it must not stream to the caller's listener
+    with stream_fields(None):
+        return _timed(fn, *args)
+
+
+def classify_and_troubleshoot(
+    ticket: Ticket,
+    classify: Callable[[Ticket], Classification],
+    troubleshoot: Callable[[Ticket, Classification], Troubleshooting],
+    predict: Callable[[Ticket], Optional[Classification]] = fast_classify,
+    min_confidence: Optional[float] = None,
+    stats: SpeculationStats = STATS,
+    speculative: Optional[Callable[[Ticket, Classification], Troubleshooting]] = None,
+    on_hit: Optional[Callable[[Ticket, Classification, Troubleshooting], None]] = None,
+) -> Tuple[Classification, Troubleshooting]:
+    """
+    Classify and troubleshoot with the troubleshoot call started speculatively.
+
+    `predict` guesses the classification cheaply (default: the rule scorer, even below
+    the fast-path threshold). If the guess is at least `min_confidence`, troubleshooting
+    for the guessed classification starts right away, concurrently with `classify`.
+    When the real category matches the guess the speculative plan is kept; otherwise it
+    is discarded and troubleshooting reruns with the real classification.
+
+    The speculative call runs `speculative` (default: `troubleshoot`) with field
+    streaming off and must have no side effects: anything a kept plan should cause
+    (streaming it, storing it for reuse) goes in `on_hit(ticket, cls, plan)`, which runs
+    only once the guess is confirmed.
+    """
+    if min_confidence is None:
+        min_confidence = SPECULATE_MIN_CONFIDENCE
+    guess = predict(ticket)
+    if guess is None or guess.confidence < min_confidence:
+        stats.record_skip()
+        cls = classify(ticket)
+        return cls, troubleshoot(ticket, cls)
+
+    t0 = time.perf_counter()
+    spec = _executor.submit(contextvars.copy_context().run, _muted, speculative or troubleshoot, ticket, guess)
+    cls = classify(ticket)
+    classify_ms = (time.perf_counter() - t0) * 1000
+
+    if cls.category == guess.category:
+        try:
+            ts, ts_ms = spec.result()
+        except Exception:
+            ts = None
+        if ts is not None:
+            wall_ms = (time.perf_counter() - t0) * 1000
+            stats.record_hit(max(0.0, classify_ms + ts_ms - wall_ms))
+            if on_hit is not None:
+                on_hit(ticket, cls, ts)
+            return cls, ts
+
+    # mismatch (or the speculative call failed): drop it and troubleshoot for real
+    stats.record_miss()
+    if not spec.cancel():
+        spec.add_done_callback(lambda f: f.exception() is None and stats.record_wasted(f.result()[1]))
+    return cls, troubleshoot(ticket, cls)
@@ -0,0 +1,279 @@
+import os
+import json
+import time
+import inspect
+import threading
+from functools import wraps
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from .config import TRACING, TRACE_EXPORT_PATH
+
+# key under which an MCP tool result carries the server-side spans back to the client
+SPANS_KEY = "_trace_spans"
+
+
+class Span:
+    """One timed operation. `start` is wall-clock (epoch s) so spans from the MCP server
+    subprocess line up with the client's; the duration comes from perf_counter."""
+
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "service", "attrs", "start", "_t0", "duration_ms",
+                 "status", "error")
+
+    def __init__(self, trace_id: str, parent_id: Optional[str], name: str, service: str, attrs: Dict[str, Any]):
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.service = service
+        self.attrs = dict(attrs)
+        self.start = time.time()
+        self._t0 = time.perf_counter()
+        self.duration_ms = 0.0
+        self.status = "ok"
+        self.error = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "service": self.service,
+            "start": self.start,
+            "duration_ms": round(self.duration_ms, 3),
+            "status": self.status,
+            "error": self.error,
+            "attrs": self.attrs,
+        }
+
+
+class _NoopSpan:
+    """Yielded when nothing is being traced, so callers can always `sp.set(...)`."""
+
+    def set(self, **attrs):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class Trace:
+    """Finished spans of one trace (thread-safe: hedged attempts and speculative calls
+    add spans from worker threads)."""
+
+    def __init__(self, trace_id: Optional[str] = None, service: str = "itsm-agents"):
+        self.trace_id = trace_id or os.urandom(16).hex()
+        self.service = service
+        self._lock = threading.Lock()
+        self.spans: List[dict] = []
+
+    def add(self, span: Span):
+        with self._lock:
+            self.spans.append(span.to_dict())
+
+    def extend(self, spans: List[dict]):
+        with self._lock:
+            self.spans.extend(s for s in spans if s.get("trace_id") == self.trace_id)
+
+    def to_jsonl(self) -> str:
+        with self._lock:
+            return "\n".join(json.dumps(s, ensure_ascii=False, default=str) for s in self.spans)
+
+
+# (trace, current span) of the running code; copied into worker threads by
+# request_policy/speculation (contextvars.copy_context) and awaited coroutines
+_active: ContextVar[Optional[Tuple[Trace, Span]]] = ContextVar("trace_active", default=None)
+
+
+@contextmanager
+def _activate(tr: Trace, sp: Span):
+    token = _active.set((tr, sp))
+    try:
+        yield
+    except BaseException as e:
+        sp.status = "error"
+        sp.error = f"{type(e).__name__}: {e}"[:300]
+        raise
+    finally:
+        _active.reset(token)
+        sp.duration_ms = (time.perf_counter() - sp._t0) * 1000
+        tr.add(sp)
+
+
+@contextmanager
+def span(name: str, **attrs) -> Iterator[Any]:
+    """Child span of the current one; a cheap no-op outside a trace."""
+    active = _active.get()
+    if active is None:
+        yield _NOOP
+        return
+    tr, parent = active
+    sp = Span(tr.trace_id, parent.span_id, name, tr.service, attrs)
+    with _activate(tr, sp):
+        yield sp
+
+
+@contextmanager
+def trace(
+    name: str,
+    traceparent: Optional[str] = None,
+    service: str = "itsm-agents",
+    export: bool = True,
+    **attrs,
+) -> Iterator[Optional[Trace]]:
+    """
+    Root span of a new trace (yields the Trace; its spans are complete on exit and
+    appended to TRACE_EXPORT_PATH if `export`). Inside an active trace this is just a
+    child span of the current one. `traceparent` continues a remote trace instead
+    (MCP server side): spans join the caller's trace id under the caller's span.
+    Yields None when tracing is off or `traceparent` is malformed.
+    """
+    active = _active.get()
+    if active is not None:
+        with span(name, **attrs):
+            yield active[0]
+        return
+
+    parent_id = None
+    trace_id = None
+    if traceparent is not None:
+        parsed = parse_traceparent(traceparent)
+        if parsed is None:
+            yield None
+            return
+        trace_id, parent_id = parsed
+    if not TRACING:
+        yield None
+        return
+
+    tr = Trace(trace_id, service)
+    try:
+        with _activate(tr, Span(tr.trace_id, parent_id, name, service, attrs)):
+            yield tr
+    finally:
+        if export:
+            export_jsonl(tr)
+
+
+def traced_pipeline(runner: str) -> Callable:
+    """Decorator for orchestrator `run(ticket, ...)` functions (sync or async): one trace per ticket."""
+
+    def decorate(fn):
+        if inspect.iscoroutinefunction(fn):
+            @wraps(fn)
+            async def run_async(ticket, *args, **kwargs):
+                with trace("pipeline", runner=runner, ticket_id=ticket.ticket_id):
+                    return await fn(ticket, *args, **kwargs)
+
+            return run_async
+
+        @wraps(fn)
+        def run(ticket, *args, **kwargs):
+            with trace("pipeline", runner=runner, ticket_id=ticket.ticket_id):
+                return fn(ticket, *args, **kwargs)
+
+        return run
+
+    return decorate
+
+
+@contextmanager
+def attach(active: Optional[Tuple[Trace, Span]]):
+    """Re-enter a context captured with `current()` (e.g. on another event loop's thread)."""
+    token = _active.set(active)
+    try:
+        yield
+    finally:
+        _active.reset(token)
+
+
+def current() -> Optional[Tuple[Trace, Span]]:
+    return _active.get()
+
+
+# -------------------------
+# Propagation across the MCP stdio boundary (W3C traceparent in the request _meta)
+# -------------------------
+def traceparent() -> Optional[str]:
+    active = _active.get()
+    if active is None:
+        return None
+    tr, sp = active
+    return f"00-{tr.trace_id}-{sp.span_id}-01"
+
+
+def parse_traceparent(value: str) -> Optional[Tuple[str, str]]:
+    parts = value.split("-") if isinstance(value, str) else []
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        int(parts[1], 16), int(parts[2], 16)
+    except ValueError:
+        return None
+    return parts[1], parts[2]
+
+
+def merge_remote(spans: Any) -> Optional[dict]:
+    """Add spans returned by the MCP server to the current trace; returns the remote root."""
+    active = _active.get()
+    if active is None or not isinstance(spans, list):
+        return None
+    tr, sp = active
+    tr.extend([s for s in spans if isinstance(s, dict)])
+    return next((s for s in spans if isinstance(s, dict) and s.get("parent_id") == sp.span_id), None)
+
+
+# -------------------------
+# Export + timeline
+# -------------------------
+_export_lock = threading.Lock()
+
+
+def export_jsonl(tr: Trace, path: Optional[str] = None):
+    """Append one JSON line per span (one write per trace, so concurrent traces don't interleave)."""
+    path = TRACE_EXPORT_PATH if path is None else path
+    if not path or not tr.spans:
+        return
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    with _export_lock, open(path, "a", encoding="utf-8") as f:
+        f.write(tr.to_jsonl() + "\n")
+
+
+def waterfall(spans: List[dict]) -> List[dict]:
+    """
+    Spans as timeline rows in tree order (parents before children, siblings by start):
+    start_ms/end_ms are offsets from the earliest span, `depth` is the nesting level.
+    """
+    if not spans:
+        return []
+    t0 = min(s["start"] for s in spans)
+    ids = {s["span_id"] for s in spans}
+    children: Dict[Optional[str], List[dict]] = {}
+    for s in sorted(spans, key=lambda s: s["start"]):
+        parent = s["parent_id"] if s["parent_id"] in ids else None
+        children.setdefault(parent, []).append(s)
+
+    rows: List[dict] = []
+    stack = [(s, 0) for s in reversed(children.get(None, []))]
+    while stack:
+        s, depth = stack.pop()
+        start_ms = (s["start"] - t0) * 1000
+        rows.append({
+            "name": s["name"],
+            "depth": depth,
+            "service": s.get("service", ""),
+            "start_ms": round(start_ms, 1),
+            "end_ms": round(start_ms + s["duration_ms"], 1),
+            "duration_ms": round(s["duration_ms"], 1),
+            "status": s.get("status", "ok"),
+            "attrs": s.get("attrs", {}),
+        })
+        stack.extend((c, depth + 1) for c in reversed(children.get(s["span_id"], [])))
+    return rows
@@ -0,0 +1,304 @@
+import io
+import csv
+import json
+import time
+import hashlib
+import threading
+from concurrent.futures import Executor
+from typing import Any, Callable, Dict, List, Optional
+
+from .batch import run_batch
+from .config import UI_MEMO_SIZE, UI_MEMO_TTL_S
+from .llm_cache import ResponseCache
+from .schemas import Ticket
+from .tracing import trace
+
+# -------------------------
+# Background pipeline runs for the Streamlit UI (no streamlit import here).
+#
+# Streamlit reruns the whole script on every interaction, and st.* calls only work on
+# the script thread. So a run is started on a worker thread as a PipelineJob that
+# collects stage results as they arrive; the script polls job.snapshot() and draws
+# whatever is there. The job lives in st.session_state, so it survives reruns (the
+# user can click around while it runs) and finished results go into a memo keyed by
+# ticket hash, so running the same ticket again is answered without the model.
+# -------------------------
+
+STAGES = ("classification", "troubleshooting", "communication")
+
+
+def ticket_hash(ticket: Ticket, runner: str) -> str:
+    """Content address of (ticket, runner): same ticket text -> same key, whatever the key order."""
+    payload = json.dumps([runner, ticket.model_dump()], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def new_memo() -> ResponseCache:
+    """Memory-only LRU + TTL of finished UI results (UI_MEMO_SIZE, UI_MEMO_TTL_S)."""
+    return ResponseCache(max_entries=UI_MEMO_SIZE, ttl_s=UI_MEMO_TTL_S)
+
+
+class PipelineJob:
+    """
+    One pipeline run on a worker thread. `run(ticket, on_field=...)` is a runner
+    (orchestrator_direct/fused/mcp.run); its per-field and end-of-stage reports are
+    collected under a lock and read with snapshot().
+    """
+
+    def __init__(self, ticket: Ticket, runner: str, run: Callable[..., dict], key: Optional[str] = None):
+        self.ticket = ticket
+        self.runner = runner
+        self.key = key or ticket_hash(ticket, runner)
+        self._run = run
+        self._lock = threading.Lock()
+        self._stages: Dict[str, dict] = {stage: {} for stage in STAGES}
+        self._done_stages: list = []
+        self.version = 0  # bumped on every update, so the UI redraws only on change
+        self.started = time.time()
+        self.finished: Optional[float] = None
+        self.output: Optional[dict] = None
+        self.error: Optional[str] = None
+        self.trace = None
+        self.memo_hit = False
+        self.future = None
+
+    @classmethod
+    def from_memo(cls, ticket: Ticket, runner: str, key: str, output: dict) -> "PipelineJob":
+        job = cls(ticket, runner, run=None, key=key)
+        job.memo_hit = True
+        job._finish(output, None)
+        return job
+
+    def on_field(self, stage: str, key: Optional[str], value: Any):
+        if stage not in self._stages:
+            return
+        with self._lock:
+            if key is None:
+                self._stages[stage] = dict(value)
+                if stage not in self._done_stages:
+                    self._done_stages.append(stage)
+            else:
+                self._stages[stage][key] = value
+            self.version += 1
+
+    def _finish(self, output: Optional[dict], error: Optional[str]):
+        with self._lock:
+            if output is not None:
+                for stage in STAGES:
+                    if isinstance(output.get(stage), dict):
+                        self._stages[stage] = output[stage]
+                        if stage not in self._done_stages:
+                            self._done_stages.append(stage)
+            self.output = output
+            self.error = error
+            self.finished = time.time()
+            self.version += 1
+
+    def __call__(self) -> Optional[dict]:
+        output, error = None, None
+        with trace("ui.run", runner=self.runner) as run_trace:
+            self.trace = run_trace
+            try:
+                output = self._run(self.ticket, on_field=self.on_field)
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+        self._finish(output, error)
+        return output
+
+    @property
+    def done(self) -> bool:
+        return self.finished is not None
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            end = self.finished if self.finished is not None else time.time()
+            return {
+                "version": self.version,
+                "done": self.finished is not None,
+                "elapsed_s": round(0.0 if self.memo_hit else end - self.started, 2),
+                "stages": {stage: dict(data) for stage, data in self._stages.items()},
+                "done_stages": list(self._done_stages),
+                "output": self.output,
+                "error": self.error,
+                "memo_hit": self.memo_hit,
+            }
+
+
+def start_job(
+    executor: Executor,
+    ticket: Ticket,
+    runner: str,
+    run: Callable[..., dict],
+    memo: Optional[ResponseCache] = None,
+) -> PipelineJob:
+    """A finished job from `memo` if this ticket was already run, else a job submitted to `executor`."""
+    key = ticket_hash(ticket, runner)
+    if memo is not None:
+        cached = memo.get(key)
+        if cached is not None:
+            return PipelineJob.from_memo(ticket, runner, key, cached)
+
+    job = PipelineJob(ticket, runner, run, key)
+
+    def _run():
+        output = job()
+        if output is not None and memo is not None:
+            memo.put(key, output)
+        return output
+
+    job.future = executor.submit(_run)
+    return job
+
+
+# -------------------------
+# Bulk runs: an uploaded CSV/JSONL export through batch.run_batch, one table row per ticket
+# -------------------------
+BULK_COLUMNS = [
+    "row", "ticket_id", "short_description", "status", "latency_ms",
+    "category", "priority", "assignment_group", "cached", "error",
+]
+
+
+class BulkJob:
+    """
+    Many tickets through one runner with `concurrency` in flight (batch.run_batch) on a
+    background thread. Rows are validated as Ticket up front: invalid ones are marked
+    and never sent. Row status: queued -> running -> ok | error (or invalid / cancelled).
+    Tickets already in `memo` are answered from it (cached=True).
+    """
+
+    def __init__(
+        self,
+        raw_tickets: List[Any],
+        runner: str,
+        run: Callable[..., dict],
+        concurrency: int = 4,
+        memo: Optional[ResponseCache] = None,
+    ):
+        self.runner = runner
+        self.concurrency = max(1, int(concurrency))
+        self._run = run
+        self._memo = memo
+        self._lock = threading.Lock()
+        self.stop = threading.Event()
+        self.rows: List[dict] = []
+        self.results: Dict[int, dict] = {}
+        self._valid: List[tuple] = []  # (row index, raw ticket)
+        self._sent: List[int] = []  # run_batch index -> row index
+        for i, raw in enumerate(raw_tickets):
+            row = {col: None for col in BULK_COLUMNS}
+            row.update(row=i + 1, status="queued", cached=False)
+            if isinstance(raw, dict):
+                row["ticket_id"] = raw.get("ticket_id")
+                row["short_description"] = raw.get("short_description")
+            try:
+                if not isinstance(raw, dict):
+                    raise ValueError(f"ticket is not a JSON object: {str(raw)[:200]}")
+                Ticket(**raw)
+                self._valid.append((i, raw))
+            except Exception as e:
+                row["status"] = "invalid"
+                row["error"] = f"{type(e).__name__}: {e}"
+                self.results[i] = {"ticket": raw, "runner": runner, "status": "invalid", "error": row["error"]}
+            self.rows.append(row)
+        self.started = time.time()
+        self.finished: Optional[float] = None
+        self.summary: Optional[dict] = None
+        self.future = None
+
+    def _source(self):
+        for i, raw in self._valid:
+            with self._lock:
+                self._sent.append(i)
+                self.rows[i]["status"] = "running"
+            yield raw
+
+    def _run_one(self, ticket: Ticket) -> dict:
+        key = ticket_hash(ticket, self.runner)
+        if self._memo is not None:
+            cached = self._memo.get(key)
+            if cached is not None:
+                return {**cached, "cached": True}
+        out = self._run(ticket)
+        if self._memo is not None:
+            self._memo.put(key, out)
+        return out
+
+    def _on_result(self, index: int, result: dict):
+        with self._lock:
+            i = self._sent[index]
+            row = self.rows[i]
+            cls = result.get("classification") or {}
+            row.update(
+                status=result["status"],
+                latency_ms=result.get("latency_ms"),
+                category=cls.get("category"),
+                priority=cls.get("priority"),
+                assignment_group=cls.get("assignment_group"),
+                cached=bool(result.pop("cached", False)),
+                error=result.get("error"),
+            )
+            self.results[i] = result
+
+    def __call__(self) -> dict:
+        summary = run_batch(
+            self._source(), self._run_one, None, self.concurrency, self.runner,
+            on_result=self._on_result, stop=self.stop,
+        )
+        with self._lock:
+            for row in self.rows:
+                if row["status"] == "queued":
+                    row["status"] = "cancelled"
+            self.summary = summary
+            self.finished = time.time()
+        return summary
+
+    @property
+    def done(self) -> bool:
+        return self.finished is not None
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counts: Dict[str, int] = {}
+            for row in self.rows:
+                counts[row["status"]] = counts.get(row["status"], 0) + 1
+            end = self.finished if self.finished is not None else time.time()
+            return {
+                "done": self.finished is not None,
+                "stopping": self.stop.is_set() and self.finished is None,
+                "elapsed_s": round(end - self.started, 1),
+                "total": len(self.rows),
+                "counts": counts,
+                "rows": [dict(row) for row in self.rows],
+                "summary": self.summary,
+            }
+
+    def to_ndjson(self) -> str:
+        """Finished results in input order, one JSON line each (as batch.run_batch writes them)."""
+        with self._lock:
+            return "".join(json.dumps(self.results[i]) + "\n" for i in sorted(self.results))
+
+    def to_csv(self) -> str:
+        """The results table (BULK_COLUMNS) plus the user message, as CSV."""
+        buf = io.StringIO()
+        writer = csv.DictWriter(buf, fieldnames=BULK_COLUMNS + ["user_message"])
+        writer.writeheader()
+        with self._lock:
+            for i, row in enumerate(self.rows):
+                comm = self.results.get(i, {}).get("communication") or {}
+                writer.writerow({**row, "user_message": comm.get("user_message")})
+        return buf.getvalue()
+
+
+def start_bulk(
+    executor: Executor,
+    raw_tickets: List[Any],
+    runner: str,
+    run: Callable[..., dict],
+    concurrency: int = 4,
+    memo: Optional[ResponseCache] = None,
+) -> BulkJob:
+    """A BulkJob submitted to `executor` (it fans out to its own `concurrency` threads)."""
+    job = BulkJob(raw_tickets, runner, run, concurrency, memo)
+    job.future = executor.submit(job)
+    return job
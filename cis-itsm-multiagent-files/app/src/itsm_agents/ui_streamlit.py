@@ -1,10 +1,7 @@
 import json
-import time
 import os
 import sys
-import asyncio
 import shlex
-from contextlib import AsyncExitStack
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -28,11 +25,58 @@ if str(APP_SRC) not in sys.path:
 # Also set PYTHONPATH for any subprocesses and libraries that read it
 os.environ["PYTHONPATH"] = str(APP_SRC) + os.pathsep + os.environ.get("PYTHONPATH", "")
 
+from concurrent.futures import ThreadPoolExecutor
+
 import streamlit as st
 
+from itsm_agents.batch import parse_upload
+from itsm_agents.config import BATCH_CONCURRENCY, UI_WORKERS
 from itsm_agents.schemas import Ticket
 from itsm_agents.orchestrator_direct import run as run_direct
-from itsm_agents.orchestrator_mcp import run as run_mcp
+from itsm_agents.orchestrator_fused import run as run_fused
+from itsm_agents.tracing import waterfall
+from itsm_agents.ui_jobs import STAGES, new_memo, start_bulk, start_job
+
+
+# -------------------------
+# Shared resources (built once per process, not on every rerun)
+# -------------------------
+@st.cache_resource(show_spinner=False)
+def model_client():
+    """The model client (HTTP pools, response cache), shared by every session."""
+    from itsm_agents.agents_direct import client
+
+    return client()
+
+
+@st.cache_resource(show_spinner=False)
+def mcp_pool():
+    """Warm MCP stdio sessions: spawned on first use, then reused by runs and status checks."""
+    # Lazy import so UI still runs in direct mode even if MCP deps missing
+    from itsm_agents.mcp_pool import get_pool
+
+    return get_pool()
+
+
+@st.cache_resource(show_spinner=False)
+def job_executor():
+    """Background threads the pipeline runs on, so reruns never wait for the model."""
+    return ThreadPoolExecutor(max_workers=UI_WORKERS, thread_name_prefix="ui-run")
+
+
+@st.cache_resource(show_spinner=False)
+def result_memo():
+    """Finished results per ticket hash (see ui_jobs.ticket_hash)."""
+    return new_memo()
+
+
+def run_mcp(ticket, on_field=None):
+    from itsm_agents.orchestrator_mcp import run  # mcp SDK only when used
+
+    return run(ticket, on_field=on_field)
+
+
+RUNNERS = {"direct": run_direct, "fused": run_fused, "mcp": run_mcp}
 
 
 # -------------------------
@@ -55,99 +99,121 @@ def load_sample_ticket(filename: str):
 # -------------------------
 # MCP STDIO Status Helpers (Option B)
 # -------------------------
-def _run_async(coro):
-    """
-    Run async coroutine safely from Streamlit.
-    Streamlit generally runs sync code; asyncio.run() is fine.
-    Fallback is included for environments where an event loop is already running.
-    """
-    try:
-        return asyncio.run(coro)
-    except RuntimeError:
-        loop = asyncio.new_event_loop()
-        try:
-            return loop.run_until_complete(coro)
-        finally:
-            loop.close()
-
-
 def check_mcp_status_stdio():
     """
     STDIO MCP status check:
-    - Spawns MCP server as a subprocess using stdio transport
-    - Initializes MCP session
-    - Lists tools
+    - Leases a warm session from the shared MCP pool (the same pool the mcp runner uses);
+      the first check spawns the pool's servers, later checks reuse them
+    - Lists tools over that initialized session
     This matches MCP stdio transport expectations (client launches server subprocess). [1](https://modelcontextprotocol.io/specification/2025-06-18/basic/transports)
     The Python SDK flow is stdio_client -> ClientSession -> initialize() -> list_tools(). [2](https://deepwiki.com/modelcontextprotocol/docs/5.1-python-sdk)
 
     Configurable via .env:
       MCP_SERVER_COMMAND=python
       MCP_SERVER_ARGS=-m itsm_agents.mcp_server
+      MCP_POOL_SIZE=2
     """
     cmd = os.getenv("MCP_SERVER_COMMAND", "python").strip()
     args_str = os.getenv("MCP_SERVER_ARGS", "-m itsm_agents.mcp_server").strip()
     args = shlex.split(args_str)
 
-    async def _probe():
-        try:
-            # Lazy imports so UI still runs in direct mode even if MCP deps missing
-            from mcp import ClientSession, StdioServerParameters
-            from mcp.client.stdio import stdio_client
-        except Exception as e:
-            return {
-                "ok": False,
-                "mode": "stdio",
-                "message": f"Missing MCP client dependencies in UI runtime: {e}",
-                "details": {"hint": "Install MCP SDK in this environment: pip install mcp"},
-            }
-
-        exit_stack = AsyncExitStack()
-        try:
-            env = os.environ.copy()
-            # Ensure spawned MCP server can import from app/src
-            env["PYTHONPATH"] = str(APP_SRC) + os.pathsep + env.get("PYTHONPATH", "")
-
-            server_params = StdioServerParameters(command=cmd, args=args, env=env)
-
-
-            # Connect via stdio (client spawns server subprocess) [1](https://modelcontextprotocol.io/specification/2025-06-18/basic/transports)
-            stdio_transport = await exit_stack.enter_async_context(stdio_client(server_params))
-            stdio, write = stdio_transport
-
-            session = await exit_stack.enter_async_context(ClientSession(stdio, write))
-
-            # MCP handshake [2](https://deepwiki.com/modelcontextprotocol/docs/5.1-python-sdk)
-            await session.initialize()
-
-            # Probe tools list [2](https://deepwiki.com/modelcontextprotocol/docs/5.1-python-sdk)
-            tools_resp = await session.list_tools()
-            tool_names = [t.name for t in tools_resp.tools]
-
-            return {
-                "ok": True,
-                "mode": "stdio",
-                "message": (
-                    "MCP STDIO server initialized successfully.\n"
-                    f"Tools: {', '.join(tool_names) if tool_names else '(none)'}"
-                ),
-                "details": {
-                    "command": cmd,
-                    "args": args,
-                    "tool_count": len(tool_names),
-                    "tools": tool_names,
-                },
-            }
-        except Exception as e:
-            return {
-                "ok": False,
-                "mode": "stdio",
-                "message": f"Failed to initialize MCP STDIO server: {e}",
-                "details": {"command": cmd, "args": args},
-            }
-        finally:
-            await exit_stack.aclose()
+    try:
+        import mcp  # noqa: F401
+    except Exception as e:
+        return {
+            "ok": False,
+            "mode": "stdio",
+            "message": f"Missing MCP client dependencies in UI runtime: {e}",
+            "details": {"hint": "Install MCP SDK in this environment: pip install mcp"},
+        }
+
+    pool = None
+    try:
+        pool = mcp_pool()
+
+        async def _list_tools(cli):
+            return await cli.list_tools()
+
+        tool_names = pool.call(_list_tools)
+        # with MCP_SERVER_URL the pool holds HTTP sessions to a shared server instead
+        mode = "stdio" if not pool.url else "streamable-http"
+
+        return {
+            "ok": True,
+            "mode": mode,
+            "message": (
+                ("MCP STDIO server initialized successfully.\n" if not pool.url
+                 else f"Connected to shared MCP server at {pool.url}.\n")
+                + f"Tools: {', '.join(tool_names) if tool_names else '(none)'}"
+            ),
+            "details": {
+                "command": cmd if not pool.url else None,
+                "args": args if not pool.url else None,
+                "url": pool.url or None,
+                "tool_count": len(tool_names),
+                "tools": tool_names,
+                "pool": pool.stats(),
+            },
+        }
+    except Exception as e:
+        return {
+            "ok": False,
+            "mode": "stdio",
+            "message": f"Failed to initialize MCP STDIO server: {e}",
+            "details": {"command": cmd, "args": args, "pool": pool.stats() if pool else None},
+        }
+
+
+def render_timeline(run_trace):
+    """Waterfall of the run's spans (client + MCP server), plus the raw spans as JSONL."""
+    if run_trace is None:
+        st.info("Tracing is off (set TRACING=true in .env).")
+        return
+    rows = waterfall(run_trace.spans)
+    if not rows:
+        st.info("No spans recorded for this run.")
+        return
+
+    import altair as alt
+
+    # one bar per span, indented by depth; order kept by a zero-padded row number
+    chart_rows = [
+        {
+            "span": f"{i:03d} {'· ' * r['depth']}{r['name']}",
+            "service": r["service"],
+            "start_ms": r["start_ms"],
+            "end_ms": r["end_ms"],
+            "duration_ms": r["duration_ms"],
+            "status": r["status"],
+        }
+        for i, r in enumerate(rows)
+    ]
+    chart = (
+        alt.Chart(alt.Data(values=chart_rows))
+        .mark_bar()
+        .encode(
+            x=alt.X("start_ms:Q", title="ms since start"),
+            x2="end_ms:Q",
+            y=alt.Y("span:N", sort=None, title=None, axis=alt.Axis(labelLimit=400)),
+            color=alt.Color("service:N"),
+            tooltip=["span:N", "service:N", "duration_ms:Q", "status:N"],
+        )
+        .properties(height=max(120, 22 * len(chart_rows)))
+    )
+    st.altair_chart(chart, use_container_width=True)
 
-    return _run_async(_probe())
+    st.dataframe(
+        [{**r, "attrs": json.dumps(r["attrs"])} for r in rows],
+        use_container_width=True,
+        hide_index=True,
+    )
+    st.download_button(
+        "⬇ Download trace (JSONL)",
+        data=run_trace.to_jsonl(),
+        file_name=f"trace_{run_trace.trace_id}.jsonl",
+        mime="application/x-ndjson",
+        use_container_width=True,
+    )
 
 
 # -------------------------
@@ -229,15 +295,19 @@ st.sidebar.header("⚙️ Demo Controls")
 
 runner = st.sidebar.radio(
     "Runner Mode",
-    ["direct", "mcp"],
+    ["direct", "fused", "mcp"],
     index=0,
-    help="direct = fastest. mcp = agentified tools via MCP (stdio)."
+    help=(
+        "direct = three agents, one model call each. "
+        "fused = all three stages in one model call (lowest latency). "
+        "mcp = agentified tools via MCP (stdio)."
+    )
 )
 
 # --- MCP Status Button UI (STDIO) ---
 st.sidebar.markdown("### 🧩 MCP Server (STDIO)")
 st.sidebar.caption(
-    "This MCP server uses STDIO transport (no host/port). The status check spawns the server and runs initialize + list_tools."  # [1](https://modelcontextprotocol.io/specification/2025-06-18/basic/transports)[2](https://deepwiki.com/modelcontextprotocol/docs/5.1-python-sdk)
+    "This MCP server uses STDIO transport (no host/port). The status check leases a warm session from the shared server pool and runs list_tools."  # [1](https://modelcontextprotocol.io/specification/2025-06-18/basic/transports)[2](https://deepwiki.com/modelcontextprotocol/docs/5.1-python-sdk)
 )
 
 colA, colB = st.sidebar.columns([1, 1])
@@ -271,6 +341,12 @@ sample = st.sidebar.selectbox(
     ["Custom", "VPN Error 809", "Outlook not opening", "Low disk space"]
 )
 
+reuse_results = st.sidebar.checkbox(
+    "Reuse results for identical tickets",
+    value=True,
+    help="A ticket already run with the same runner is answered from memory instead of the model.",
+)
+
 st.sidebar.markdown("---")
 st.sidebar.caption(
     "Tip: For STDIO MCP, you typically do NOT start the MCP server manually. The client/orchestrator spawns it as a subprocess."  # [1](https://modelcontextprotocol.io/specification/2025-06-18/basic/transports)
@@ -343,13 +419,115 @@ with left:
             "- Download output JSON"
         )
 
+MCP_HELP = (
+    "✅ STDIO MCP Fix:\n"
+    "1) Do NOT run `python -m itsm_agents.mcp_server` manually (stdio expects a client to spawn it)\n"
+    "2) Click **Check MCP Status** in the sidebar (it spawns + initializes the server)\n"
+    "3) Ensure MCP SDK is installed in this venv: `pip install mcp`\n"
+    "4) Ensure your .env has:\n\n"
+    "   MCP_SERVER_COMMAND=python\n"
+    "   MCP_SERVER_ARGS=-m itsm_agents.mcp_server\n"
+)
+
+
+def render_communication(ph, comm):
+    with ph.container():
+        st.success("User message (send to user)")
+        st.write(comm.get("user_message", ""))
+
+        st.info("Ticket work notes (paste into ServiceNow)")
+        st.write(comm.get("ticket_update", ""))
+
+        st.write("Close recommendation:", comm.get("close_recommendation", False))
+
+
+def draw_job(job, snap):
+    """Draws one snapshot of a PipelineJob: stage tabs so far, and the full output once done."""
+    c1, c2, c3 = st.columns(3)
+    c1.metric("Runner", job.runner)
+    c2.metric("Time (sec)", snap["elapsed_s"] if snap["done"] else f"{snap['elapsed_s']:.1f}…")
+    status = st.empty()
+
+    if snap["done"] and snap["error"]:
+        c3.metric("Category", "N/A")
+        if job.runner == "mcp":
+            st.error("MCP runner failed to connect or execute tools.")
+            st.info(MCP_HELP)
+        st.error(f"Error details: {snap['error']}")
+        return
+
+    out = snap["output"] if snap["done"] else None
+    c3.metric("Category", (out or snap["stages"])["classification"].get("category") or "…")
+    if out is None:
+        status.caption(f"Running agents… {len(snap['done_stages'])}/{len(STAGES)} stages done")
+    else:
+        status.caption(
+            f"♻️ Same ticket already run: result reused (ticket hash {job.key[:12]})"
+            if snap["memo_hit"] else f"Done in {snap['elapsed_s']} s"
+        )
+
+    st.markdown("<hr/>", unsafe_allow_html=True)
+
+    tabs = st.tabs(["✅ Classification", "🛠 Troubleshooting", "💬 Communication", "🧾 Full JSON", "⏱ Timeline"])
+    for tab, stage in zip(tabs, STAGES):
+        data = snap["stages"][stage]
+        if not data and stage not in snap["done_stages"]:
+            tab.info("⏳ Waiting for the previous stage…")
+        elif stage == "communication":
+            render_communication(tab, data)
+        else:
+            tab.json(data)
+    if out is None:
+        return
+
+    with tabs[3]:
+        st.json(out)
+
+    with tabs[4]:
+        if snap["memo_hit"]:
+            st.info("Result came from the memo; no spans were recorded for this run.")
+        else:
+            render_timeline(job.trace)
+
+    st.download_button(
+        "⬇ Download full output JSON",
+        data=json.dumps(out, indent=2),
+        file_name="itsm_multiagent_output.json",
+        mime="application/json",
+        use_container_width=True
+    )
+
+
+@st.fragment(run_every=0.25)
+def render_job_live():
+    """
+    Live view of the session's running PipelineJob. Only this fragment reruns (every
+    250 ms), so the rest of the page stays interactive while each stage tab fills in
+    field by field; when the job finishes, one full rerun draws the final result.
+    """
+    job = st.session_state.get("job")
+    if job is None:
+        return
+    snap = job.snapshot()
+    if snap["done"]:
+        st.rerun()
+    draw_job(job, snap)
+
+
+def render_job(job):
+    """Draws a PipelineJob: the live fragment while it runs on its worker thread, else the result."""
+    snap = job.snapshot()
+    if snap["done"]:
+        draw_job(job, snap)
+    else:
+        render_job_live()
+
+
 with right:
     st.subheader("📊 Results")
 
     if run_btn:
         try:
-            t0 = time.time()
-
             # Validate ticket JSON
             ticket = Ticket(**json.loads(ticket_json))
 
@@ -360,75 +538,164 @@ with right:
                 else:
                     if not st.session_state.mcp_status.get("ok"):
                         st.warning("MCP status is OFFLINE (per last check). Run may fail.")
+                mcp_pool()
+            else:
+                model_client()
 
-            with st.spinner("Running agents..."):
-                if runner == "direct":
-                    out = run_direct(ticket)
-                else:
-                    out = run_mcp(ticket)
+            st.session_state.job = start_job(
+                job_executor(), ticket, runner, RUNNERS[runner], result_memo() if reuse_results else None
+            )
+        except Exception as e:
+            if runner == "mcp":
+                st.error("MCP runner failed to connect or execute tools.")
+                st.info(MCP_HELP)
+            st.error(f"Error details: {e}")
+            st.stop()
 
-            dt = round(time.time() - t0, 2)
+    if "job" in st.session_state:
+        render_job(st.session_state.job)
 
-            # KPIs
-            c1, c2, c3 = st.columns(3)
-            c1.metric("Runner", out.get("runner", runner))
-            c2.metric("Time (sec)", dt)
 
-            category = "N/A"
-            try:
-                category = out["classification"]["category"]
-            except Exception:
-                pass
+# -------------------------
+# Bulk Upload (CSV / JSONL export)
+# -------------------------
+STATUS_ICON = {
+    "queued": "⏳ queued", "running": "🔄 running", "ok": "✅ ok",
+    "error": "❌ error", "invalid": "⚠️ invalid", "cancelled": "⏹ cancelled",
+}
 
-            c3.metric("Category", category)
 
-            st.markdown("<hr/>", unsafe_allow_html=True)
+def bulk_downloads(job):
+    """(NDJSON, CSV) of a finished BulkJob, built once per job and kept in the session."""
+    cached = st.session_state.get("bulk_downloads")
+    if cached is None or cached[0] is not job:
+        cached = (job, job.to_ndjson(), job.to_csv())
+        st.session_state.bulk_downloads = cached
+    return cached[1], cached[2]
+
+
+def draw_bulk(job, snap):
+    counts = snap["counts"]
+    finished = sum(counts.get(k, 0) for k in ("ok", "error", "invalid", "cancelled"))
+
+    st.progress(finished / max(snap["total"], 1), text=(
+        f"{finished}/{snap['total']} done · {counts.get('running', 0)} running · "
+        f"{counts.get('ok', 0)} ok · {counts.get('error', 0)} failed · "
+        f"{counts.get('invalid', 0)} invalid · {snap['elapsed_s']} s"
+        + (" · stopping…" if snap["stopping"] else "")
+    ))
+
+    f1, f2, f3 = st.columns([2, 1, 1])
+    shown = f1.multiselect("Status", list(STATUS_ICON), default=[], placeholder="All statuses", key="bulk_status")
+    page_size = f2.selectbox("Rows per page", [25, 50, 100, 250], index=1, key="bulk_page_size")
+    rows = [r for r in snap["rows"] if not shown or r["status"] in shown]
+    pages = max(1, -(-len(rows) // page_size))
+    page = f3.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, key="bulk_page")
+    page = min(page, pages)
+
+    st.dataframe(
+        [{**r, "status": STATUS_ICON.get(r["status"], r["status"])}
+         for r in rows[(page - 1) * page_size: page * page_size]],
+        use_container_width=True,
+        hide_index=True,
+        column_config={"latency_ms": st.column_config.NumberColumn("latency (ms)", format="%.0f")},
+    )
 
-            tab1, tab2, tab3, tab4 = st.tabs(
-                ["✅ Classification", "🛠 Troubleshooting", "💬 Communication", "🧾 Full JSON"]
+    if snap["done"]:
+        if snap["summary"]:
+            lat = snap["summary"]["latency_ms"]
+            st.caption(
+                f"Throughput {snap['summary']['throughput_tps']} tickets/s · "
+                f"latency p50 {lat['p50']} ms · p95 {lat['p95']} ms"
             )
+        ndjson, csv_text = bulk_downloads(job)
+        d1, d2 = st.columns(2)
+        d1.download_button(
+            "⬇ Download results (NDJSON)",
+            data=ndjson,
+            file_name="itsm_bulk_results.ndjson",
+            mime="application/x-ndjson",
+            use_container_width=True,
+        )
+        d2.download_button(
+            "⬇ Download table (CSV)",
+            data=csv_text,
+            file_name="itsm_bulk_results.csv",
+            mime="text/csv",
+            use_container_width=True,
+        )
+    elif st.button("⏹ Stop after the tickets in flight", key="bulk_stop"):
+        job.stop.set()
 
-            with tab1:
-                st.json(out.get("classification", {}))
-
-            with tab2:
-                st.json(out.get("troubleshooting", {}))
-
-            with tab3:
-                comm = out.get("communication", {})
-                st.success("User message (send to user)")
-                st.write(comm.get("user_message", ""))
-
-                st.info("Ticket work notes (paste into ServiceNow)")
-                st.write(comm.get("ticket_update", ""))
 
-                st.write("Close recommendation:", comm.get("close_recommendation", False))
+@st.fragment(run_every=1.0)
+def render_bulk_live():
+    """
+    Live view of the session's running BulkJob. Only this fragment reruns (once a
+    second), reading job.snapshot(); the tickets are processed on background threads.
+    When the job finishes, one full rerun draws the final view outside the fragment,
+    so the polling stops.
+    """
+    job = st.session_state.get("bulk_job")
+    if job is None:
+        return
+    snap = job.snapshot()
+    if snap["done"]:
+        st.rerun()
+    draw_bulk(job, snap)
+
+
+def render_bulk():
+    """Draws the session's BulkJob: the live fragment while it runs, else the finished view."""
+    job = st.session_state.get("bulk_job")
+    if job is None:
+        return
+    snap = job.snapshot()
+    if snap["done"]:
+        draw_bulk(job, snap)
+    else:
+        render_bulk_live()
 
-            with tab4:
-                st.json(out)
 
-            st.download_button(
-                "⬇ Download full output JSON",
-                data=json.dumps(out, indent=2),
-                file_name="itsm_multiagent_output.json",
-                mime="application/json",
-                use_container_width=True
-            )
+st.markdown("---")
+st.subheader("📦 Bulk Upload")
+st.markdown(
+    "<div class='small-note'>CSV (columns named like the ticket fields: ticket_id, short_description, "
+    "description, caller, impact, urgency) or JSONL/JSON export. Runs with the runner selected in the sidebar.</div>",
+    unsafe_allow_html=True
+)
 
+b1, b2 = st.columns([3, 1])
+with b1:
+    upload = st.file_uploader("Ticket export", type=["csv", "jsonl", "ndjson", "json"], key="bulk_upload")
+with b2:
+    bulk_concurrency = st.number_input("Tickets in flight", min_value=1, max_value=64, value=BATCH_CONCURRENCY)
+    bulk_btn = st.button("🚀 Process all", use_container_width=True, disabled=upload is None)
+
+if bulk_btn and upload is not None:
+    running = st.session_state.get("bulk_job")
+    if running is not None and not running.done:
+        st.warning("A bulk run is still in progress; stop it first.")
+    else:
+        try:
+            raw_tickets = parse_upload(upload.name, upload.getvalue())
         except Exception as e:
+            st.error(f"Could not read {upload.name}: {e}")
+            raw_tickets = []
+        if raw_tickets:
             if runner == "mcp":
-                st.error("MCP runner failed to connect or execute tools.")
-                st.info(
-                    "✅ STDIO MCP Fix:\n"
-                    "1) Do NOT run `python -m itsm_agents.mcp_server` manually (stdio expects a client to spawn it)\n"
-                    "2) Click **Check MCP Status** in the sidebar (it spawns + initializes the server)\n"
-                    "3) Ensure MCP SDK is installed in this venv: `pip install mcp`\n"
-                    "4) Ensure your .env has:\n\n"
-                    "   MCP_SERVER_COMMAND=python\n"
-                    "   MCP_SERVER_ARGS=-m itsm_agents.mcp_server\n"
-                )
-            st.error(f"Error details: {e}")
-            st.stop()
+                mcp_pool()
+            else:
+                model_client()
+            st.session_state.bulk_job = start_bulk(
+                job_executor(), raw_tickets, runner, RUNNERS[runner], int(bulk_concurrency),
+                result_memo() if reuse_results else None,
+            )
+            st.session_state.bulk_page = 1
+        elif upload is not None:
+            st.warning(f"No tickets found in {upload.name}.")
+
+render_bulk()
 
 
 st.markdown("---")
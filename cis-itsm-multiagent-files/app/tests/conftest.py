@@ -0,0 +1,27 @@
+from app.src.itsm_agents.fake_llm import FakeGeminiClient
+from app.src.itsm_agents.schemas import Classification, Ticket
+
+# Shared builders; test modules import them (from app.tests.conftest import ...).
+
+
+def raw_ticket(short: str = "VPN down", desc: str = "Error 809", tid: str = "INC1", **fields) -> dict:
+    """A ticket as it appears in an export (plain dict)."""
+    return {"ticket_id": tid, "short_description": short, "description": desc, **fields}
+
+
+def make_ticket(short: str, desc: str = "", tid: str = "INC1", **fields) -> Ticket:
+    return Ticket(**raw_ticket(short, desc, tid, **fields))
+
+
+def make_cls(category: str = "VPN", confidence: float = 0.9, **fields) -> Classification:
+    return Classification(**{
+        "category": category, "priority": "P3", "assignment_group": "g",
+        "confidence": confidence, "reason": "r", **fields,
+    })
+
+
+def fake_client(answer=None, latency="const:0", **kwargs) -> FakeGeminiClient:
+    """FakeGeminiClient for unit tests: no latency, no rate limiter; `answer(stage, user, schema)`."""
+    if answer is not None:
+        kwargs["answer"] = answer
+    return FakeGeminiClient(latency=latency, error_rate=0.0, seed=0, rpm=0, limiter=None, **kwargs)
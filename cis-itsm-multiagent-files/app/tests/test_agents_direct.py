@@ -0,0 +1,29 @@
+from app.src.itsm_agents import agents_direct
+from app.tests.conftest import fake_client, make_cls, make_ticket
+
+
+def _row(tid, category="VPN"):
+    return {**make_cls(category).model_dump(), "ticket_id": tid}
+
+
+def test_classify_tickets_retries_only_failed_elements(monkeypatch):
+    prompts = []
+
+    def answer(stage, user, schema):
+        # batch prompts get a results array in which INC2 is invalid; single prompts succeed
+        prompts.append(user)
+        if stage == "classification_batch":
+            return {"results": [_row("INC1"), {**_row("INC2"), "priority": "urgent"}, _row("INC3")]}
+        return make_cls("Network").model_dump()
+
+    monkeypatch.setattr(agents_direct, "_client", fake_client(answer))
+    tickets = [make_ticket("s", "d", tid=f"INC{i}") for i in (1, 2, 3)]
+
+    stats = {}
+    out = agents_direct.classify_tickets(tickets, stats)
+
+    assert sorted(out) == ["INC1", "INC2", "INC3"]
+    assert out["INC1"].category == "VPN"
+    assert out["INC2"].category == "Network"  # from the single-ticket retry
+    assert stats["calls"] == 2
+    assert "INC2" in prompts[1] and "INC1" not in prompts[1]
@@ -0,0 +1,81 @@
+import io
+import json
+import time
+import threading
+
+from app.src.itsm_agents.batch import iter_tickets, parse_upload, run_batch, ClassifyBatcher
+from app.tests.conftest import make_cls, raw_ticket
+
+
+def test_iter_tickets_reads_directory_and_jsonl(tmp_path):
+    (tmp_path / "a.json").write_text(json.dumps(raw_ticket(tid="INC1")), encoding="utf-8")
+    (tmp_path / "b.jsonl").write_text(
+        json.dumps(raw_ticket(tid="INC2")) + "\n\n" + json.dumps(raw_ticket(tid="INC3")) + "\n", encoding="utf-8"
+    )
+    (tmp_path / "notes.txt").write_text("ignored", encoding="utf-8")
+
+    ids = [t["ticket_id"] for t in iter_tickets(str(tmp_path))]
+    assert ids == ["INC1", "INC2", "INC3"]
+
+
+def test_run_batch_bounds_in_flight_and_streams_ndjson():
+    lock = threading.Lock()
+    state = {"active": 0, "peak": 0}
+
+    def fake_run(ticket):
+        with lock:
+            state["active"] += 1
+            state["peak"] = max(state["peak"], state["active"])
+        time.sleep(0.02)
+        with lock:
+            state["active"] -= 1
+        if ticket.ticket_id == "INC3":
+            raise RuntimeError("boom")
+        return {"ticket": ticket.model_dump(), "runner": "direct"}
+
+    out = io.StringIO()
+    summary = run_batch((raw_ticket(tid=f"INC{i}") for i in range(10)), fake_run, out, concurrency=3)
+
+    lines = [json.loads(x) for x in out.getvalue().splitlines()]
+    assert len(lines) == 10
+    assert state["peak"] <= 3
+    assert summary["ok"] == 9 and summary["failed"] == 1
+    assert [x for x in lines if x["status"] == "error"][0]["ticket"]["ticket_id"] == "INC3"
+    assert summary["latency_ms"]["p50"] > 0
+
+
+def test_classify_batcher_coalesces_concurrent_calls():
+    sizes = []
+
+    def classify_many(tickets, stats):
+        sizes.append(len(tickets))
+        stats["calls"] = 1
+        return {t.ticket_id: make_cls("VPN") for t in tickets}
+
+    batcher = ClassifyBatcher(batch_size=4, max_wait_s=0.5, classify_many=classify_many)
+    out = io.StringIO()
+    run_fn = lambda t: {"classification": batcher.classify(t).model_dump()}
+    summary = run_batch((raw_ticket(tid=f"INC{i}") for i in range(8)), run_fn, out, concurrency=4)
+
+    assert summary["ok"] == 8
+    assert sizes == [4, 4]
+    assert batcher.stats()["calls_saved"] == 6
+
+
+def test_parse_upload_csv_drops_empty_cells_and_run_batch_reports_input_index():
+    data = "\ufeffticket_id,short_description,description,caller\nINC1,VPN down,Error 809,\nINC2,Mail,Outlook hangs,Ann\n"
+    raw = parse_upload("export.csv", data.encode("utf-8"))
+    assert raw[0] == {"ticket_id": "INC1", "short_description": "VPN down", "description": "Error 809"}
+    assert raw[1]["caller"] == "Ann"
+
+    stop = threading.Event()
+    seen = {}
+
+    def fake_run(ticket):
+        stop.set()  # no new tickets once the first one runs
+        return {"ticket": ticket.model_dump()}
+
+    summary = run_batch((raw_ticket(tid=f"INC{i}") for i in range(10)), fake_run, None, concurrency=2,
+                        on_result=lambda i, r: seen.setdefault(i, r["ticket"]["ticket_id"]), stop=stop)
+    assert summary["tickets"] < 10
+    assert all(seen[i] == f"INC{i}" for i in seen)
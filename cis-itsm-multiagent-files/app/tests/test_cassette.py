@@ -0,0 +1,51 @@
+import time
+
+import pytest
+
+from app.src.itsm_agents import agents_direct
+from app.src.itsm_agents.cassette import CassetteMiss, RecordingClient, ReplayClient, ReplayedError, load_cassette
+from app.src.itsm_agents.fake_llm import FakeGeminiClient
+from app.src.itsm_agents.request_policy import is_transient
+from app.tests.conftest import make_ticket
+
+TICKET = make_ticket("VPN not connecting", "Error 809")
+
+
+def test_recorded_calls_replay_by_prompt_hash(tmp_path, monkeypatch):
+    path = str(tmp_path / "cassette.jsonl")
+    monkeypatch.setattr(agents_direct, "_client", RecordingClient(FakeGeminiClient(latency="const:50"), path))
+    cls = agents_direct.classify_ticket(TICKET)
+    ts = agents_direct.troubleshoot_ticket(TICKET, cls)
+    index = load_cassette(path)
+    assert len(index) == 2 and all(e[0]["latency_ms"] >= 50 for e in index.values())
+
+    replay = ReplayClient(path, timing=0.0)
+    monkeypatch.setattr(agents_direct, "_client", replay)
+    t0 = time.perf_counter()
+    assert agents_direct.classify_ticket(TICKET) == cls
+    assert agents_direct.troubleshoot_ticket(TICKET, cls) == ts
+    assert time.perf_counter() - t0 < 0.05  # timing=0: no recorded latency
+    assert replay.usage.snapshot()["classification"]["calls"] == 1
+
+    # a prompt that was never recorded is a miss, not a network call
+    with pytest.raises(CassetteMiss):
+        agents_direct.compose_response(TICKET, cls, ts)
+    assert replay.stats()["hits"] == 2 and replay.stats()["misses"] == 1
+
+
+def test_replay_scales_timing_and_reraises_recorded_errors(tmp_path):
+    path = str(tmp_path / "cassette.jsonl")
+    rec = RecordingClient(FakeGeminiClient(latency="const:100", error_rate=0.0), path)
+    rec.generate_json("sys", "ok prompt", stage="communication")
+    rec.inner.error_rate = 1.0
+    with pytest.raises(Exception):
+        rec.generate_json("sys", "failing prompt", stage="communication")
+
+    replay = ReplayClient(path, timing=0.5)
+    t0 = time.perf_counter()
+    replay.generate_json("sys", "ok prompt", stage="communication")
+    assert 0.04 < time.perf_counter() - t0 < 0.09  # half of the recorded ~100 ms
+
+    with pytest.raises(ReplayedError) as e:
+        replay.generate_json("sys", "failing prompt", stage="communication")
+    assert e.value.code == 503 and is_transient(e.value)
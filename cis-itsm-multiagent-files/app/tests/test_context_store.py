@@ -0,0 +1,43 @@
+import time
+
+from app.src.itsm_agents.context_store import ContextStore, nbytes
+
+
+def test_handles_are_session_scoped_and_lru_bounded():
+    store = ContextStore(max_entries=2, max_bytes=1000, ttl_s=0)
+    a = store.put("s1", {"ticket": "A"})
+    assert store.get("s1", a) == {"ticket": "A"}
+    assert store.get("s2", a) is None  # another session's handle
+
+    b = store.put("s1", {"ticket": "B"})
+    store.get("s1", a)  # a is now most recently used
+    store.put("s1", {"ticket": "C"})
+    assert store.get("s1", b) is None and store.get("s1", a) is not None
+
+    big = store.put("s1", {"ticket": "D" * 998})  # over max_bytes: older entries go
+    assert store.get("s1", big) is not None and store.stats()["entries"] == 1
+    assert store.stats()["evictions"] == 3
+
+
+def test_sizes_are_utf8_bytes_and_updates_count_toward_the_bound():
+    assert nbytes("é") == len('"é"'.encode("utf-8")) == 4
+
+    store = ContextStore(max_entries=10, max_bytes=100, ttl_s=0)
+    old = store.put("s", {"ticket": "A"})
+    h = store.put("s", {"ticket": "B"})
+    before = store.stats()["bytes"]
+    store.update("s", h, classification="x" * 95)  # grows h past the bound: the older entry goes
+    assert store.stats()["bytes"] == before - nbytes("A") + nbytes("x" * 95)
+    assert store.get("s", old) is None and store.get("s", h)["classification"] == "x" * 95
+
+    store.update("s", h, classification="y")  # replacing a value re-sizes it
+    assert store.stats()["bytes"] == nbytes("B") + nbytes("y")
+
+
+def test_idle_entries_expire_and_updates_add_stage_outputs():
+    store = ContextStore(ttl_s=0.05)
+    h = store.put("s", {"ticket": "A"})
+    store.update("s", h, classification="C")
+    assert store.get("s", h) == {"ticket": "A", "classification": "C"}
+    time.sleep(0.08)
+    assert store.get("s", h) is None and store.stats()["expired"] == 1
@@ -0,0 +1,49 @@
+import random
+
+import pytest
+
+from app.src.itsm_agents import agents_direct, orchestrator_fused
+from app.src.itsm_agents.fake_llm import FakeGeminiClient, FakeLLMError, LatencyModel
+from app.src.itsm_agents.request_policy import is_transient
+from app.tests.conftest import make_ticket
+
+TICKETS = [
+    make_ticket("VPN not connecting", "Error 809"),
+    make_ticket("Strange noise", "Something hums", tid="INC2"),
+]
+
+
+def test_latency_specs():
+    rng = random.Random(1)
+    assert LatencyModel("const:250").sample_ms(rng) == 250
+    assert all(100 <= LatencyModel("uniform:100:200").sample_ms(rng) <= 200 for _ in range(50))
+    samples = sorted(LatencyModel("lognormal:100:0.5").sample_ms(rng) for _ in range(2000))
+    assert 85 < samples[1000] < 115  # median
+    assert LatencyModel(lambda r: 42.0).sample_ms(rng) == 42.0
+    with pytest.raises(ValueError):
+        LatencyModel("gamma:1")
+
+
+def test_fake_answers_validate_for_every_stage(monkeypatch):
+    fake = FakeGeminiClient(latency="const:0", seed=1)
+    monkeypatch.setattr(agents_direct, "_client", fake)
+    monkeypatch.setattr(orchestrator_fused, "PLAN_REUSE_THRESHOLD", 2.0)
+
+    cls = agents_direct.classify_ticket(TICKETS[0])
+    assert cls.category == "VPN"
+    ts = agents_direct.troubleshoot_ticket(TICKETS[0], cls)
+    agents_direct.compose_response(TICKETS[0], cls, ts)
+
+    batch = agents_direct.classify_tickets(TICKETS, stats := {})
+    assert batch["INC2"].category == "Other" and stats["calls"] == 1
+
+    out = orchestrator_fused.run(TICKETS[1])
+    assert out["fused_calls"] == 1
+    assert fake.stats()["calls"] == 5 and fake.usage.snapshot()["fused"]["calls"] == 1
+
+
+def test_fake_errors_are_transient():
+    fake = FakeGeminiClient(latency="const:0", error_rate=1.0)
+    with pytest.raises(FakeLLMError) as e:
+        fake.generate_json("s", "u", stage="communication")
+    assert is_transient(e.value)
@@ -0,0 +1,71 @@
+import time
+import json
+import asyncio
+
+import httpx
+
+from app.src.itsm_agents import gemini_client
+from app.src.itsm_agents.gemini_client import GeminiClient
+
+LATENCY_S = 0.2
+
+
+class SlowFakeTransport(httpx.AsyncBaseTransport):
+    """Answers every generateContent call with a fixed JSON body after LATENCY_S."""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.calls += 1
+        await asyncio.sleep(LATENCY_S)
+        body = {
+            "candidates": [
+                {"content": {"role": "model", "parts": [{"text": json.dumps({"ok": True})}]}}
+            ]
+        }
+        return httpx.Response(200, json=body)
+
+
+def test_concurrent_async_calls_share_one_loop(monkeypatch):
+    monkeypatch.setattr(gemini_client, "GEMINI_API_KEY", "test-key")
+    transport = SlowFakeTransport()
+    client = GeminiClient(async_http_client=httpx.AsyncClient(transport=transport), limiter=None)
+
+    async def main(n):
+        t0 = time.perf_counter()
+        results = await asyncio.gather(*[client.generate_json_async("sys", f"user {i}") for i in range(n)])
+        return results, time.perf_counter() - t0
+
+    results, elapsed = asyncio.run(main(20))
+
+    assert results == [{"ok": True}] * 20
+    assert transport.calls == 20
+    # 20 concurrent calls finish in about the time of one, not 20x
+    assert elapsed < LATENCY_S * 3
+
+
+def test_structured_output_sends_response_schema(monkeypatch):
+    from app.src.itsm_agents.schemas import Troubleshooting
+
+    monkeypatch.setattr(gemini_client, "GEMINI_API_KEY", "test-key")
+    sent = []
+
+    def handler(request):
+        sent.append(json.loads(request.content))
+        plan = {"probable_cause": "c", "steps": ["a", "b"], "data_needed": [], "risk_level": "Low"}
+        body = {
+            "candidates": [{"content": {"role": "model", "parts": [{"text": json.dumps(plan)}]}}],
+            "usageMetadata": {"promptTokenCount": 120, "candidatesTokenCount": 40},
+        }
+        return httpx.Response(200, json=body)
+
+    client = GeminiClient(http_client=httpx.Client(transport=httpx.MockTransport(handler)), cache=None, limiter=None)
+    data = client.generate_json("sys", "user", schema=Troubleshooting, stage="troubleshooting")
+
+    assert Troubleshooting(**data).steps == ["a", "b"]
+    config = sent[0]["generationConfig"]
+    assert config["responseMimeType"] == "application/json"
+    assert config["responseSchema"]["properties"]["risk_level"]["enum"] == ["Low", "Medium", "High"]
+    usage = client.usage.snapshot()["troubleshooting"]
+    assert (usage["calls"], usage["input_tokens"], usage["output_tokens"]) == (1, 120, 40)
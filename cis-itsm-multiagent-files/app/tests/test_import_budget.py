@@ -0,0 +1,44 @@
+import os
+import sys
+import subprocess
+
+APP_SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+# Generous multiples of what was measured on a 1-CPU box (cli ~0.16 s, mcp_server ~0.75 s),
+# so only a heavy SDK creeping back into the import path trips them.
+BUDGET_US = {"itsm_agents.cli": 600_000, "itsm_agents.orchestrator_direct": 900_000, "itsm_agents.mcp_server": 2_500_000}
+
+
+def _importtime(module: str) -> dict:
+    """Cumulative import time (us) per module, from `python -X importtime -c 'import <module>'`."""
+    env = {**os.environ, "PYTHONPATH": APP_SRC}
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        env=env, capture_output=True, text=True, timeout=120,
+    )
+    assert proc.returncode == 0, proc.stderr[-2000:]
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def test_cli_loads_no_sdk_until_a_runner_is_chosen():
+    times = _importtime("itsm_agents.cli")
+    for heavy in ("google.genai", "mcp", "numpy", "httpx", "itsm_agents.orchestrator_mcp"):
+        assert heavy not in times, heavy
+    assert times["itsm_agents.cli"] < BUDGET_US["itsm_agents.cli"]
+
+
+def test_runners_load_only_what_they_use():
+    # the direct runner never needs the mcp SDK; the Gemini SDK waits for the first client
+    times = _importtime("itsm_agents.orchestrator_direct")
+    assert "mcp" not in times and "google.genai" not in times
+    assert times["itsm_agents.orchestrator_direct"] < BUDGET_US["itsm_agents.orchestrator_direct"]
+
+    times = _importtime("itsm_agents.mcp_server")
+    assert "google.genai" not in times
+    assert times["itsm_agents.mcp_server"] < BUDGET_US["itsm_agents.mcp_server"]
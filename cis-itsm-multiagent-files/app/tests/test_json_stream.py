@@ -0,0 +1,56 @@
+import json
+
+import httpx
+
+from app.src.itsm_agents import gemini_client
+from app.src.itsm_agents.gemini_client import GeminiClient
+from app.src.itsm_agents.json_stream import IncrementalJSONParser
+
+DOC = {
+    "category": "VPN",
+    "steps": ["Check {config}", 'Say "hi", then retry]'],
+    "nested": {"a": [1, {"b": "},"}]},
+    "close_recommendation": False,
+}
+
+
+def test_fields_emitted_as_soon_as_complete():
+    text = "```json\n" + json.dumps(DOC) + "\n```"
+    parser = IncrementalJSONParser()
+    seen = []
+    for i, c in enumerate(text):
+        for key, value in parser.feed(c):
+            seen.append((key, value, i))
+
+    assert [k for k, _, _ in seen] == list(DOC)
+    assert {k: v for k, v, _ in seen} == DOC
+    # "category" is available long before the document ends
+    assert seen[0][2] < len(text) // 4
+
+
+def test_finish_flushes_truncated_value():
+    parser = IncrementalJSONParser()
+    assert parser.feed('{"category": "VPN", "steps": ["a", "b') == [("category", "VPN")]
+    assert parser.finish() == [("steps", ["a", "b"])]
+
+
+def test_generate_json_stream_reports_fields_progressively(monkeypatch):
+    monkeypatch.setattr(gemini_client, "GEMINI_API_KEY", "test-key")
+    text = json.dumps({"category": "VPN", "priority": "P3"})
+    chunks = [text[:20], text[20:]]
+    body = "".join(
+        "data: " + json.dumps({"candidates": [{"content": {"role": "model", "parts": [{"text": c}]}}]}) + "\r\n\r\n"
+        for c in chunks
+    )
+
+    def handler(request):
+        assert "streamGenerateContent" in str(request.url)
+        return httpx.Response(200, content=body.encode(), headers={"content-type": "text/event-stream"})
+
+    client = GeminiClient(http_client=httpx.Client(transport=httpx.MockTransport(handler)), cache=None, limiter=None)
+    fields, timing = [], {}
+    out = client.generate_json_stream("sys", "user", on_field=lambda k, v: fields.append(k), timing=timing)
+
+    assert out == {"category": "VPN", "priority": "P3"}
+    assert fields == ["category", "priority"]
+    assert timing["first_field_ms"] is not None and timing["total_ms"] >= timing["first_field_ms"]
@@ -6,4 +6,92 @@ def test_load_json_strict_handles_fences():
 
 def test_load_json_strict_repairs_trailing_commas():
     text = "{\"a\":1,}"
-    assert load_json_strict(text) == {"a": 1}
\ No newline at end of file
+    assert load_json_strict(text) == {"a": 1}
+
+# ---- single-pass scanner: truncation, nesting, fuzz against the old regex version ----
+import re
+import json
+import time
+import random
+
+from app.src.itsm_agents.json_utils import extract_json, repair_json
+
+
+def _legacy_load(text):
+    """The previous regex/bracket-counting implementation, kept as a baseline."""
+    text = (text or "").strip()
+    fence = re.search(r"```(?:json)?\s*(\{.*?\})\s*```", text, flags=re.DOTALL | re.IGNORECASE)
+    if fence:
+        s = fence.group(1).strip()
+    else:
+        start, end = text.find("{"), text.rfind("}")
+        s = text[start:end + 1].strip() if start != -1 and end > start else text
+    try:
+        return json.loads(s)
+    except json.JSONDecodeError:
+        s = re.sub(r",\s*$", "", re.sub(r",\s*([\]}])", r"\1", s))
+        s += "]" * max(0, s.count("[") - s.count("]"))
+        s += "}" * max(0, s.count("{") - s.count("}"))
+        try:
+            return json.loads(s)
+        except json.JSONDecodeError:
+            return {}
+
+
+def _random_doc(rng, depth=0):
+    words = ["vpn", "error {809}", "a, b", 'say "hi"', "C:\\temp", "[x]", "ok"]
+    if depth > 2 or rng.random() < 0.3:
+        return rng.choice([rng.choice(words), rng.randint(0, 999), True, None, 1.5])
+    if rng.random() < 0.5:
+        return [_random_doc(rng, depth + 1) for _ in range(rng.randint(0, 4))]
+    return {f"k{i}": _random_doc(rng, depth + 1) for i in range(rng.randint(1, 4))}
+
+
+def test_repair_closes_nested_truncation_in_order():
+    assert load_json_strict('{"a": [{"b": [1, 2') == {"a": [{"b": [1, 2]}]}
+    assert load_json_strict('{"steps": ["reboot", "check {logs}", "re') == {"steps": ["reboot", "check {logs}", "re"]}
+    assert load_json_strict('{"a": 1, "b": {"c": tr') == {"a": 1, "b": {}}
+    assert repair_json("[1, 2,") == "[1, 2]"
+
+
+def test_repair_stops_at_the_closing_fence():
+    assert load_json_strict('```json\n{"a": [1, 2\n```') == {"a": [1, 2]}
+    assert load_json_strict('```json\n{"a": "run ```ls```", "b": [1,],}\n```\nDone.') == {"a": "run ```ls```", "b": [1]}
+
+
+def test_trailing_comma_repair_is_linear():
+    def best(n):
+        text = "{" + ",".join(f'"k{i}": "v,]", "l{i}": [1,]' for i in range(n)) + "}"
+        times = []
+        for _ in range(3):
+            t0 = time.perf_counter()
+            assert len(load_json_strict(text)) == 2 * n
+            times.append(time.perf_counter() - t0)
+        return min(times)
+
+    assert best(16000) < best(2000) * 24  # 8x the input: linear ~8x, quadratic ~64x
+
+
+def test_extract_returns_first_balanced_object():
+    text = 'Sure: {"a": "}"} and also {"b": 2}'
+    assert extract_json(text) == '{"a": "}"}'
+    assert load_json_strict(text) == {"a": "}"}
+
+
+def test_fuzz_against_legacy_implementation():
+    rng = random.Random(7)
+    new_ok = legacy_ok = 0
+    for _ in range(300):
+        doc = {"category": "VPN", "data": _random_doc(rng)}
+        text = json.dumps(doc, indent=rng.choice([None, 2]))
+        if rng.random() < 0.5:
+            text = text[:-1].rstrip() + ",\n}"  # trailing comma before the closing brace
+        wrapped = rng.choice(["{}", "```json\n{}\n```", "Here you go:\n{}\nThanks!"]).replace("{}", text, 1)
+        assert load_json_strict(wrapped) == doc
+
+        cut = text[: rng.randint(1, len(text) - 1)]
+        got = load_json_strict(cut)
+        assert isinstance(got, dict) and set(got) <= set(doc)
+        new_ok += bool(got)
+        legacy_ok += bool(_legacy_load(cut))
+    assert new_ok >= legacy_ok
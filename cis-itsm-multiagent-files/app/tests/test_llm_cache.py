@@ -0,0 +1,53 @@
+import json
+
+import httpx
+
+from app.src.itsm_agents import gemini_client
+from app.src.itsm_agents.gemini_client import GeminiClient
+from app.src.itsm_agents.llm_cache import ResponseCache, cache_key
+
+
+def test_lru_eviction_and_ttl(monkeypatch):
+    cache = ResponseCache(max_entries=2, ttl_s=10)
+    cache.put("a", {"v": 1})
+    cache.put("b", {"v": 2})
+    assert cache.get("a") == {"v": 1}  # "a" is now most recent
+    cache.put("c", {"v": 3})           # evicts "b"
+    assert cache.get("b") is None
+    assert cache.get("c") == {"v": 3}
+
+    clock = [1000.0]
+    monkeypatch.setattr("app.src.itsm_agents.llm_cache.time.time", lambda: clock[0])
+    cache.put("d", {"v": 4})
+    clock[0] += 11
+    assert cache.get("d") is None
+    assert cache.stats()["hits"] == 2 and cache.stats()["misses"] == 2
+
+
+def test_sqlite_tier_survives_restart(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    key = cache_key("m", "sys", "user", 0.2, 100)
+    ResponseCache(disk_path=path).put(key, {"category": "VPN"})
+
+    fresh = ResponseCache(disk_path=path)
+    assert fresh.get(key) == {"category": "VPN"}
+    assert fresh.stats()["disk_hits"] == 1
+
+
+def test_cache_hit_skips_network(monkeypatch):
+    monkeypatch.setattr(gemini_client, "GEMINI_API_KEY", "test-key")
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        text = json.dumps({"category": "VPN"})
+        return httpx.Response(200, json={"candidates": [{"content": {"parts": [{"text": text}]}}]})
+
+    client = GeminiClient(
+        http_client=httpx.Client(transport=httpx.MockTransport(handler)),
+        cache=ResponseCache(),
+        limiter=None,
+    )
+    assert client.generate_json("sys", "user") == {"category": "VPN"}
+    assert client.generate_json("sys", "user") == {"category": "VPN"}
+    assert len(calls) == 1
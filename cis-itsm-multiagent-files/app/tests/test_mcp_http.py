@@ -0,0 +1,76 @@
+import os
+import sys
+import time
+import socket
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+from app.src.itsm_agents.mcp_pool import MCPClientPool
+
+APP_SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+TICKET = {"ticket_id": "INC1", "short_description": "VPN not connecting", "description": "Error 809"}
+
+
+def _start_server(*args, **env_overrides):
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    env = {
+        **os.environ, "PYTHONPATH": APP_SRC, "LLM_BACKEND": "fake", "LLM_CACHE": "off",
+        "FAST_PATH_THRESHOLD": "2", "TRACE_EXPORT_PATH": "", **env_overrides,
+    }
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "itsm_agents.mcp_server", "--transport", "streamable-http", "--port", str(port), *args],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 60
+    while True:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return proc, f"http://127.0.0.1:{port}/mcp"
+        except OSError:
+            assert proc.poll() is None and time.monotonic() < deadline, "server did not start"
+            time.sleep(0.05)
+
+
+async def _classify(cli):
+    return await cli.call_tool("classify_ticket_tool", {"ticket": TICKET})
+
+
+def test_clients_share_one_http_server_concurrently():
+    proc, url = _start_server(FAKE_LLM_LATENCY="const:500", MCP_SERVER_MAX_CONCURRENCY="8")
+    pools = [MCPClientPool(size=2, url=url), MCPClientPool(size=2, url=url)]  # two "orchestrators"
+    try:
+        for pool in pools:
+            pool.call(_classify)  # warm: sessions open, connections established
+
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=4) as ex:
+            outs = list(ex.map(lambda i: pools[i % 2].call(_classify), range(4)))
+        elapsed = time.perf_counter() - t0
+
+        assert all(o["category"] == "VPN" for o in outs)
+        assert elapsed < 1.5  # 4 x 500 ms model calls, run side by side on the one server
+        assert all(p.stats()["transport"] == "streamable-http" and p.stats()["spawned"] == 2 for p in pools)
+    finally:
+        for pool in pools:
+            pool.close()
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def test_host_headers_outside_the_allowed_hosts_are_refused():
+    proc, url = _start_server("--allowed-hosts", "itsm-node")
+    port = url.split(":")[2].split("/")[0]
+    body = {"jsonrpc": "2.0", "id": 1, "method": "ping"}
+    headers = {"Accept": "application/json, text/event-stream"}
+    try:
+        rebound = httpx.post(url, json=body, headers={**headers, "Host": f"attacker.example:{port}"})
+        named = httpx.post(url, json=body, headers={**headers, "Host": f"itsm-node:{port}"})
+        assert rebound.status_code == 421
+        assert named.status_code != 421
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
@@ -0,0 +1,41 @@
+import sys
+import time
+
+from app.src.itsm_agents.mcp_pool import MCPClientPool
+
+
+async def _list_tools(cli):
+    return await cli.list_tools()
+
+
+def test_pool_reuses_warm_sessions_and_respawns():
+    pool = MCPClientPool(size=1, command=sys.executable, args=["-m", "itsm_agents.mcp_server"])
+    try:
+        for _ in range(3):
+            assert "classify_ticket_tool" in pool.call(_list_tools)
+        assert pool.stats()["spawned"] == 1
+        assert pool.stats()["leases"] == 3
+
+        # simulate a crashed server: the slot is torn down and a fresh one takes its place
+        pool._loop.call_soon_threadsafe(pool._respawn, pool._slots[0])
+        assert "classify_ticket_tool" in pool.call(_list_tools)
+        assert pool.stats()["respawns"] == 1
+    finally:
+        pool.close()
+
+
+def test_pool_surfaces_spawn_failures():
+    pool = MCPClientPool(
+        size=1, command=sys.executable, args=["-c", "import sys; sys.exit(3)"], lease_timeout_s=2
+    )
+    try:
+        t0 = time.perf_counter()
+        try:
+            pool.call(_list_tools)
+            assert False, "expected lease timeout"
+        except RuntimeError as e:
+            assert "No MCP session available" in str(e)
+        assert time.perf_counter() - t0 < 5
+        assert pool.stats()["spawn_failures"] >= 1
+    finally:
+        pool.close()
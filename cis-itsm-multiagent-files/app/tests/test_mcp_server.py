@@ -0,0 +1,115 @@
+import os
+import json
+import sys
+import time
+import asyncio
+
+from app.src.itsm_agents import orchestrator_mcp
+from app.src.itsm_agents.context_store import HANDLE_MISS
+from app.src.itsm_agents.mcp_client import MCPToolClient, MCPToolError
+from app.src.itsm_agents.schemas import Ticket
+
+TICKET = {"ticket_id": "INC1", "short_description": "VPN not connecting", "description": "Error 809"}
+
+
+async def _waves(n_calls_list):
+    env = {
+        **os.environ, "LLM_BACKEND": "fake", "FAKE_LLM_LATENCY": "const:400", "LLM_CACHE": "off",
+        "FAST_PATH_THRESHOLD": "2", "TRACE_EXPORT_PATH": "", "MCP_SERVER_MAX_CONCURRENCY": "4",
+    }
+    walls = []
+    async with MCPToolClient(command=sys.executable, args=["-m", "itsm_agents.mcp_server"], env=env, url="") as cli:
+        await cli.call_tool("classify_ticket_tool", {"ticket": TICKET})  # warm-up
+        for n in n_calls_list:
+            t0 = time.perf_counter()
+            outs = await asyncio.gather(*(cli.call_tool("classify_ticket_tool", {"ticket": TICKET}) for _ in range(n)))
+            walls.append(time.perf_counter() - t0)
+            assert all(o["category"] == "VPN" for o in outs)
+    return walls
+
+
+def test_concurrent_calls_on_one_session_overlap_up_to_the_cap():
+    four, eight = asyncio.run(_waves([4, 8]))
+    assert four < 0.75  # 4 x 400 ms model calls at once: about one call
+    assert eight >= 0.8  # cap 4: the second four wait for a slot
+
+
+async def _pipeline_and_batch():
+    env = {
+        **os.environ, "LLM_BACKEND": "fake", "FAKE_LLM_LATENCY": "const:50", "LLM_CACHE": "off",
+        "TRACE_EXPORT_PATH": "", "PLAN_REUSE_THRESHOLD": "2",  # keep fake plans out of .cache/plan_index.npz
+    }
+    stages, records = [], []
+
+    async def on_stage(done, total, message):
+        stages.append((done, total, json.loads(message)["stage"]))
+
+    async def on_ticket(done, total, message):
+        records.append(json.loads(message))
+
+    async with MCPToolClient(command=sys.executable, args=["-m", "itsm_agents.mcp_server"], env=env, url="") as cli:
+        one = await cli.call_tool("run_pipeline_tool", {"ticket": TICKET}, on_progress=on_stage)
+        many = await cli.call_tool(
+            "run_batch_tool",
+            {"tickets": [TICKET, {"ticket_id": "BAD"}, {**TICKET, "ticket_id": "INC3"}], "concurrency": 2},
+            on_progress=on_ticket,
+        )
+    return one, stages, many, records
+
+
+def test_pipeline_and_batch_tools_stream_progress_in_one_call():
+    one, stages, many, records = asyncio.run(_pipeline_and_batch())
+    assert one["classification"]["category"] == "VPN" and one["communication"]["user_message"]
+    assert stages == [(1, 3, "classification"), (2, 3, "troubleshooting"), (3, 3, "communication")]
+
+    assert [r["ticket_id"] for r in many["results"]] == ["INC1", "BAD", "INC3"]
+    assert [r["status"] for r in many["results"]] == ["ok", "error", "ok"]
+    assert many["summary"]["ok"] == 2 and many["summary"]["failed"] == 1
+    assert sorted(r["index"] for r in records) == [0, 1, 2]
+
+
+async def _handles():
+    env = {
+        **os.environ, "LLM_BACKEND": "fake", "FAKE_LLM_LATENCY": "const:10", "LLM_CACHE": "off",
+        "TRACE_EXPORT_PATH": "", "PLAN_REUSE_THRESHOLD": "2",
+    }
+    async with MCPToolClient(command=sys.executable, args=["-m", "itsm_agents.mcp_server"], env=env, url="") as cli:
+        cls = await cli.call_tool("classify_ticket_tool", {"ticket": TICKET, "keep": True})
+        ts = await cli.call_tool("troubleshoot_ticket_tool", {"handle": cls["handle"]})
+        comm = await cli.call_tool("compose_response_tool", {"handle": cls["handle"]})
+        miss = await cli.call_tool("compose_response_tool", {"handle": "0" * 32})
+        bare = await cli.call_tool("classify_ticket_tool", {})
+    return cls, ts, comm, miss, bare
+
+
+def test_later_tools_take_the_context_handle_instead_of_payloads():
+    cls, ts, comm, miss, bare = asyncio.run(_handles())
+    assert cls["category"] == "VPN" and len(cls["handle"]) == 32
+    assert ts["steps"] and comm["user_message"]
+    assert HANDLE_MISS in miss["raw_text"]
+    assert "missing `ticket`" in bare["raw_text"]
+
+
+async def _failures():
+    env = {
+        **os.environ, "LLM_BACKEND": "fake", "FAKE_LLM_LATENCY": "const:1", "FAKE_LLM_ERROR_RATE": "1",
+        "LLM_MAX_RETRIES": "0", "LLM_CACHE": "off", "FAST_PATH_THRESHOLD": "2", "TRACE_EXPORT_PATH": "",
+        "PLAN_REUSE_THRESHOLD": "2",
+    }
+    errors = []
+    async with MCPToolClient(command=sys.executable, args=["-m", "itsm_agents.mcp_server"], env=env, url="") as cli:
+        for steps in (orchestrator_mcp._pipeline_server, orchestrator_mcp._pipeline):
+            try:
+                await steps(cli, Ticket(**TICKET))
+            except MCPToolError as e:
+                errors.append(str(e))
+        try:
+            await cli.call_tool("run_batch_tool", {"tickets": "not a list"}, check=True)
+        except MCPToolError as e:
+            errors.append(str(e))
+    return errors
+
+
+def test_failed_tools_raise_instead_of_passing_as_results():
+    errors = asyncio.run(_failures())
+    assert [e.split(":")[0] for e in errors] == ["run_pipeline_tool", "classify_ticket_tool", "run_batch_tool"]
@@ -0,0 +1,51 @@
+from app.src.itsm_agents import agents_direct, orchestrator_fused
+from app.tests.conftest import fake_client, make_ticket
+
+CLS = {"category": "Application", "priority": "P3", "assignment_group": "CIS-App-Support", "confidence": 0.7, "reason": "r"}
+TS = {"probable_cause": "c", "steps": ["a", "b", "c", "d"], "data_needed": [], "risk_level": "Low"}
+COMM = {"user_message": "m", "ticket_update": "u", "close_recommendation": False}
+# matches no fast-path rule, so every section comes from the model
+TICKET = make_ticket("Odd behaviour", "Something is off", tid="INC9")
+
+
+def _queued(answers):
+    """A fake client answering fused requests from a queue of canned {section: dict} answers."""
+    answers, requests = list(answers), []
+
+    def answer(stage, user, schema):
+        requests.append((user, schema))
+        return answers.pop(0)
+
+    return fake_client(answer), requests
+
+
+def test_fused_run_is_one_request(monkeypatch):
+    fake, requests = _queued([{"classification": CLS, "troubleshooting": TS, "communication": COMM}])
+    monkeypatch.setattr(agents_direct, "_client", fake)
+    monkeypatch.setattr(orchestrator_fused, "PLAN_REUSE_THRESHOLD", 2.0)
+
+    out = orchestrator_fused.run(TICKET)
+
+    assert out["fused_calls"] == 1 and len(requests) == 1
+    assert out["classification"]["category"] == "Application"
+    assert out["communication"]["user_message"] == "m"
+
+
+def test_only_invalid_sections_are_requested_again(monkeypatch):
+    fake, requests = _queued([
+        {"classification": CLS, "troubleshooting": {**TS, "risk_level": "Severe"}, "communication": COMM},
+        {"troubleshooting": TS},
+    ])
+    monkeypatch.setattr(agents_direct, "_client", fake)
+    monkeypatch.setattr(orchestrator_fused, "PLAN_REUSE_THRESHOLD", 2.0)
+
+    seen = []
+    out = orchestrator_fused.run(TICKET, on_field=lambda stage, key, value: seen.append(stage))
+
+    assert out["fused_calls"] == 2
+    reask, schema = requests[1]
+    assert "troubleshooting" in reask and "CLASSIFICATION:" in reask
+    assert "COMMUNICATION:" not in reask
+    if schema is not None:
+        assert list(schema.model_fields) == ["troubleshooting"]
+    assert sorted(seen) == ["classification", "communication", "troubleshooting"]
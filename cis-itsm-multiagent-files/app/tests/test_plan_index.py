@@ -0,0 +1,74 @@
+from app.src.itsm_agents.plan_index import PlanIndex, with_plan_reuse
+from app.src.itsm_agents import plan_index
+from app.src.itsm_agents.schemas import Troubleshooting
+from app.tests.conftest import make_cls, make_ticket
+
+
+PLAN = Troubleshooting(probable_cause="VPN client misconfigured", steps=["a", "b", "c", "d"])
+
+
+def test_near_duplicate_hits_same_category_only(tmp_path):
+    index = PlanIndex(dims=256)
+    vpn = make_ticket("Unable to connect to VPN (Error 809)", "User cannot connect to VPN. Error 809.")
+    index.add(vpn, make_cls("VPN"), PLAN)
+
+    dup = make_ticket("Unable to connect to VPN (error 809)", "User can't connect to VPN, error 809.", tid="INC2")
+    other = make_ticket("Outlook keeps crashing", "Outlook crashes on startup after update.", tid="INC3")
+
+    assert index.lookup(dup, make_cls("VPN"), 0.9) == PLAN
+    assert index.lookup(dup, make_cls("Network"), 0.9) is None
+    assert index.lookup(other, make_cls("VPN"), 0.9) is None
+
+    path = str(tmp_path / "index.npz")
+    index.save(path)
+    assert PlanIndex(dims=256, path=path).lookup(dup, make_cls("VPN"), 0.9) == PLAN
+
+
+def test_with_plan_reuse_skips_model_for_duplicates(monkeypatch):
+    monkeypatch.setattr(plan_index, "_index", PlanIndex(dims=256))
+    calls = []
+
+    def model(ticket, cls):
+        calls.append(ticket.ticket_id)
+        return PLAN
+
+    troubleshoot = with_plan_reuse(model, threshold=0.9)
+    for i in range(5):
+        ticket = make_ticket("Low disk space on laptop", "C: drive is full", tid=f"INC{i}")
+        troubleshoot(ticket, make_cls("Storage/Disk"))
+
+    assert calls == ["INC0"]
+    assert plan_index.get_index().stats()["hits"] == 4
+
+
+def test_processes_sharing_a_path_append_segments_and_merge_them(tmp_path):
+    path = str(tmp_path / "index.npz")
+    a = PlanIndex(dims=256, path=path, save_every=1)
+    b = PlanIndex(dims=256, path=path, save_every=1)
+    vpn = make_ticket("Unable to connect to VPN (Error 809)", "User cannot connect to VPN. Error 809.")
+    disk = make_ticket("Low disk space on laptop", "C: drive is full", tid="INC2")
+
+    a.add(vpn, make_cls("VPN"), PLAN)
+    b.add(disk, make_cls("Storage/Disk"), PLAN)  # b's save also merges the segment a wrote
+    assert len(b) == 2 and b.lookup(vpn, make_cls("VPN"), 0.9) == PLAN
+
+    merged = PlanIndex(dims=256, path=path)
+    assert len(merged) == 2 and merged.lookup(disk, make_cls("Storage/Disk"), 0.9) == PLAN
+    assert len(list(tmp_path.iterdir())) == 2  # one segment per save, nothing rewritten
+
+
+def test_segments_are_folded_into_the_path_without_losing_or_repeating_rows(tmp_path):
+    path = str(tmp_path / "index.npz")
+    a = PlanIndex(dims=256, path=path, save_every=1, max_segments=3)
+    b = PlanIndex(dims=256, path=path, save_every=1, max_segments=3)
+    tickets = [make_ticket(f"Printer {i} jammed on floor {i}", f"Tray {i} stuck", tid=f"INC{i}") for i in range(10)]
+    for i, ticket in enumerate(tickets):
+        (a if i % 2 else b).add(ticket, make_cls("Laptop/Device"), PLAN)
+
+    assert len(PlanIndex._segments(path)) <= 3
+    a.save()
+    b.save()
+    fresh = PlanIndex(dims=256, path=path)
+    for index in (a, b, fresh):
+        ids = sorted(p["ticket_id"] for p in index._payloads)
+        assert ids == sorted(t.ticket_id for t in tickets)
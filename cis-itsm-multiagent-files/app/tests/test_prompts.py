@@ -0,0 +1,59 @@
+import glob
+import json
+import os
+
+import pytest
+
+from app.src.itsm_agents import prompts
+from app.src.itsm_agents.gemini_client import GeminiClient
+from app.src.itsm_agents.schemas import Ticket, Classification, Troubleshooting
+from app.tests.conftest import make_ticket
+
+SAMPLES = os.path.join(os.path.dirname(__file__), "..", "..", "samples", "*.json")
+TICKETS = [Ticket(**json.load(open(p, encoding="utf-8"))) for p in sorted(glob.glob(SAMPLES))]
+CLS = Classification(
+    category="VPN", priority="P3", assignment_group="CIS-VPN-Support", confidence=0.8, reason="VPN error 809"
+)
+TS = Troubleshooting(
+    probable_cause="IKEv2 ports blocked",
+    steps=["Check network", "Switch VPN protocol", "Reinstall client", "Escalate"],
+    data_needed=["Which network?"],
+)
+
+# Largest prompt (system + user, chars) over the sample tickets. Prompt size is a cost
+# and latency budget: if a change makes a prompt bigger, this fails. Lower the numbers
+# when prompts shrink; raise them only deliberately.
+BUDGET = {
+    (False, "classification"): 1127,
+    (False, "troubleshooting"): 873,
+    (False, "communication"): 1209,
+    (False, "classification_batch"): 1762,
+    (True, "classification"): 586,
+    (True, "troubleshooting"): 571,
+    (True, "communication"): 903,
+    (True, "classification_batch"): 1162,
+}
+
+BUILDERS = {
+    "classification": lambda s: [prompts.classify_prompt(t, s) for t in TICKETS],
+    "troubleshooting": lambda s: [prompts.troubleshoot_prompt(t, CLS, s) for t in TICKETS],
+    "communication": lambda s: [prompts.compose_prompt(t, CLS, TS, s) for t in TICKETS],
+    "classification_batch": lambda s: [prompts.classify_batch_prompt(TICKETS, s)],
+}
+
+
+@pytest.mark.parametrize("structured,stage", sorted(BUDGET))
+def test_prompt_size_does_not_grow(structured, stage):
+    size = max(len(GeminiClient._build_prompt(*p)) for p in BUILDERS[stage](structured))
+    assert size <= BUDGET[(structured, stage)], f"{stage} prompt grew to {size} chars"
+
+
+def test_context_is_compact_canonical_json():
+    ticket = make_ticket("VPN down", "Error 809")
+    _, user = prompts.compose_prompt(ticket, CLS, TS, structured=True)
+
+    context = user.split("TICKET:\n", 1)[1].split("\n", 1)[0]
+    assert context == '{"description":"Error 809","short_description":"VPN down","ticket_id":"INC1"}'
+    assert "'ticket_id'" not in user  # no Python reprs
+    assert "confidence" not in user and "risk_level" not in user  # unused / default fields dropped
+    assert "STRICT RULES" not in GeminiClient._build_prompt("sys", user)
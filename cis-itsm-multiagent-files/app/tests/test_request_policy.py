@@ -0,0 +1,186 @@
+import time
+import asyncio
+import threading
+
+import httpx
+import pytest
+
+from app.src.itsm_agents.rate_limiter import RateLimiter
+from app.src.itsm_agents.request_policy import DeadlineExceeded, RequestPolicy
+from app.tests.conftest import fake_client
+
+
+def _client(latency_ms, fail_first=0, error=None):
+    """FakeGeminiClient whose first `fail_first` calls raise `error` (default: a connection reset)."""
+    error = error or httpx.ConnectError("connection reset")
+
+    def answer(stage, user, schema):
+        if fake.calls <= fail_first:
+            raise error
+        return {"call": fake.calls}
+
+    fake = fake_client(answer, latency=latency_ms if callable(latency_ms) else f"const:{latency_ms}")
+    return fake
+
+
+def _long_tail(fast=10, slow=600, every=25):
+    """Mostly `fast` ms, but every `every`-th call stalls for `slow` (a 4% tail by default)."""
+    counter = {"n": 0}
+
+    def draw(rng):
+        # drawn under the client's lock
+        counter["n"] += 1
+        return slow if counter["n"] % every == 0 else fast
+
+    return draw
+
+
+def test_hedging_cuts_the_tail():
+    fake = _client(_long_tail())
+    pol = RequestPolicy("classification", deadline_s=5, hedge_min_samples=20)
+
+    walls = []
+    for _ in range(100):
+        t0 = time.perf_counter()
+        assert "call" in pol.call(fake.generate_json, "s", "u")
+        walls.append(time.perf_counter() - t0)
+
+    stats = pol.stats()
+    assert stats["hedges"] > 0 and stats["hedge_wins"] > 0
+    # after warm-up a slow attempt is raced by a duplicate instead of waited out
+    assert max(walls[40:]) < 0.3
+    assert stats["p50_ms"] < 50
+
+
+def test_transient_errors_are_retried_with_backoff():
+    fake = _client(1, fail_first=2)
+    pol = RequestPolicy(deadline_s=5, max_retries=2, backoff_base_s=0.01, hedge=False)
+    assert pol.call(fake.generate_json, "s", "u") == {"call": 3}
+    assert pol.stats()["retries"] == 2
+
+    fake = _client(1, fail_first=1, error=ValueError("bad request"))
+    with pytest.raises(ValueError):
+        pol.call(fake.generate_json, "s", "u")
+    assert fake.calls == 1
+
+
+def test_deadline_abandons_a_stalled_call():
+    fake = _client(2000)
+    pol = RequestPolicy(deadline_s=0.2, hedge=False)
+    t0 = time.perf_counter()
+    with pytest.raises(DeadlineExceeded):
+        pol.call(fake.generate_json, "s", "u")
+    assert time.perf_counter() - t0 < 0.5
+    assert pol.stats()["deadline_exceeded"] == 1
+
+
+def _crowd(pol, fake, n=96):
+    """`n` concurrent calls (the attempt pool has 32 workers: three waves); (errors, max wall)."""
+    errors, walls = [], []
+
+    def caller():
+        t0 = time.perf_counter()
+        try:
+            pol.call(fake.generate_json, "s", "u")
+        except Exception as exc:
+            errors.append(exc)
+        walls.append(time.perf_counter() - t0)
+
+    threads = [threading.Thread(target=caller) for _ in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return errors, max(walls)
+
+
+def test_time_queued_for_a_worker_is_not_hedged():
+    fake = _client(200)
+    pol = RequestPolicy(deadline_s=2, hedge_min_samples=20)
+    for _ in range(20):
+        pol.histogram.record(300)  # p95 above the call latency: no hedge is due
+    errors, _ = _crowd(pol, fake)
+    assert errors == []
+    assert pol.stats()["hedges"] == 0 and fake.calls == 96
+
+
+def test_deadline_counts_from_the_call_including_the_queue():
+    fake = _client(200)
+    errors, wall = _crowd(RequestPolicy(deadline_s=0.3, hedge=False), fake)
+    time.sleep(0.3)
+    # the second wave runs past the deadline, the third is cancelled while still queued
+    assert errors and all(isinstance(e, DeadlineExceeded) for e in errors)
+    assert wall < 0.55 and 32 <= fake.calls < 96
+
+
+def test_waiting_for_admission_is_not_latency_and_is_not_hedged():
+    limiter = RateLimiter(rpm=60000, max_concurrency=1)
+    pol = RequestPolicy(deadline_s=5, hedge_min_samples=20)
+    for _ in range(20):
+        pol.histogram.record(50)  # hedge after 50 ms of model time
+    calls = []
+
+    def generate(system, user):
+        with limiter.admit():
+            calls.append(user)
+            time.sleep(0.01)
+            return {}
+
+    async def generate_async(system, user):
+        async with limiter.admit_async():
+            calls.append(user)
+            await asyncio.sleep(0.01)
+            return {}
+
+    for run in (lambda: pol.call(generate, "s", "sync"), lambda: asyncio.run(pol.call_async(generate_async, "s", "async"))):
+        held = limiter.acquire()  # the only slot is busy for 300 ms
+        threading.Timer(0.3, limiter.release, (held,)).start()
+        assert run() == {}
+        assert pol.histogram.percentile(100) < 100  # the 300 ms in the limiter is not a sample
+
+    assert calls == ["sync", "async"] and pol.stats()["hedges"] == 0
+
+
+def test_only_the_winning_attempt_streams_to_the_listener():
+    calls = {"n": 0}
+
+    def stream(system, user, on_field):
+        calls["n"] += 1
+        if calls["n"] == 1:
+            on_field("a", 1)
+            raise httpx.ConnectError("reset mid-stream")
+        on_field("a", 2)
+        on_field("b", 3)
+        return {"a": 2, "b": 3}
+
+    seen = []
+    pol = RequestPolicy(deadline_s=5, backoff_base_s=0.01, hedge=False)
+    assert pol.call(stream, "s", "u", on_field=lambda k, v: seen.append((k, v))) == {"a": 2, "b": 3}
+    # the retry re-sends every field, overwriting what the failed attempt had shown
+    assert seen == [("a", 1), ("a", 2), ("b", 3)]
+
+    def stalled(system, user, on_field):
+        time.sleep(0.3)
+        on_field("late", True)
+        return {}
+
+    seen.clear()
+    with pytest.raises(DeadlineExceeded):
+        RequestPolicy(deadline_s=0.1, hedge=False).call(stalled, "s", "u", on_field=lambda k, v: seen.append(k))
+    time.sleep(0.4)
+    assert seen == []  # the abandoned attempt finished in the background, muted
+
+
+def test_async_hedging_and_deadline():
+    fake = _client(_long_tail())
+    pol = RequestPolicy(deadline_s=5, hedge_min_samples=20)
+
+    async def main():
+        for _ in range(100):
+            await pol.call_async(fake.generate_json_async, "s", "u")
+        stalled = RequestPolicy(deadline_s=0.1, hedge=False)
+        with pytest.raises(DeadlineExceeded):
+            await stalled.call_async(_client(1000).generate_json_async, "s", "u")
+
+    asyncio.run(main())
+    assert pol.stats()["hedge_wins"] > 0
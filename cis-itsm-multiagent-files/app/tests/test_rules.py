@@ -0,0 +1,76 @@
+import os
+
+from app.src.itsm_agents.batch import iter_tickets
+from app.src.itsm_agents.rules import (
+    CALIBRATION,
+    FastPathStats,
+    calibration_samples,
+    fast_classify,
+    fit_calibration,
+    try_fast_path,
+    with_fast_path,
+)
+from app.tests.conftest import make_cls, make_ticket
+
+
+LABELLED = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "samples", "labelled", "tickets.jsonl"
+)
+
+
+def test_fast_classify_obvious_tickets():
+    vpn = fast_classify(make_ticket("Unable to connect to VPN (Error 809)", "Getting error 809"))
+    assert vpn.category == "VPN" and vpn.assignment_group == "CIS-VPN-Support"
+    assert vpn.confidence > 0.9
+
+    disk = fast_classify(make_ticket("Low disk space on laptop", "C: drive is full"))
+    assert disk.category == "Storage/Disk" and disk.confidence > 0.85
+
+    assert fast_classify(make_ticket("Printer jam", "paper stuck")) is None
+
+
+def test_priority_matrix():
+    assert fast_classify(make_ticket("VPN down", impact="1 - High", urgency="1 - High")).priority == "P1"
+    assert fast_classify(make_ticket("VPN down", impact="Single User", urgency="Medium")).priority == "P4"
+    assert fast_classify(make_ticket("VPN down")).priority == "P3"
+
+
+def test_low_confidence_falls_back_to_llm():
+    calls = []
+
+    def llm(ticket):
+        calls.append(ticket.ticket_id)
+        return make_cls("Other", 0.5, reason="llm")
+
+    stats = FastPathStats()
+    classify = with_fast_path(llm, threshold=0.85, stats=stats)
+
+    assert classify(make_ticket("VPN not connecting", "error 809")).category == "VPN"
+    # login + SAP patterns both match weakly -> ambiguous -> LLM
+    assert classify(make_ticket("SAP GUI login error")).reason == "llm"
+    assert len(calls) == 1
+
+    snap = stats.snapshot()
+    assert snap["hits"] == 1 and snap["tickets"] == 2 and snap["hit_rate"] == 0.5
+
+
+def test_outage_tickets_go_to_the_model_for_priority():
+    stats = FastPathStats()
+    assert try_fast_path(make_ticket("VPN down for entire site", "error 809"), threshold=0.5, stats=stats) is None
+    outage = make_ticket("Outlook outage", "nobody can open their mailbox")
+    assert try_fast_path(outage, threshold=0.5, stats=stats) is None
+    assert try_fast_path(make_ticket("VPN down", "error 809"), threshold=0.5, stats=stats).category == "VPN"
+    assert stats.snapshot()["hits"] == 1
+
+
+def test_calibration_is_fitted_on_the_labelled_tickets():
+    labelled = list(iter_tickets(LABELLED))
+    # stale if RULES or the samples changed: rerun benchmarks/calibrate_rules.py
+    assert fit_calibration(calibration_samples(labelled)) == CALIBRATION
+
+    threshold = 0.85  # FAST_PATH_THRESHOLD default
+    tickets = [(make_ticket(t["short_description"], t["description"]), t["category"]) for t in labelled]
+    taken = [(t, label) for t, label in tickets if try_fast_path(t, threshold, stats=FastPathStats())]
+    right = [t for t, label in taken if fast_classify(t).category == label]
+    assert len(taken) >= len(labelled) // 2
+    assert len(right) / len(taken) >= threshold  # precision at the threshold
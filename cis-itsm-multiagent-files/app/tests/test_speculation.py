@@ -0,0 +1,84 @@
+import time
+
+from app.src.itsm_agents.schemas import Troubleshooting
+from app.src.itsm_agents.speculation import SpeculationStats, classify_and_troubleshoot
+from app.tests.conftest import make_cls, make_ticket
+
+TICKET = make_ticket("VPN down", "Error 809")
+DELAY_S = 0.2
+
+
+def _fakes(real_category):
+    calls = []
+
+    def classify(ticket):
+        time.sleep(DELAY_S)
+        return make_cls(real_category)
+
+    def troubleshoot(ticket, cls):
+        calls.append(cls.category)
+        time.sleep(DELAY_S)
+        return Troubleshooting(probable_cause=f"plan for {cls.category}", steps=["a"])
+
+    return classify, troubleshoot, calls
+
+
+def test_hit_keeps_speculative_plan_and_overlaps_calls():
+    classify, troubleshoot, calls = _fakes("VPN")
+    stats = SpeculationStats()
+
+    t0 = time.perf_counter()
+    cls, ts = classify_and_troubleshoot(
+        TICKET, classify, troubleshoot, predict=lambda t: make_cls("VPN", 0.5), stats=stats
+    )
+    wall = time.perf_counter() - t0
+
+    assert ts.probable_cause == "plan for VPN" and calls == ["VPN"]
+    assert wall < DELAY_S * 1.5  # not 2x: both calls ran side by side
+    snap = stats.snapshot()
+    assert snap["hits"] == 1 and snap["hit_rate"] == 1.0
+    assert snap["wall_clock_saved_ms"] > DELAY_S * 1000 * 0.5
+
+
+def test_mismatch_discards_and_reruns_with_real_classification():
+    classify, troubleshoot, calls = _fakes("Network")
+    stats = SpeculationStats()
+
+    cls, ts = classify_and_troubleshoot(
+        TICKET, classify, troubleshoot, predict=lambda t: make_cls("VPN", 0.5), stats=stats
+    )
+
+    assert cls.category == "Network" and ts.probable_cause == "plan for Network"
+    assert calls == ["VPN", "Network"]
+    assert stats.snapshot()["misses"] == 1
+
+
+def test_low_confidence_prediction_is_not_speculated():
+    classify, troubleshoot, calls = _fakes("VPN")
+    stats = SpeculationStats()
+
+    classify_and_troubleshoot(
+        TICKET, classify, troubleshoot, predict=lambda t: make_cls("VPN", 0.1), min_confidence=0.3, stats=stats
+    )
+
+    assert calls == ["VPN"]
+    assert stats.snapshot()["skipped"] == 1 and stats.snapshot()["attempts"] == 0
+
+
+def test_side_effects_of_the_speculative_plan_wait_for_the_confirmed_guess():
+    for real, kept in (("VPN", ["VPN"]), ("Network", [])):
+        classify, troubleshoot, calls = _fakes(real)
+        raw_calls, hits = [], []
+
+        def speculative(ticket, cls):
+            raw_calls.append(cls.category)
+            return Troubleshooting(probable_cause=f"raw plan for {cls.category}", steps=["a"])
+
+        cls, ts = classify_and_troubleshoot(
+            TICKET, classify, troubleshoot, predict=lambda t: make_cls("VPN", 0.5), stats=SpeculationStats(),
+            speculative=speculative, on_hit=lambda t, c, plan: hits.append(c.category),
+        )
+
+        assert raw_calls == ["VPN"] and hits == kept
+        # the wrapped troubleshooter (and its side effects) only runs for the real category on a miss
+        assert calls == ([] if kept else ["Network"])
@@ -0,0 +1,87 @@
+import sys
+import json
+import threading
+import contextvars
+
+from app.src.itsm_agents import agents_direct, orchestrator_direct, tracing
+from app.src.itsm_agents.mcp_pool import MCPClientPool
+from app.src.itsm_agents.tracing import span, trace, waterfall
+from app.tests.conftest import fake_client, make_ticket
+
+VPN_TICKET = make_ticket("VPN not connecting", "VPN error 809 when connecting", tid="INC-VPN")
+
+ANSWERS = {
+    "classification": {
+        "category": "Network", "priority": "P3", "assignment_group": "CIS-Network-Ops",
+        "confidence": 0.7, "reason": "r",
+    },
+    "troubleshooting": {"probable_cause": "c", "steps": ["a", "b"], "data_needed": [], "risk_level": "Low"},
+    "communication": {"user_message": "m", "ticket_update": "u", "close_recommendation": False},
+}
+
+
+def _in_span(name):
+    with span(name):
+        pass
+
+
+def _by_name(tr):
+    return {s["name"]: s for s in tr.spans}
+
+
+def test_spans_nest_across_threads_and_export_jsonl(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    with trace("root", export=False) as tr:
+        with span("a") as sp:
+            sp.set(n=1)
+            worker = threading.Thread(target=contextvars.copy_context().run, args=(_in_span, "b"))
+            worker.start()
+            worker.join()
+    tracing.export_jsonl(tr, str(path))
+
+    spans = _by_name(tr)
+    assert spans["a"]["parent_id"] == spans["root"]["span_id"]
+    assert spans["a"]["attrs"] == {"n": 1}
+    assert spans["b"]["parent_id"] == spans["a"]["span_id"]  # worker thread joins the trace
+    lines = [json.loads(x) for x in path.read_text().splitlines()]
+    assert {x["trace_id"] for x in lines} == {tr.trace_id}
+    assert [r["name"] for r in waterfall(tr.spans)][:2] == ["root", "a"]
+
+    # outside a trace spans cost nothing and record nothing
+    with span("loose") as sp:
+        sp.set(x=1)
+
+
+def test_direct_run_records_stage_breakdown(monkeypatch):
+    monkeypatch.setattr(agents_direct, "_client", fake_client(lambda stage, user, schema: ANSWERS[stage]))
+    ticket = make_ticket("odd noise", "something is off", tid="INC-T")
+
+    with trace("test", export=False) as tr:
+        orchestrator_direct.run(ticket, classify=agents_direct.classify_ticket, troubleshoot=agents_direct.troubleshoot_ticket)
+
+    names = [s["name"] for s in tr.spans]
+    for stage in ANSWERS:
+        assert f"agent.{stage}" in names
+    assert names.count("prompt.build") == 3 and names.count("validate") == 3
+    assert names.count("llm.attempt") == 3
+    rows = waterfall(tr.spans)
+    assert rows[0]["name"] == "test" and rows[1]["name"] == "pipeline"
+    assert all(r["depth"] >= 2 for r in rows[2:])
+
+
+def test_trace_context_crosses_the_stdio_boundary():
+    pool = MCPClientPool(size=1, command=sys.executable, args=["-m", "itsm_agents.mcp_server"])
+    try:
+        with trace("test", export=False) as tr:
+            out = pool.call(lambda cli: cli.call_tool("classify_ticket_tool", {"ticket": VPN_TICKET.model_dump()}))
+        # server spans are moved into the trace, not left in the tool result
+        assert tracing.SPANS_KEY not in out and out["category"] == "VPN"
+
+        spans = _by_name(tr)
+        tool = spans["classify_ticket_tool"]
+        assert tool["service"] == "mcp-server" and tool["trace_id"] == tr.trace_id
+        assert tool["parent_id"] == spans["mcp.call_tool"]["span_id"]
+        assert spans["rules.fast_path"]["parent_id"] == tool["span_id"]
+        assert "transport_ms" in spans["mcp.call_tool"]["attrs"]
+    finally:
+        pool.close()
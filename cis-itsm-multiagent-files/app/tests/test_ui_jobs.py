@@ -0,0 +1,88 @@
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from app.src.itsm_agents.schemas import Ticket
+from app.src.itsm_agents.ui_jobs import new_memo, start_bulk, start_job, ticket_hash
+from app.tests.conftest import make_ticket
+
+TICKET = make_ticket("VPN not connecting", "Error 809")
+
+
+def test_ticket_hash_ignores_key_order_but_not_runner():
+    same = Ticket(**dict(reversed(list(TICKET.model_dump().items()))))
+    assert ticket_hash(same, "direct") == ticket_hash(TICKET, "direct")
+    assert ticket_hash(TICKET, "mcp") != ticket_hash(TICKET, "direct")
+
+
+def test_job_reports_stages_as_they_finish_then_memoizes():
+    gates = {"classification": threading.Event(), "troubleshooting": threading.Event()}
+    calls = []
+
+    def run(ticket, on_field=None):
+        calls.append(ticket.ticket_id)
+        on_field("classification", "category", "Network")
+        on_field("classification", None, {"category": "Network", "priority": "P3"})
+        gates["classification"].wait(5)
+        on_field("troubleshooting", None, {"steps": ["a"]})
+        gates["troubleshooting"].wait(5)
+        return {"classification": {"category": "Network", "priority": "P3"},
+                "troubleshooting": {"steps": ["a"]}, "communication": {"user_message": "m"}}
+
+    executor, memo = ThreadPoolExecutor(max_workers=1), new_memo()
+    job = start_job(executor, TICKET, "direct", run, memo)
+
+    while "classification" not in job.snapshot()["done_stages"]:
+        time.sleep(0.005)
+    snap = job.snapshot()
+    assert not snap["done"] and snap["stages"]["classification"]["priority"] == "P3"
+    assert snap["stages"]["troubleshooting"] == {}
+
+    gates["classification"].set()
+    gates["troubleshooting"].set()
+    job.future.result(5)
+    snap = job.snapshot()
+    assert snap["done"] and snap["done_stages"] == ["classification", "troubleshooting", "communication"]
+
+    again = start_job(executor, TICKET, "direct", run, memo)
+    assert again.done and again.snapshot()["memo_hit"] and again.output == snap["output"]
+    assert calls == ["INC1"]
+
+
+def test_failed_job_keeps_error_and_is_not_memoized():
+    def run(ticket, on_field=None):
+        raise RuntimeError("boom")
+
+    executor, memo = ThreadPoolExecutor(max_workers=1), new_memo()
+    job = start_job(executor, TICKET, "fused", run, memo)
+    job.future.result(5)
+    assert job.snapshot()["error"] == "RuntimeError: boom"
+    assert memo.get(job.key) is None
+
+
+def test_bulk_job_validates_rows_and_fills_table_in_input_order():
+    raw = [
+        {"ticket_id": f"INC{i}", "short_description": "VPN down", "description": "Error 809"} for i in range(6)
+    ] + [{"ticket_id": "BAD"}, "not json"]
+
+    def run(ticket, on_field=None):
+        time.sleep(0.01 * (6 - int(ticket.ticket_id[3:])))  # finish out of order
+        return {"ticket": ticket.model_dump(), "classification": {"category": "VPN", "priority": "P3"}}
+
+    memo = new_memo()
+    job = start_bulk(ThreadPoolExecutor(max_workers=1), raw, "direct", run, concurrency=3, memo=memo)
+    assert [r["status"] for r in job.snapshot()["rows"][6:]] == ["invalid", "invalid"]
+    job.future.result(5)
+
+    snap = job.snapshot()
+    assert snap["done"] and snap["counts"] == {"ok": 6, "invalid": 2}
+    assert [r["ticket_id"] for r in snap["rows"][:6]] == [f"INC{i}" for i in range(6)]
+    assert all(r["category"] == "VPN" and r["latency_ms"] > 0 for r in snap["rows"][:6])
+    lines = job.to_ndjson().splitlines()
+    assert len(lines) == 8 and json.loads(lines[0])["ticket"]["ticket_id"] == "INC0"
+    assert job.to_csv().splitlines()[0].startswith("row,ticket_id")
+
+    again = start_bulk(ThreadPoolExecutor(max_workers=1), raw[:2], "direct", run, memo=memo)
+    again.future.result(5)
+    assert all(r["cached"] for r in again.snapshot()["rows"])
@@ -0,0 +1,133 @@
+"""
+End-to-end latency: fused runner (one model request) vs direct runner (three requests).
+
+    python benchmarks/bench_fused.py --runs 5                      # simulated model
+    python benchmarks/bench_fused.py --runs 5 --rtt-ms 600 --tps 120
+    python benchmarks/bench_fused.py --runs 3 --live               # real Gemini calls
+
+The simulated model answers every request after rtt + output_tokens / tps seconds
+(output tokens ~ chars / 4 of a canned, valid answer), which is the part of the cost
+the fused runner changes: one round trip instead of three. With --live the real API is
+called (response cache off). The rule fast path and plan reuse are disabled so both
+runners always go to the model. Prints one JSON document with p50/mean per runner.
+"""
+import os
+import sys
+import json
+import glob
+import time
+import argparse
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "app", "src"))
+
+from itsm_agents import agents_direct, orchestrator_direct, orchestrator_fused  # noqa: E402
+from itsm_agents.schemas import Ticket  # noqa: E402
+
+SECTIONS = {
+    "classification": {
+        "category": "VPN", "priority": "P3", "assignment_group": "CIS-VPN-Support",
+        "confidence": 0.82, "reason": "VPN client error 809 points to blocked IKEv2/L2TP ports.",
+    },
+    "troubleshooting": {
+        "probable_cause": "Firewall or home router blocking VPN ports (UDP 500/4500).",
+        "steps": [
+            "Confirm the user is on a working internet connection.",
+            "Switch the VPN client to SSL/TCP mode and retry.",
+            "Restart the VPN service and the network adapter.",
+            "Try another network (mobile hotspot) to rule out the router.",
+        ],
+        "data_needed": ["Which network is the user connected to?"],
+        "risk_level": "Low",
+    },
+    "communication": {
+        "user_message": "Hi, we are looking into your VPN issue. Please switch the VPN client to SSL mode and tell us which network you are on.",
+        "ticket_update": "Classified VPN/P3. Probable cause: blocked VPN ports. Steps: SSL mode, restart service, alternate network.",
+        "close_recommendation": False,
+    },
+}
+
+
+class SimulatedClient:
+    """Stands in for GeminiClient: canned valid answers after rtt + output_tokens / tps."""
+
+    def __init__(self, rtt_s: float, tps: float):
+        self.rtt_s = rtt_s
+        self.tps = tps
+        self.calls = 0
+
+    def _answer(self, stage, schema):
+        if stage == "fused":
+            names = list(schema.model_fields) if schema is not None else list(SECTIONS)
+            return {name: SECTIONS[name] for name in names}
+        return SECTIONS[stage]
+
+    def generate_json(self, system, user, schema=None, stage=""):
+        self.calls += 1
+        data = self._answer(stage, schema)
+        time.sleep(self.rtt_s + len(json.dumps(data)) / 4 / self.tps)
+        return data
+
+    def generate_json_stream(self, system, user, on_field=None, timing=None, schema=None, stage=""):
+        data = self.generate_json(system, user, schema, stage)
+        for key, value in data.items():
+            if on_field is not None:
+                on_field(key, value)
+        return data
+
+
+def measure(run, tickets, runs):
+    walls = []
+    for _ in range(runs):
+        for t in tickets:
+            t0 = time.perf_counter()
+            run(t)
+            walls.append((time.perf_counter() - t0) * 1000)
+    return {
+        "pipelines": len(walls),
+        "p50_ms": round(statistics.median(walls), 1),
+        "mean_ms": round(statistics.fmean(walls), 1),
+        "max_ms": round(max(walls), 1),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=5, help="passes over the sample tickets")
+    ap.add_argument("--rtt-ms", type=float, default=400.0, help="simulated per-request overhead")
+    ap.add_argument("--tps", type=float, default=150.0, help="simulated output tokens per second")
+    ap.add_argument("--live", action="store_true", help="call the real model (needs GEMINI_API_KEY)")
+    args = ap.parse_args()
+
+    paths = sorted(glob.glob(os.path.join(ROOT, "samples", "*.json")))
+    tickets = [Ticket(**json.load(open(p, encoding="utf-8"))) for p in paths]
+
+    # both runners go to the model for every stage
+    run_direct = lambda t: orchestrator_direct.run(
+        t, classify=agents_direct.classify_ticket, troubleshoot=agents_direct.troubleshoot_ticket
+    )
+    orchestrator_fused.try_fast_path = lambda ticket: None
+    orchestrator_fused.PLAN_REUSE_THRESHOLD = 2.0
+
+    if args.live:
+        from itsm_agents.gemini_client import GeminiClient
+
+        agents_direct._client = GeminiClient(cache=None)
+        backend = {"model": agents_direct._client.model}
+    else:
+        agents_direct._client = SimulatedClient(args.rtt_ms / 1000, args.tps)
+        backend = {"simulated": True, "rtt_ms": args.rtt_ms, "tokens_per_s": args.tps}
+
+    direct = measure(run_direct, tickets, args.runs)
+    fused = measure(orchestrator_fused.run, tickets, args.runs)
+    print(json.dumps({
+        "backend": backend,
+        "direct": direct,
+        "fused": fused,
+        "p50_speedup": round(direct["p50_ms"] / fused["p50_ms"], 2),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Parse cost of json_utils.load_json_strict vs the previous regex/bracket-counting version.
+
+    python benchmarks/bench_json_utils.py --size 200 --repeat 200
+
+Inputs are model-shaped Troubleshooting outputs (`--size` steps): clean, wrapped in a
+```json fence, with trailing commas, and truncated mid-string. Prints one JSON document
+with mean microseconds per parse and whether each implementation recovered the object.
+"""
+import os
+import re
+import sys
+import json
+import time
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "app", "src"))
+
+from itsm_agents.json_utils import load_json_strict  # noqa: E402
+
+
+def legacy_load(text):
+    text = (text or "").strip()
+    fence = re.search(r"```(?:json)?\s*(\{.*?\})\s*```", text, flags=re.DOTALL | re.IGNORECASE)
+    if fence:
+        s = fence.group(1).strip()
+    else:
+        start, end = text.find("{"), text.rfind("}")
+        s = text[start:end + 1].strip() if start != -1 and end > start else text
+    try:
+        return json.loads(s)
+    except json.JSONDecodeError:
+        s = re.sub(r",\s*$", "", re.sub(r",\s*([\]}])", r"\1", s))
+        s += "]" * max(0, s.count("[") - s.count("]"))
+        s += "}" * max(0, s.count("{") - s.count("}"))
+        try:
+            return json.loads(s)
+        except json.JSONDecodeError:
+            return {}
+
+
+def inputs(size):
+    doc = {
+        "hypotheses": [f"Cause {i}: adapter {{config}} drift, see [KB{i}]" for i in range(size // 4)],
+        "steps": [f"Step {i}: run `ipconfig /all`, check \"DNS\", retry" for i in range(size)],
+        "questions_for_user": ["Which network are you on?"],
+        "escalation_criteria": ["Error persists after reboot"],
+    }
+    clean = json.dumps(doc, indent=2)
+    return {
+        "clean": clean,
+        "fenced": f"Here is the plan:\n```json\n{clean}\n```",
+        "trailing_commas": clean.replace('"\n  ]', '",\n  ]'),
+        "truncated": clean[: int(len(clean) * 0.6)],
+    }
+
+
+def bench(fn, text, repeat):
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        result = fn(text)
+    return (time.perf_counter() - t0) / repeat * 1e6, bool(result)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--size", type=int, default=200, help="troubleshooting steps per document")
+    ap.add_argument("--repeat", type=int, default=200)
+    args = ap.parse_args()
+
+    report = {"size": args.size, "cases": {}}
+    for name, text in inputs(args.size).items():
+        new_us, new_ok = bench(load_json_strict, text, args.repeat)
+        old_us, old_ok = bench(legacy_load, text, args.repeat)
+        report["cases"][name] = {
+            "bytes": len(text),
+            "new_us": round(new_us, 1),
+            "legacy_us": round(old_us, 1),
+            "new_recovered": new_ok,
+            "legacy_recovered": old_ok,
+        }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
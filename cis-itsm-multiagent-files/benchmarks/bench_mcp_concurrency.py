@@ -0,0 +1,108 @@
+"""
+N concurrent tool calls on ONE MCP session against one server process.
+
+    python benchmarks/bench_mcp_concurrency.py                          # N = 1,2,4,8,16,32
+    python benchmarks/bench_mcp_concurrency.py --calls 1,8,64 --cap 16 --latency const:800
+    python benchmarks/bench_mcp_concurrency.py --tool compose_response_tool --rounds 5
+
+Spawns `python -m itsm_agents.mcp_server` (stdio) with the fake model backend (see
+fake_llm.py; no API key) and MCP_SERVER_MAX_CONCURRENCY=--cap, opens one session and,
+for each N, fires N `call_tool` requests at once (asyncio.gather) and waits for all of
+them. The rule fast path and plan reuse are off so every call reaches the model.
+
+With async tool handlers, N calls up to the cap finish in about one call's latency
+(ratio ~1); above the cap they go in waves (ratio ~ceil(N / cap)). Reports, per N, the
+median wall time over --rounds, the ratio to the N=1 time and the expected ratio.
+Prints one JSON document.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_SRC = os.path.join(ROOT, "app", "src")
+
+TICKET = {"ticket_id": "BENCH-1", "short_description": "VPN not connecting", "description": "Error 809"}
+CLASSIFICATION = {
+    "category": "VPN", "priority": "P3", "assignment_group": "CIS-VPN-Support", "confidence": 0.8, "reason": "r",
+}
+TROUBLESHOOTING = {"probable_cause": "c", "steps": ["a", "b"], "data_needed": [], "risk_level": "Low"}
+ARGUMENTS = {
+    "classify_ticket_tool": {"ticket": TICKET},
+    "troubleshoot_ticket_tool": {"ticket": TICKET, "classification": CLASSIFICATION},
+    "compose_response_tool": {"ticket": TICKET, "classification": CLASSIFICATION, "troubleshooting": TROUBLESHOOTING},
+}
+
+
+def _ints(text):
+    return [int(x) for x in text.split(",") if x.strip()]
+
+
+async def bench(args) -> dict:
+    sys.path.insert(0, APP_SRC)
+    from itsm_agents.mcp_client import MCPToolClient
+
+    env = os.environ.copy()
+    env.update({
+        "LLM_BACKEND": "fake",
+        "FAKE_LLM_LATENCY": args.latency,
+        "LLM_CACHE": "off",
+        "TRACE_EXPORT_PATH": "",
+        "FAST_PATH_THRESHOLD": "2",
+        "PLAN_REUSE_THRESHOLD": "2",
+        "MCP_SERVER_MAX_CONCURRENCY": str(args.cap),
+    })
+    arguments = ARGUMENTS[args.tool]
+
+    async with MCPToolClient(command=sys.executable, args=["-m", "itsm_agents.mcp_server"], env=env, url="") as cli:
+        await cli.call_tool(args.tool, arguments)  # warm-up: model client, imports
+
+        results = []
+        for n in _ints(args.calls):
+            walls = []
+            for _ in range(args.rounds):
+                t0 = time.perf_counter()
+                outs = await asyncio.gather(*(cli.call_tool(args.tool, arguments) for _ in range(n)))
+                walls.append(time.perf_counter() - t0)
+                assert all(isinstance(o, dict) and "raw_text" not in o for o in outs), outs[0]
+            results.append({"calls": n, "wall_ms": round(statistics.median(walls) * 1000, 1)})
+
+    base = results[0]["wall_ms"] / (-(-results[0]["calls"] // args.cap))
+    for r in results:
+        r["ratio_to_one_call"] = round(r["wall_ms"] / base, 2)
+        r["expected_ratio"] = -(-r["calls"] // args.cap)
+    return {
+        "tool": args.tool,
+        "fake_latency": args.latency,
+        "server_concurrency_cap": args.cap,
+        "rounds": args.rounds,
+        "python": sys.version.split()[0],
+        "cpus": os.cpu_count(),
+        "results": results,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--calls", default="1,2,4,8,16,32", help="comma-separated concurrent calls (first = baseline)")
+    ap.add_argument("--cap", type=int, default=16, help="MCP_SERVER_MAX_CONCURRENCY of the server")
+    ap.add_argument("--latency", default="const:500", help="fake model latency spec (see fake_llm.LatencyModel)")
+    ap.add_argument("--tool", choices=list(ARGUMENTS), default="classify_ticket_tool")
+    ap.add_argument("--rounds", type=int, default=3, help="repetitions per N (median reported)")
+    ap.add_argument("--output", help="also write the JSON report here")
+    args = ap.parse_args()
+
+    report = asyncio.run(bench(args))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
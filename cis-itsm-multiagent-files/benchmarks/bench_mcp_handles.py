@@ -0,0 +1,145 @@
+"""
+Context handles vs full payloads on the granular MCP tools (MCP_PIPELINE=tools).
+
+    python benchmarks/bench_mcp_handles.py                                  # 2 KB, 64 KB, 512 KB descriptions
+    python benchmarks/bench_mcp_handles.py --sizes-kb 16,256,2048 --tickets 10
+
+Spawns one stdio `python -m itsm_agents.mcp_server` with the fake model backend (see
+fake_llm.py; no API key or network needed) and runs tickets whose description carries
+an attached log of --sizes-kb through orchestrator_mcp's three-call pipeline, once
+sending the ticket and stage outputs on every call (handles off) and once sending
+them on the first call only and a context handle afterwards (handles on).
+
+Per size and mode, per ticket (median over --tickets): request bytes (JSON arguments
+of the three calls), server-side argument parsing/validation (`tool.parse_args`
+spans), JSON-RPC transport time (round trip minus server time, which includes the
+SDK's framing and parsing on both ends) and wall time. Prints one JSON document.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_SRC = os.path.join(ROOT, "app", "src")
+
+
+def _description(kb: int, seed: int) -> str:
+    head = f"VPN drops every few minutes since this morning (user {seed}). Attached client log:\n"
+    lines, size, i = [], len(head), 0
+    while size < kb * 1024:
+        line = (
+            f"2024-05-0{1 + i % 9}T08:{i // 60 % 60:02d}:{i % 60:02d}Z vpnagent[{4100 + seed}]: "
+            f"tunnel state={'UP' if i % 7 else 'DOWN'} peer=10.12.{i % 255}.{seed % 255} rtt={20 + i % 90}ms "
+            f"err={809 if i % 13 == 0 else 0}\n"
+        )
+        lines.append(line)
+        size += len(line)
+        i += 1
+    return head + "".join(lines)
+
+
+class _Counting:
+    """Forwards call_tool and adds up the JSON size of the arguments sent."""
+
+    def __init__(self, cli):
+        self.cli = cli
+        self.sent = 0
+
+    async def call_tool(self, tool_name, arguments, **kwargs):
+        self.sent += len(json.dumps(arguments).encode("utf-8"))
+        return await self.cli.call_tool(tool_name, arguments, **kwargs)
+
+
+async def bench(args) -> dict:
+    sys.path.insert(0, APP_SRC)
+    from itsm_agents.mcp_client import MCPToolClient
+    from itsm_agents.orchestrator_mcp import _pipeline
+    from itsm_agents.schemas import Ticket
+    from itsm_agents.tracing import trace
+
+    env = os.environ.copy()
+    env.update({
+        "LLM_BACKEND": "fake",
+        "FAKE_LLM_LATENCY": args.latency,
+        "LLM_CACHE": "off",
+        "TRACE_EXPORT_PATH": "",
+        "FAST_PATH_THRESHOLD": "2",
+        "PLAN_REUSE_THRESHOLD": "2",
+    })
+
+    results = []
+    async with MCPToolClient(command=sys.executable, args=["-m", "itsm_agents.mcp_server"], env=env, url="") as cli:
+        for kb in [int(x) for x in args.sizes_kb.split(",") if x.strip()]:
+            tickets = [
+                Ticket(ticket_id=f"H-{kb}-{i}", short_description="VPN dropping", description=_description(kb, i))
+                for i in range(args.tickets)
+            ]
+            await _pipeline(cli, tickets[0], handles=False)  # warm-up
+            for handles in (False, True):
+                rows = []
+                for t in tickets:
+                    counting = _Counting(cli)
+                    t0 = time.perf_counter()
+                    with trace("bench", export=False) as tr:
+                        await _pipeline(counting, t, handles=handles)
+                    wall = (time.perf_counter() - t0) * 1000
+                    spans = tr.spans
+                    rows.append({
+                        "request_bytes": counting.sent,
+                        "parse_args_ms": sum(s["duration_ms"] for s in spans if s["name"] == "tool.parse_args"),
+                        "transport_ms": sum(
+                            s["attrs"].get("transport_ms", 0.0) for s in spans if s["name"] == "mcp.call_tool"
+                        ),
+                        "wall_ms": wall,
+                    })
+                results.append({
+                    "description_kb": kb,
+                    "handles": handles,
+                    **{k: round(statistics.median(r[k] for r in rows), 2) for k in rows[0]},
+                })
+
+    by_size = {}
+    for r in results:
+        by_size.setdefault(r["description_kb"], {})[r["handles"]] = r
+    savings = [
+        {
+            "description_kb": kb,
+            "request_bytes_saved_pct": round(100 * (1 - m[True]["request_bytes"] / m[False]["request_bytes"]), 1),
+            "parse_args_speedup": round(m[False]["parse_args_ms"] / max(m[True]["parse_args_ms"], 1e-3), 1),
+            "transport_speedup": round(m[False]["transport_ms"] / max(m[True]["transport_ms"], 1e-3), 2),
+            "wall_speedup": round(m[False]["wall_ms"] / m[True]["wall_ms"], 2),
+        }
+        for kb, m in by_size.items()
+    ]
+    return {
+        "fake_latency": args.latency,
+        "tickets": args.tickets,
+        "python": sys.version.split()[0],
+        "cpus": os.cpu_count(),
+        "results": results,
+        "savings": savings,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes-kb", default="2,64,512", help="comma-separated description sizes (KB, log attached)")
+    ap.add_argument("--tickets", type=int, default=5, help="tickets per size and mode (median reported)")
+    ap.add_argument("--latency", default="const:5", help="fake model latency spec (see fake_llm.LatencyModel)")
+    ap.add_argument("--output", help="also write the JSON report here")
+    args = ap.parse_args()
+
+    report = asyncio.run(bench(args))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
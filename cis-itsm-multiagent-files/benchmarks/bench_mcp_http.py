@@ -0,0 +1,225 @@
+"""
+Load test: many orchestrator processes against ONE shared MCP server over streamable HTTP.
+
+    python benchmarks/bench_mcp_http.py                                     # 4 clients x 25 tickets
+    python benchmarks/bench_mcp_http.py --clients 8 --tickets 50 --pool-size 8 --server-concurrency 32
+    python benchmarks/bench_mcp_http.py --transport stdio                   # same load, per-client stdio servers
+
+Starts `python -m itsm_agents.mcp_server --transport streamable-http` on a free local
+port with the fake model backend (see fake_llm.py; no API key or network needed), waits
+until it accepts connections, then launches --clients orchestrator processes at once.
+Each client sets MCP_SERVER_URL, opens --pool-size sessions (mcp_pool; connections are
+reused across tickets) and runs --tickets tickets through orchestrator_mcp with
+--pool-size in flight. The server runs at most --server-concurrency tool calls at a time.
+
+With --transport stdio the same clients spawn their own --pool-size stdio servers
+instead (the pre-HTTP setup), for comparison of throughput and server memory.
+
+Reports overall throughput (all tickets / first start to last finish), merged latency
+percentiles, failures, per-client session start-up, and the server's CPU seconds and
+peak RSS (Linux /proc; stdio: largest server per client). Prints one JSON document.
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import resource
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_SRC = os.path.join(ROOT, "app", "src")
+sys.path.insert(0, APP_SRC)
+
+from itsm_agents.metrics import percentile  # noqa: E402
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_port(port: int, proc: subprocess.Popen, timeout_s: float = 60) -> float:
+    t0 = time.perf_counter()
+    while time.perf_counter() - t0 < timeout_s:
+        if proc.poll() is not None:
+            raise RuntimeError(f"server exited with {proc.returncode}")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return time.perf_counter() - t0
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"server not listening on {port} after {timeout_s}s")
+
+
+def _proc_usage(pid: int) -> dict:
+    """CPU seconds and peak RSS of a live process (Linux only; empty elsewhere)."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        ticks = os.sysconf("SC_CLK_TCK")
+        cpu_s = (int(fields[11]) + int(fields[12])) / ticks
+        with open(f"/proc/{pid}/status") as f:
+            hwm = next(line for line in f if line.startswith("VmHWM:"))
+        return {"cpu_s": round(cpu_s, 3), "peak_rss_mb": round(int(hwm.split()[1]) / 1024, 1)}
+    except (OSError, StopIteration, ValueError):
+        return {}
+
+
+# -------------------------
+# Client worker: one orchestrator process
+# -------------------------
+def worker(cfg: dict) -> dict:
+    from itsm_agents.batch import run_batch
+    from itsm_agents.mcp_pool import get_pool
+    from itsm_agents.orchestrator_mcp import run
+
+    async def _list_tools(cli):
+        return await cli.list_tools()
+
+    t0 = time.perf_counter()
+    pool = get_pool()
+    while pool.stats()["idle"] < pool.size and time.perf_counter() - t0 < 120:
+        pool.call(_list_tools)
+        time.sleep(0.02)
+    startup_s = time.perf_counter() - t0
+
+    tickets = [
+        {
+            "ticket_id": f"C{cfg['client']}-{i:04d}",
+            "short_description": ["VPN not connecting", "Outlook not opening", "Disk almost full"][i % 3],
+            "description": f"Reported by client {cfg['client']}, case {i}",
+        }
+        for i in range(cfg["tickets"])
+    ]
+    latencies = []
+    started = time.time()
+    summary = run_batch(
+        tickets, run, None, concurrency=cfg["pool_size"], runner="mcp",
+        on_result=lambda i, r: latencies.append(r["latency_ms"]),
+    )
+    finished = time.time()
+    pool.close()
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return {
+        "client": cfg["client"],
+        "ok": summary["ok"],
+        "failed": summary["failed"],
+        "startup_s": round(startup_s, 3),
+        "started": started,
+        "finished": finished,
+        "latencies_ms": latencies,
+        "stdio_server_max_rss_mb": round(children.ru_maxrss / 1024, 1) if children.ru_maxrss else None,
+    }
+
+
+# -------------------------
+# Driver
+# -------------------------
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--transport", choices=["streamable-http", "stdio"], default="streamable-http")
+    ap.add_argument("--clients", type=int, default=4, help="orchestrator processes")
+    ap.add_argument("--tickets", type=int, default=25, help="tickets per client")
+    ap.add_argument("--pool-size", type=int, default=4, help="MCP sessions (= tickets in flight) per client")
+    ap.add_argument("--server-concurrency", type=int, default=16, help="shared server: tool calls at once")
+    ap.add_argument("--latency", default="lognormal:200:0.5", help="fake model latency spec")
+    ap.add_argument("--shortcuts", action="store_true", help="keep rule fast path and plan reuse on")
+    ap.add_argument("--output", help="also write the JSON report here")
+    ap.add_argument("--worker", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.worker:
+        print(json.dumps(worker(json.loads(args.worker))))
+        return
+
+    env = os.environ.copy()
+    env.update({
+        "PYTHONPATH": APP_SRC + os.pathsep + env.get("PYTHONPATH", ""),
+        "LLM_BACKEND": "fake",
+        "FAKE_LLM_LATENCY": args.latency,
+        "LLM_CACHE": "off",
+        "TRACE_EXPORT_PATH": "",
+        "MCP_POOL_SIZE": str(args.pool_size),
+        "MCP_SERVER_MAX_CONCURRENCY": str(args.server_concurrency),
+    })
+    if not args.shortcuts:
+        env["FAST_PATH_THRESHOLD"] = "2"
+        env["PLAN_REUSE_THRESHOLD"] = "2"
+
+    server = None
+    server_ready_s = None
+    if args.transport == "streamable-http":
+        port = _free_port()
+        server = subprocess.Popen(
+            [sys.executable, "-m", "itsm_agents.mcp_server", "--transport", "streamable-http", "--port", str(port)],
+            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        server_ready_s = _wait_port(port, server)
+        env["MCP_SERVER_URL"] = f"http://127.0.0.1:{port}/mcp"
+    else:
+        env.pop("MCP_SERVER_URL", None)
+
+    try:
+        clients = [
+            subprocess.Popen(
+                [sys.executable, os.path.abspath(__file__), "--worker",
+                 json.dumps({"client": c, "tickets": args.tickets, "pool_size": args.pool_size})],
+                env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+            )
+            for c in range(args.clients)
+        ]
+        results, errors = [], []
+        for proc in clients:
+            out, err = proc.communicate()
+            if proc.returncode != 0:
+                errors.append((err.strip().splitlines() or ["client failed"])[-1])
+            else:
+                results.append(json.loads(out.strip().splitlines()[-1]))
+        server_usage = _proc_usage(server.pid) if server is not None else {}
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+
+    latencies = sorted(x for r in results for x in r.pop("latencies_ms"))
+    total = sum(r["ok"] + r["failed"] for r in results)
+    wall_s = (max(r["finished"] for r in results) - min(r["started"] for r in results)) if results else 0.0
+    if args.transport == "stdio":
+        server_usage = {
+            "processes": args.clients * args.pool_size,
+            "peak_rss_mb_each": max((r["stdio_server_max_rss_mb"] or 0) for r in results) if results else None,
+        }
+    else:
+        server_usage = {"processes": 1, "ready_s": round(server_ready_s, 3), **server_usage}
+
+    report = {
+        "transport": args.transport,
+        "clients": args.clients,
+        "tickets_per_client": args.tickets,
+        "pool_size": args.pool_size,
+        "server_concurrency": args.server_concurrency if args.transport != "stdio" else None,
+        "fake_latency": args.latency,
+        "tickets": total,
+        "ok": sum(r["ok"] for r in results),
+        "failed": sum(r["failed"] for r in results),
+        "client_errors": errors,
+        "wall_s": round(wall_s, 3),
+        "throughput_tps": round(total / wall_s, 3) if wall_s else 0.0,
+        "latency_ms": {p: round(percentile(latencies, int(p[1:])) or 0.0, 1) for p in ("p50", "p95", "p99")},
+        "client_startup_s": [r["startup_s"] for r in results],
+        "server": server_usage,
+        "python": sys.version.split()[0],
+        "cpus": os.cpu_count(),
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
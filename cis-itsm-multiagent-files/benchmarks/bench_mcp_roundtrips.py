@@ -0,0 +1,164 @@
+"""
+MCP round trips per ticket: granular tools vs run_pipeline_tool vs run_batch_tool.
+
+    python benchmarks/bench_mcp_roundtrips.py                               # 40 tickets, 4 in flight
+    python benchmarks/bench_mcp_roundtrips.py --tickets 200 --concurrency 8 --latency const:5
+    python benchmarks/bench_mcp_roundtrips.py --transport streamable-http   # one shared HTTP server
+
+Runs the same tickets through orchestrator_mcp in three modes against the fake model
+backend (see fake_llm.py; no API key or network needed):
+
+    tools   run(pipeline="tools")   3 tool calls per ticket, stages chained by the client
+    server  run(pipeline="server")  1 run_pipeline_tool call per ticket
+    batch   run_many(...)           1 run_batch_tool call for all tickets
+
+`tools` and `server` go through batch.run_batch with --concurrency tickets in flight on
+a pool of --concurrency sessions; `batch` hands every ticket to one session and lets
+the server run --concurrency at a time. With a short model latency the per-call MCP
+overhead (JSON-RPC framing, validation, scheduling) dominates, which is what the modes
+differ in. The rule fast path and plan reuse are off so every stage reaches the model.
+
+Reports per mode: wall time, throughput, tool calls (round trips) and the speed-up
+over `tools`. Prints one JSON document.
+"""
+import os
+import io
+import sys
+import json
+import time
+import socket
+import argparse
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_SRC = os.path.join(ROOT, "app", "src")
+SUMMARIES = ["VPN not connecting", "Outlook not opening", "Disk almost full", "Printer offline"]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_port(port: int, proc: subprocess.Popen, timeout_s: float = 60):
+    deadline = time.monotonic() + timeout_s
+    while True:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return
+        except OSError:
+            if proc.poll() is not None or time.monotonic() > deadline:
+                raise RuntimeError("MCP server did not start")
+            time.sleep(0.05)
+
+
+def bench(args) -> dict:
+    sys.path.insert(0, APP_SRC)
+    from itsm_agents.batch import run_batch
+    from itsm_agents.mcp_pool import get_pool
+    from itsm_agents.orchestrator_mcp import run, run_many
+
+    async def _list_tools(cli):
+        return await cli.list_tools()
+
+    pool = get_pool()
+    t0 = time.perf_counter()
+    while pool.stats()["idle"] < pool.size and time.perf_counter() - t0 < 120:
+        pool.call(_list_tools)  # warm every session before timing
+        time.sleep(0.02)
+
+    tickets = [
+        {
+            "ticket_id": f"RT-{i:05d}",
+            "short_description": SUMMARIES[i % len(SUMMARIES)],
+            "description": f"Reported by user {i}; started this morning (case {i})",
+        }
+        for i in range(args.tickets)
+    ]
+
+    results = []
+    for mode in ("tools", "server", "batch"):
+        t0 = time.perf_counter()
+        if mode == "batch":
+            out = run_many(tickets, concurrency=args.concurrency)["summary"]
+            ok, failed, calls = out["ok"], out["failed"], 1
+        else:
+            out = run_batch(
+                tickets, lambda t: run(t, pipeline=mode), io.StringIO(),
+                concurrency=args.concurrency, runner="mcp",
+            )
+            ok, failed = out["ok"], out["failed"]
+            calls = len(tickets) * (3 if mode == "tools" else 1)
+        wall = time.perf_counter() - t0
+        results.append({
+            "mode": mode,
+            "ok": ok,
+            "failed": failed,
+            "tool_calls": calls,
+            "wall_s": round(wall, 3),
+            "throughput_tps": round(len(tickets) / wall, 2),
+        })
+    pool.close()
+
+    base = results[0]["wall_s"]
+    for r in results:
+        r["speedup_vs_tools"] = round(base / r["wall_s"], 2) if r["wall_s"] else None
+    return {
+        "transport": args.transport,
+        "tickets": args.tickets,
+        "concurrency": args.concurrency,
+        "fake_latency": args.latency,
+        "python": sys.version.split()[0],
+        "cpus": os.cpu_count(),
+        "results": results,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--tickets", type=int, default=40)
+    ap.add_argument("--concurrency", type=int, default=4, help="tickets in flight (= pool sessions)")
+    ap.add_argument("--latency", default="const:10", help="fake model latency spec (see fake_llm.LatencyModel)")
+    ap.add_argument("--transport", choices=["stdio", "streamable-http"], default="stdio")
+    ap.add_argument("--output", help="also write the JSON report here")
+    args = ap.parse_args()
+
+    os.environ.update({
+        "LLM_BACKEND": "fake",
+        "FAKE_LLM_LATENCY": args.latency,
+        "LLM_CACHE": "off",
+        "TRACE_EXPORT_PATH": "",
+        "FAST_PATH_THRESHOLD": "2",
+        "PLAN_REUSE_THRESHOLD": "2",
+        "MCP_POOL_SIZE": str(args.concurrency),
+        "MCP_SERVER_MAX_CONCURRENCY": str(max(16, 3 * args.concurrency)),
+    })
+    server = None
+    if args.transport == "streamable-http":
+        port = _free_port()
+        server = subprocess.Popen(
+            [sys.executable, "-m", "itsm_agents.mcp_server", "--transport", "streamable-http", "--port", str(port)],
+            env={**os.environ, "PYTHONPATH": APP_SRC}, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        _wait_port(port, server)
+        os.environ["MCP_SERVER_URL"] = f"http://127.0.0.1:{port}/mcp"
+    else:
+        os.environ.pop("MCP_SERVER_URL", None)
+
+    try:
+        report = bench(args)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""
+Offline throughput/latency suite: direct and mcp runners against the fake model backend.
+
+    python benchmarks/bench_pipeline.py                                   # default grid
+    python benchmarks/bench_pipeline.py --runners direct,mcp --tickets 20,100 --concurrency 1,4,16
+    python benchmarks/bench_pipeline.py --latency lognormal:300:0.6 --error-rate 0.02 --output bench.json
+    python benchmarks/bench_pipeline.py --backend replay --cassette day.jsonl --input day_tickets.jsonl \
+        --replay-timing 0.25 --tickets 500 --concurrency 32             # replay a recorded day
+
+Every (runner, tickets, concurrency) configuration runs in a fresh worker process with
+LLM_BACKEND=fake (see fake_llm.py), so the MCP server subprocesses use the same fake
+model and peak RSS is per configuration. No API key or network is needed. Tickets are
+the samples, repeated with unique ids/text. The rule fast path, plan reuse and response
+cache are off unless --shortcuts, so every stage reaches the (fake) model.
+
+With --backend replay, the model answers come from a cassette recorded with
+LLM_BACKEND=record (see cassette.py), scaled by --replay-timing, and the tickets come
+from --input (cycled up to the ticket count). Record with the same --shortcuts setting
+you replay with, otherwise the prompts differ and replay reports cassette misses.
+
+Per configuration: throughput, p50/p95/p99 latency, failures, model calls, CPU seconds
+(pipeline process during the run; MCP servers over their lifetime) and peak RSS
+(pipeline process; largest MCP server). MCP pool start-up is measured separately
+(startup_s) and the pool holds one server per in-flight ticket unless --mcp-pool-size.
+Prints one JSON document (also written to --output).
+"""
+import os
+import io
+import sys
+import glob
+import json
+import time
+import argparse
+import tempfile
+import resource
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_SRC = os.path.join(ROOT, "app", "src")
+
+
+def _ints(text):
+    return [int(x) for x in text.split(",") if x.strip()]
+
+
+def _rss_mb(maxrss: int) -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return round(maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _tickets(n, source=None):
+    if source:
+        from itsm_agents.batch import iter_tickets
+
+        recorded = list(iter_tickets(source))
+        return [recorded[i % len(recorded)] for i in range(n)]
+    paths = sorted(glob.glob(os.path.join(ROOT, "samples", "*.json")))
+    samples = [json.load(open(p, encoding="utf-8")) for p in paths]
+    return [
+        {
+            **samples[i % len(samples)],
+            "ticket_id": f"BENCH-{i:05d}",
+            "description": f"{samples[i % len(samples)]['description']} (case {i})",
+        }
+        for i in range(n)
+    ]
+
+
+# -------------------------
+# Worker: one configuration, in its own process
+# -------------------------
+def worker(cfg: dict, source: str = None) -> dict:
+    sys.path.insert(0, APP_SRC)
+    from itsm_agents import agents_direct
+    from itsm_agents.batch import run_batch
+    from itsm_agents.orchestrator_direct import run as run_direct
+
+    startup_s = 0.0
+    pool = None
+    if cfg["runner"] == "mcp":
+        from itsm_agents.mcp_pool import get_pool
+        from itsm_agents.orchestrator_mcp import run
+
+        async def _list_tools(cli):
+            return await cli.list_tools()
+
+        t0 = time.perf_counter()
+        pool = get_pool()
+        # wait until every server is up, so the run measures warm sessions only
+        while pool.stats()["idle"] < pool.size and time.perf_counter() - t0 < 120:
+            pool.call(_list_tools)
+            time.sleep(0.05)
+        startup_s = time.perf_counter() - t0
+    else:
+        run = run_direct
+
+    tickets = _tickets(cfg["tickets"], source)
+    cpu0 = resource.getrusage(resource.RUSAGE_SELF)
+    summary = run_batch(tickets, run, io.StringIO(), concurrency=cfg["concurrency"], runner=cfg["runner"])
+    cpu1 = resource.getrusage(resource.RUSAGE_SELF)
+
+    model = agents_direct.client().stats() if cfg["runner"] == "direct" else None
+    if pool is not None:
+        pool.close()  # servers exit and are reaped, so RUSAGE_CHILDREN covers them
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+    result = {
+        **cfg,
+        "ok": summary["ok"],
+        "failed": summary["failed"],
+        "wall_s": summary["wall_s"],
+        "throughput_tps": summary["throughput_tps"],
+        "latency_ms": summary["latency_ms"],
+        "cpu_s": {"pipeline": round(cpu1.ru_utime + cpu1.ru_stime - cpu0.ru_utime - cpu0.ru_stime, 3)},
+        "peak_rss_mb": {"pipeline": _rss_mb(cpu1.ru_maxrss)},
+    }
+    if model is not None:
+        result["model"] = model
+    if pool is not None:
+        result["startup_s"] = round(startup_s, 3)
+        result["cpu_s"]["mcp_servers"] = round(children.ru_utime + children.ru_stime, 3)
+        result["peak_rss_mb"]["mcp_server_max"] = _rss_mb(children.ru_maxrss)
+    return result
+
+
+# -------------------------
+# Driver
+# -------------------------
+def run_config(cfg: dict, args, cache_dir: str) -> dict:
+    env = os.environ.copy()
+    env.update({
+        "PYTHONPATH": APP_SRC + os.pathsep + env.get("PYTHONPATH", ""),
+        "LLM_BACKEND": args.backend,
+        "FAKE_LLM_LATENCY": args.latency,
+        "FAKE_LLM_ERROR_RATE": str(args.error_rate),
+        "LLM_CACHE": "off",
+        "TRACE_EXPORT_PATH": "",
+        "PLAN_INDEX_PATH": os.path.join(cache_dir, "plan_index.npz"),
+        "MCP_POOL_SIZE": str(args.mcp_pool_size or cfg["concurrency"]),
+    })
+    if args.seed is not None:
+        env["FAKE_LLM_SEED"] = str(args.seed)
+    if args.backend == "replay":
+        env["CASSETTE_PATH"] = os.path.abspath(args.cassette)
+        env["REPLAY_TIMING"] = str(args.replay_timing)
+    if not args.shortcuts:
+        env["FAST_PATH_THRESHOLD"] = "2"
+        env["PLAN_REUSE_THRESHOLD"] = "2"
+    cmd = [sys.executable, os.path.abspath(__file__), "--worker", json.dumps(cfg)]
+    if args.input:
+        cmd += ["--input", os.path.abspath(args.input)]
+    proc = subprocess.run(
+        cmd,
+        env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        return {**cfg, "error": proc.stderr.strip().splitlines()[-1:] or ["worker failed"]}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runners", default="direct,mcp", help="comma-separated: direct, mcp")
+    ap.add_argument("--tickets", default="20,60", help="comma-separated ticket counts")
+    ap.add_argument("--concurrency", default="1,4,8", help="comma-separated tickets in flight")
+    ap.add_argument("--backend", choices=["fake", "replay"], default="fake", help="model backend")
+    ap.add_argument("--cassette", help="--backend replay: cassette recorded with LLM_BACKEND=record")
+    ap.add_argument("--replay-timing", type=float, default=1.0, help="replay latency scale (1 = original, 0 = none)")
+    ap.add_argument("--input", help="ticket source (dir / JSONL / JSON), cycled; default: the samples")
+    ap.add_argument("--latency", default="lognormal:200:0.5", help="fake model latency spec (see fake_llm.LatencyModel)")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="share of fake model calls failing with a 503")
+    ap.add_argument("--seed", type=int, default=7, help="fake model RNG seed")
+    ap.add_argument("--shortcuts", action="store_true", help="keep rule fast path and plan reuse on")
+    ap.add_argument("--mcp-pool-size", type=int, default=0, help="MCP servers (default: = concurrency)")
+    ap.add_argument("--output", help="also write the JSON report here")
+    ap.add_argument("--worker", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.worker:
+        print(json.dumps(worker(json.loads(args.worker), args.input)))
+        return
+    if args.backend == "replay" and not (args.cassette and args.input):
+        ap.error("--backend replay needs --cassette and --input")
+
+    results = []
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for runner in args.runners.split(","):
+            for n in _ints(args.tickets):
+                for c in _ints(args.concurrency):
+                    cfg = {"runner": runner.strip(), "tickets": n, "concurrency": c}
+                    results.append(run_config(cfg, args, cache_dir))
+                    print(json.dumps(results[-1]), file=sys.stderr, flush=True)
+
+    report = {
+        "backend": {
+            "kind": args.backend,
+            "cassette": args.cassette,
+            "replay_timing": args.replay_timing,
+            "fake_latency": args.latency,
+            "error_rate": args.error_rate,
+            "seed": args.seed,
+            "shortcuts": args.shortcuts,
+        },
+        "python": sys.version.split()[0],
+        "cpus": os.cpu_count(),
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
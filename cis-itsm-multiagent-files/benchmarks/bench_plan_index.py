@@ -0,0 +1,89 @@
+"""
+Lookup latency of the troubleshooting-plan similarity index (plan_index.PlanIndex).
+
+    python benchmarks/bench_plan_index.py --sizes 100000 1000000 --dims 256
+
+The index is filled with random unit vectors (lookup cost depends only on size and
+dims, not on content), then queried with real vectorized ticket text. Prints one
+JSON document with p50/p95/p99 lookup latency, vectorize cost and memory per size.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "app", "src"))
+
+from itsm_agents.metrics import percentile  # noqa: E402
+from itsm_agents.plan_index import CATEGORIES, PlanIndex, vectorize  # noqa: E402
+
+QUERIES = [
+    "Unable to connect to VPN (Error 809)\nUser cannot connect to VPN since morning.",
+    "Outlook not opening\nOutlook crashes on startup. Tried repair and restart.",
+    "Low disk space on laptop\nC: drive is full and system is slow.",
+    "Password expired\nUser locked out after password reset, cannot login.",
+]
+
+
+def bench(size: int, dims: int, queries: int, chunk: int = 100_000) -> dict:
+    rng = np.random.default_rng(0)
+    index = PlanIndex(dims=dims)
+
+    t0 = time.perf_counter()
+    for start in range(0, size, chunk):
+        n = min(chunk, size - start)
+        vecs = rng.standard_normal((n, dims), dtype=np.float32)
+        vecs /= np.linalg.norm(vecs, axis=1, keepdims=True)
+        cats = [CATEGORIES[i % len(CATEGORIES)] for i in range(start, start + n)]
+        index.add_vectors(vecs, cats, [{"troubleshooting": {}}] * n)
+    fill_s = time.perf_counter() - t0
+
+    qvecs = [vectorize(q, dims) for q in QUERIES]
+    t0 = time.perf_counter()
+    for q in QUERIES * 25:
+        vectorize(q, dims)
+    vectorize_ms = (time.perf_counter() - t0) * 1000 / (len(QUERIES) * 25)
+
+    for q in qvecs:  # warm up
+        index.search(q, k=5, category="VPN")
+
+    lat = {"filtered": [], "unfiltered": []}
+    for i in range(queries):
+        q = qvecs[i % len(qvecs)]
+        t0 = time.perf_counter()
+        index.search(q, k=5, category="VPN")
+        lat["filtered"].append((time.perf_counter() - t0) * 1000)
+        t0 = time.perf_counter()
+        index.search(q, k=5)
+        lat["unfiltered"].append((time.perf_counter() - t0) * 1000)
+
+    return {
+        "size": size,
+        "dims": dims,
+        "matrix_mb": round(size * dims * 4 / 2**20, 1),
+        "fill_s": round(fill_s, 2),
+        "vectorize_ms": round(vectorize_ms, 3),
+        "lookup_ms": {
+            name: {p: round(percentile(sorted(v), int(p[1:])), 2) for p in ("p50", "p95", "p99")}
+            for name, v in lat.items()
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PlanIndex lookup latency benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--dims", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    results = [bench(n, args.dims, args.queries) for n in args.sizes]
+    print(json.dumps({"benchmark": "plan_index", "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""
+Host-wide rate limiting: several processes (threads + asyncio tasks each) against one quota.
+
+    python benchmarks/bench_rate_limiter.py                                  # 3 processes x (4 threads + 8 tasks)
+    python benchmarks/bench_rate_limiter.py --processes 4 --quota-rpm 600 --calls 4
+    python benchmarks/bench_rate_limiter.py --modes on --limiter-rpm 1500     # limiter above the quota: AIMD
+
+Every worker process stands in for one MCP server / orchestrator on the host. It uses
+the fake model backend (see fake_llm.py; no API key or network needed) with a shared
+simulated quota of --quota-rpm (FAKE_LLM_QUOTA_PATH): calls over it fail at once with
+a 429. Each worker runs --threads sync callers and --tasks asyncio callers, each doing
+--calls classification calls through the request policy (retries with backoff on
+429, no hedging).
+
+Mode `off` runs without admission control. Mode `on` sets LLM_RATE_LIMIT=on with
+LLM_RPM=--limiter-rpm (default: 95% of the quota) and one shared state file, so all
+processes draw on the same buckets and AIMD limit. Reports per mode: calls ok /
+failed, 429s answered by the "API", achieved calls per minute, wall time and (mode
+`on`) the limiter's peak queue depth, lowest concurrency limit and observed rate,
+sampled every 100 ms from the shared state. Prints one JSON document.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import threading
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_SRC = os.path.join(ROOT, "app", "src")
+
+
+# -------------------------
+# Worker: one process on the host
+# -------------------------
+def worker(cfg: dict) -> dict:
+    sys.path.insert(0, APP_SRC)
+    from itsm_agents.fake_llm import FakeGeminiClient
+    from itsm_agents.request_policy import policy
+
+    client = FakeGeminiClient()
+    pol = policy("classification")
+    lock = threading.Lock()
+    counts = {"ok": 0, "failed": 0}
+
+    def done(ok: bool):
+        with lock:
+            counts["ok" if ok else "failed"] += 1
+
+    def sync_caller(c: int):
+        for i in range(cfg["calls"]):
+            try:
+                pol.call(client.generate_json, "sys", f"w{cfg['worker']} t{c} call {i}", None, "classification",
+                         hedge=False)
+                done(True)
+            except Exception:
+                done(False)
+
+    async def async_caller(c: int):
+        for i in range(cfg["calls"]):
+            try:
+                await pol.call_async(client.generate_json_async, "sys", f"w{cfg['worker']} a{c} call {i}", None,
+                                     "classification", hedge=False)
+                done(True)
+            except Exception:
+                done(False)
+
+    async def tasks():
+        await asyncio.gather(*(async_caller(c) for c in range(cfg["tasks"])))
+
+    samples = []
+    stop = threading.Event()
+
+    def sample():
+        while not stop.wait(0.1):
+            samples.append(client.limiter.stats())
+
+    sampler = threading.Thread(target=sample, daemon=True) if client.limiter is not None and cfg["worker"] == 0 else None
+    threads = [threading.Thread(target=sync_caller, args=(c,)) for c in range(cfg["threads"])]
+    started = time.time()
+    if sampler is not None:
+        sampler.start()
+    for t in threads:
+        t.start()
+    asyncio.run(tasks())
+    for t in threads:
+        t.join()
+    finished = time.time()
+    stop.set()
+
+    return {
+        **counts,
+        "throttled": client.stats().get("throttled", 0),
+        "started": started,
+        "finished": finished,
+        "limiter": {
+            "peak_queue_depth": max(s["queue_depth"] for s in samples),
+            "peak_in_flight": max(s["in_flight"] for s in samples),
+            "min_concurrency_limit": min(s["concurrency_limit"] for s in samples),
+            "peak_rate_rpm": max(s["rate_rpm"] for s in samples),
+            "process": client.limiter.stats()["process"],
+        } if samples else None,
+    }
+
+
+# -------------------------
+# Driver
+# -------------------------
+def run_mode(mode: str, args) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        env = os.environ.copy()
+        env.update({
+            "PYTHONPATH": APP_SRC + os.pathsep + env.get("PYTHONPATH", ""),
+            "LLM_BACKEND": "fake",
+            "FAKE_LLM_LATENCY": args.latency,
+            "FAKE_LLM_RPM": str(args.quota_rpm),
+            "FAKE_LLM_QUOTA_PATH": os.path.join(tmp, "quota.json"),
+            "LLM_CACHE": "off",
+            "TRACE_EXPORT_PATH": "",
+            "LLM_HEDGE": "false",
+            "LLM_DEADLINE_CLASSIFY_S": "120",
+            "LLM_RATE_LIMIT": mode,
+            "LLM_RPM": str(args.limiter_rpm or args.quota_rpm * 0.95),
+            "LLM_RATE_BURST_S": str(args.burst_s),
+            "LLM_MAX_CONCURRENCY": str(args.max_concurrency),
+            "LLM_RATE_STATE_PATH": os.path.join(tmp, "limiter.json"),
+        })
+        procs = [
+            subprocess.Popen(
+                [sys.executable, os.path.abspath(__file__), "--worker",
+                 json.dumps({"worker": w, "threads": args.threads, "tasks": args.tasks, "calls": args.calls})],
+                env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+            )
+            for w in range(args.processes)
+        ]
+        results = []
+        for proc in procs:
+            out, err = proc.communicate()
+            if proc.returncode != 0:
+                raise RuntimeError((err.strip().splitlines() or ["worker failed"])[-1])
+            results.append(json.loads(out.strip().splitlines()[-1]))
+
+    ok = sum(r["ok"] for r in results)
+    wall = max(r["finished"] for r in results) - min(r["started"] for r in results)
+    return {
+        "mode": mode,
+        "calls": ok + sum(r["failed"] for r in results),
+        "ok": ok,
+        "failed": sum(r["failed"] for r in results),
+        "api_429s": sum(r["throttled"] for r in results),
+        "wall_s": round(wall, 2),
+        "achieved_rpm": round(ok / wall * 60, 1),
+        "limiter": results[0]["limiter"],
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--processes", type=int, default=3)
+    ap.add_argument("--threads", type=int, default=4, help="sync callers per process")
+    ap.add_argument("--tasks", type=int, default=8, help="asyncio callers per process")
+    ap.add_argument("--calls", type=int, default=5, help="calls per caller")
+    ap.add_argument("--quota-rpm", type=float, default=1200, help="simulated API quota (shared by all processes)")
+    ap.add_argument("--limiter-rpm", type=float, default=0, help="LLM_RPM (default: 95%% of the quota)")
+    ap.add_argument("--burst-s", type=float, default=1, help="LLM_RATE_BURST_S")
+    ap.add_argument("--max-concurrency", type=int, default=32, help="LLM_MAX_CONCURRENCY (AIMD ceiling)")
+    ap.add_argument("--latency", default="const:100", help="fake model latency spec (see fake_llm.LatencyModel)")
+    ap.add_argument("--modes", default="off,on", help="comma-separated: off, on")
+    ap.add_argument("--output", help="also write the JSON report here")
+    ap.add_argument("--worker", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.worker:
+        print(json.dumps(worker(json.loads(args.worker))))
+        return
+
+    report = {
+        "processes": args.processes,
+        "callers_per_process": {"threads": args.threads, "tasks": args.tasks},
+        "calls_per_caller": args.calls,
+        "quota_rpm": args.quota_rpm,
+        "limiter_rpm": args.limiter_rpm or args.quota_rpm * 0.95,
+        "fake_latency": args.latency,
+        "python": sys.version.split()[0],
+        "cpus": os.cpu_count(),
+        "results": [run_mode(m.strip(), args) for m in args.modes.split(",") if m.strip()],
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
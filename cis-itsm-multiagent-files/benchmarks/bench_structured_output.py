@@ -0,0 +1,118 @@
+"""
+Prompt size and parse-failure rate: structured output (response_schema) vs prompt-only JSON.
+
+    python benchmarks/bench_structured_output.py                 # prompt sizes only
+    python benchmarks/bench_structured_output.py --live --runs 5 # + real model calls
+
+Prompt sizes are measured on the sample tickets for all three stages, as sent
+(system + user prompt). Tokens come from the count_tokens API when GEMINI_API_KEY
+is set, otherwise they are estimated as chars/4.
+With --live, each sample ticket runs through the direct pipeline `--runs` times per
+mode (response cache off) and a stage counts as a parse failure when its output does
+not validate against the pydantic model. Prints one JSON document.
+"""
+import os
+import sys
+import glob
+import json
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "app", "src"))
+
+from itsm_agents import agents_direct, prompts  # noqa: E402
+from itsm_agents.config import GEMINI_API_KEY, GEMINI_MODEL  # noqa: E402
+from itsm_agents.gemini_client import GeminiClient  # noqa: E402
+from itsm_agents.schemas import Ticket, Classification, Troubleshooting, Communication  # noqa: E402
+
+CLS = Classification(
+    category="VPN", priority="P3", assignment_group="CIS-VPN-Support", confidence=0.8, reason="VPN error 809"
+)
+TS = Troubleshooting(
+    probable_cause="IKEv2 ports blocked",
+    steps=["Check network", "Switch VPN protocol", "Reinstall client", "Escalate"],
+    data_needed=["Which network?"],
+    risk_level="Low",
+)
+STAGES = {
+    "classification": (lambda t, s: prompts.classify_prompt(t, s), Classification),
+    "troubleshooting": (lambda t, s: prompts.troubleshoot_prompt(t, CLS, s), Troubleshooting),
+    "communication": (lambda t, s: prompts.compose_prompt(t, CLS, TS, s), Communication),
+}
+
+
+def load_samples():
+    paths = sorted(glob.glob(os.path.join(ROOT, "samples", "*.json")))
+    return [Ticket(**json.load(open(p, encoding="utf-8"))) for p in paths]
+
+
+def prompt_sizes(tickets, client):
+    report = {}
+    for stage, (build, _) in STAGES.items():
+        row = {}
+        for mode, structured in (("prompt_only", False), ("structured", True)):
+            texts = [GeminiClient._build_prompt(*build(t, structured)) for t in tickets]
+            chars = sum(len(x) for x in texts) / len(texts)
+            if client is not None:
+                tokens = sum(
+                    client.client.models.count_tokens(model=GEMINI_MODEL, contents=x).total_tokens for x in texts
+                ) / len(texts)
+            else:
+                tokens = chars / 4
+            row[mode] = {"chars": round(chars), "tokens": round(tokens)}
+        row["token_reduction_pct"] = round(
+            100 * (1 - row["structured"]["tokens"] / row["prompt_only"]["tokens"]), 1
+        )
+        report[stage] = row
+    return report
+
+
+def parse_failures(tickets, runs):
+    report = {}
+    for mode, structured in (("prompt_only", False), ("structured", True)):
+        prompts.STRUCTURED_OUTPUT = structured
+        failures = {stage: 0 for stage in STAGES}
+        calls = 0
+        for _ in range(runs):
+            for t in tickets:
+                calls += 1
+                for stage, fn in (
+                    ("classification", lambda: agents_direct.classify_ticket(t)),
+                    ("troubleshooting", lambda: agents_direct.troubleshoot_ticket(t, CLS)),
+                    ("communication", lambda: agents_direct.compose_response(t, CLS, TS)),
+                ):
+                    try:
+                        fn()
+                    except Exception:
+                        failures[stage] += 1
+        report[mode] = {
+            "pipelines": calls,
+            "failures": failures,
+            "failure_rate": round(sum(failures.values()) / (calls * len(STAGES)), 4),
+        }
+    return report
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--live", action="store_true", help="also call the model and count parse failures")
+    ap.add_argument("--runs", type=int, default=5, help="pipelines per sample ticket and mode (--live)")
+    args = ap.parse_args()
+
+    tickets = load_samples()
+    client = GeminiClient(cache=None) if GEMINI_API_KEY else None
+    report = {
+        "model": GEMINI_MODEL,
+        "tokens": "count_tokens" if client is not None else "estimated (chars/4)",
+        "prompt_size": prompt_sizes(tickets, client),
+    }
+    if args.live:
+        if client is None:
+            sys.exit("--live needs GEMINI_API_KEY")
+        agents_direct._client = client
+        report["parse_failures"] = parse_failures(tickets, args.runs)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+Calibrate the rule fast-path confidence (rules.CALIBRATION) on labelled tickets.
+
+    python benchmarks/calibrate_rules.py --samples samples/labelled/tickets.jsonl
+
+Each sample is a ticket with its correct "category". The raw rule score of every matched
+ticket is fitted against whether the rule guess was right (isotonic, rules.fit_calibration).
+Prints one JSON document with the fitted table (paste it into rules.CALIBRATION) and the
+precision / coverage of the fast path per threshold, with the fitted table applied.
+"""
+import os
+import sys
+import json
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "app", "src"))
+
+from itsm_agents.batch import iter_tickets  # noqa: E402
+from itsm_agents.rules import calibrated, calibration_samples, fit_calibration  # noqa: E402
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--samples", default=os.path.join(ROOT, "samples", "labelled", "tickets.jsonl"))
+    ap.add_argument("--thresholds", type=float, nargs="+", default=[0.6, 0.7, 0.8, 0.85, 0.9])
+    args = ap.parse_args()
+
+    labelled = list(iter_tickets(args.samples))
+    samples = calibration_samples(labelled)
+    table = fit_calibration(samples)
+
+    report = {"tickets": len(labelled), "matched": len(samples), "calibration": table, "thresholds": {}}
+    for t in args.thresholds:
+        taken = [right for raw, right in samples if calibrated(raw, table) >= t]
+        report["thresholds"][str(t)] = {
+            "coverage": round(len(taken) / len(labelled), 3),
+            "precision": round(sum(taken) / len(taken), 3) if taken else None,
+        }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()